@@ -0,0 +1,161 @@
+"""
+Batch generation of per-customer proposals on a process pool.
+
+Specs are a JSON or YAML list (or {"defaults": {...}, "proposals": [...]}):
+
+    - customer: ООО "Ромашка"
+      variants: [basic, optimal]        # basic, optimal, budget (v15)
+      quantities: {alt-linux: 4}        # SKU overrides, 0 drops the line
+      output: out/romashka.pdf          # optional, derived from customer
+    - customer: АО "Вектор"
+      generator: v14                    # DOCX proposal
+
+Every worker process imports the generators, loads the price catalog and
+registers the fonts once in its initializer, so each document only pays for
+its own layout. Documents are independent, so throughput scales with the
+number of workers.
+
+Usage: python batch_generate.py specs.yaml [-j 8] [--out-dir out]
+"""
+import argparse
+import io
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from instrumentation import stage
+
+GENERATORS = ('v14', 'v15')
+
+
+def load_specs(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if isinstance(data, dict):
+        defaults = data.get('defaults', {})
+        return [{**defaults, **spec} for spec in data.get('proposals', [])]
+    return data
+
+
+def slugify(text):
+    return re.sub(r'[^\w-]+', '_', text, flags=re.U).strip('_') or 'proposal'
+
+
+def output_path(spec, out_dir):
+    if spec.get('output'):
+        return spec['output']
+    generator = spec.get('generator', 'v15')
+    extension = 'docx' if generator == 'v14' else 'pdf'
+    parts = [slugify(spec.get('customer') or 'proposal'), generator]
+    if generator == 'v15':
+        parts.append('-'.join(spec.get('variants', ['basic', 'optimal'])))
+    return os.path.join(out_dir, '_'.join(parts) + '.' + extension)
+
+
+def _init_worker():
+    """Pay the one-off costs (imports, catalog, font parsing, DOCX template) once per worker."""
+    import docx
+    import font_cache
+    import generate_proposal_v14  # noqa: F401
+    import generate_proposal_v15
+    import text_layout
+    from catalog import load_catalog
+
+    font_cache.install_subset_cache()
+    load_catalog()
+    text_layout.load()
+    # A throwaway render also records the page templates, the common font
+    # subsets and the line breaks of the boilerplate paragraphs
+    generate_proposal_v15.create_proposal(io.BytesIO())
+    text_layout.save()
+    docx.Document()
+
+
+def build(spec, output):
+    """Render `spec` into `output` (a path or a binary file object)."""
+    generator = spec.get('generator', 'v15')
+    if generator not in GENERATORS:
+        raise ValueError(f"Unknown generator: {generator}")
+    if generator == 'v14':
+        import generate_proposal_v14
+        generate_proposal_v14.create_proposal(output, customer=spec.get('customer'))
+    else:
+        import generate_proposal_v15
+        generate_proposal_v15.create_proposal(
+            output,
+            variants=spec.get('variants', ('basic', 'optimal')),
+            quantities=spec.get('quantities'),
+            customer=spec.get('customer'),
+        )
+
+
+def render(spec):
+    """Render one spec; never raises, the result carries the error instead."""
+    started = time.perf_counter()
+    result = {'customer': spec.get('customer'), 'output': spec['output'], 'error': None}
+    try:
+        directory = os.path.dirname(spec['output'])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with stage('document', spec.get('customer'), generator=spec.get('generator', 'v15'), output=spec['output']):
+            build(spec, spec['output'])
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def run_batch(specs, jobs=None, out_dir='.'):
+    """Render all specs; returns the results in spec order."""
+    specs = [{**spec, 'output': output_path(spec, out_dir)} for spec in specs]
+    outputs = [spec['output'] for spec in specs]
+    duplicates = {path for path in outputs if outputs.count(path) > 1}
+    if duplicates:
+        raise ValueError(f"Several specs write the same file: {sorted(duplicates)}")
+
+    results = [None] * len(specs)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+        futures = {pool.submit(render, spec): position for position, spec in enumerate(specs)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = 'FAILED ' + result['error'] if result['error'] else 'ok'
+            print(f"{result['output']}: {status} ({result['seconds']:.2f}s)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate many proposals in parallel")
+    parser.add_argument('specs', help="Spec list (.json, .yaml)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--out-dir', default='.', help="Directory for specs without an explicit output")
+    parser.add_argument('--report', help="Write the per-document results as JSON")
+    args = parser.parse_args()
+
+    specs = load_specs(args.specs)
+    started = time.perf_counter()
+    results = run_batch(specs, args.jobs, args.out_dir)
+    elapsed = time.perf_counter() - started
+
+    failed = [r for r in results if r['error']]
+    print(f"Generated {len(results) - len(failed)}/{len(results)} proposals in {elapsed:.2f}s "
+          f"({len(results) / elapsed if elapsed else 0:.1f}/s, {args.jobs} workers)")
+    for result in failed:
+        print(result['traceback'], file=sys.stderr)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Benchmarks for the generators and patch tools on synthetic proposals.
+
+Cases are synthesized at several scales - DOCX specification tables of 10 to
+10,000 rows, v15 PDFs of 1 to 500 pages - and every stage is timed on its
+own: generation (layout in memory), save, load, in-memory patching, saving
+an edit with docx_save, the streaming patcher and verification. Each stage is run `--repeat` times and
+the best wall time is kept; peak memory comes from a separate tracemalloc
+pass so that tracing does not skew the timings (it covers Python objects,
+not lxml's own C allocations).
+
+Results are compared with a stored baseline (benchmarks/baseline.json) and a
+stage is flagged as a regression when it is more than `--tolerance` slower
+(or larger) than the baseline and the difference is above the noise floor.
+
+    python benchmarks/bench.py                      # quick scales vs baseline
+    python benchmarks/bench.py --scale full -o results.json
+    python benchmarks/bench.py --update-baseline
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+SCALES = {
+    'quick': {'docx_rows': [10, 100, 1000], 'pdf_pages': [1, 10]},
+    'full': {'docx_rows': [10, 100, 1000, 10000], 'pdf_pages': [1, 10, 100, 500]},
+}
+# Regressions smaller than this are noise
+MIN_SECONDS = 0.005
+MIN_BYTES = 256 * 1024
+PDF_ROWS_PER_PAGE = 24
+
+
+def synthetic_items(count):
+    """(name, qty, unit price in rubles) lines cycling through the price catalog."""
+    from catalog import load_catalog
+    items = list(load_catalog().items.values())
+    return [
+        (f"{items[i % len(items)].name} #{i + 1}", 1 + i % 4, items[i % len(items)].unit_price or 1000)
+        for i in range(count)
+    ]
+
+
+def measure(stage, repeat, memory):
+    """Best-of-`repeat` wall and CPU time of `stage()`, plus peak traced memory."""
+    best_wall = best_cpu = None
+    for _ in range(repeat):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        stage()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+    result = {'seconds': round(best_wall, 5), 'cpu_seconds': round(best_cpu, 5)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        stage()
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def docx_case(rows, workdir, repeat, memory):
+    from docx import Document
+
+    import generate_proposal_v13
+    import verify
+    from docx_replace import ReplacementEngine
+    from docx_save import open_document, save_document
+    from docx_stream import StreamPatcher
+    from table_index import TableIndex
+
+    items = synthetic_items(rows)
+    path = os.path.join(workdir, f'rows{rows}.docx')
+    patched = os.path.join(workdir, f'rows{rows}_patched.docx')
+    state = {}
+
+    def generate():
+        doc = Document()
+        generate_proposal_v13.apply_styles(doc)
+        generate_proposal_v13.build_solution(doc, items)
+        state['doc'] = doc
+
+    def save():
+        state['doc'].save(path)
+
+    def load():
+        state['loaded'] = Document(path)
+
+    def patch():
+        doc = Document(path)
+        engine = ReplacementEngine({'#1 ': '#1* ', 'YADRO': 'YADRO (обн.)'})
+        engine.apply(doc)
+        index = TableIndex(doc)
+        for row in index.find('#2'):
+            row.set(2, '3')
+
+    def save_tracked():
+        # One edited cell; every other member is copied from the source zip
+        if 'tracked' not in state:
+            state['tracked'] = open_document(path)
+        doc = state['tracked']
+        doc.tables[0].rows[1].cells[1].text = 'Изменено'
+        save_document(doc, patched)
+
+    def stream_patch():
+        StreamPatcher().replace_text({'YADRO': 'YADRO (обн.)'}).delete_rows('#3').patch(path, patched)
+
+    def verify_output():
+        assert not verify.check(path, contains=['ИТОГО'])
+
+    stages = [('generate', generate), ('save', save), ('load', load), ('patch', patch),
+              ('save_tracked', save_tracked), ('stream_patch', stream_patch), ('verify', verify_output)]
+    return {name: measure(stage, repeat, memory) for name, stage in stages}
+
+
+def pdf_case(pages, workdir, repeat, memory):
+    import generate_proposal_v15
+
+    rows = [[name, str(qty), f'{price:,}'.replace(',', ' '), f'{price * qty:,}'.replace(',', ' ')]
+            for name, qty, price in synthetic_items(pages * PDF_ROWS_PER_PAGE)]
+    header = ['Наименование', 'Кол-во', 'Цена за ед.', 'Сумма']
+    col_widths = [90, 20, 40, 40]
+    path = os.path.join(workdir, f'pages{pages}.pdf')
+    state = {}
+
+    def generate():
+        pdf = generate_proposal_v15.PDF()
+        generate_proposal_v15.add_fonts(pdf)
+        pdf.add_page()
+        pdf.use_template('intro', pdf.draw_intro)
+        pdf.add_table(header, rows, col_widths)
+        state['pdf'] = pdf
+
+    def save():
+        # fpdf closes the document on output, so lay it out again first
+        generate()
+        state['pdf'].output(path)
+
+    def save_to_memory():
+        generate()
+        io.BytesIO(state['pdf'].output(dest='S').encode('latin1'))
+
+    stages = [('generate', generate), ('save', save), ('save_to_memory', save_to_memory)]
+    results = {name: measure(stage, repeat, memory) for name, stage in stages}
+    # save and save_to_memory include a layout; report the output part alone
+    for name in ('save', 'save_to_memory'):
+        for key in ('seconds', 'cpu_seconds'):
+            results[name][key] = round(max(results[name][key] - results['generate'][key], 0), 5)
+    return results
+
+
+def run(scale, repeat=3, memory=True, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        if not only or 'docx' in only:
+            for rows in SCALES[scale]['docx_rows']:
+                results[f'docx/{rows}_rows'] = docx_case(rows, workdir, repeat, memory)
+                print_case(f'docx/{rows}_rows', results[f'docx/{rows}_rows'])
+        if not only or 'pdf' in only:
+            for pages in SCALES[scale]['pdf_pages']:
+                results[f'pdf/{pages}_pages'] = pdf_case(pages, workdir, repeat, memory)
+                print_case(f'pdf/{pages}_pages', results[f'pdf/{pages}_pages'])
+    return results
+
+
+def print_case(case, stages):
+    for stage, result in stages.items():
+        peak = f"{result['peak_bytes'] / 2**20:8.1f} MiB" if 'peak_bytes' in result else ''
+        print(f"{case:18} {stage:15} {result['seconds'] * 1000:10.1f} ms {result['cpu_seconds'] * 1000:10.1f} ms cpu {peak}")
+
+
+def compare(results, baseline, tolerance):
+    """[(case, stage, metric, baseline, current)] for every regression."""
+    regressions = []
+    for case, stages in results.items():
+        for stage, result in stages.items():
+            reference = baseline.get(case, {}).get(stage)
+            if not reference:
+                continue
+            for metric, floor in (('seconds', MIN_SECONDS), ('peak_bytes', MIN_BYTES)):
+                if metric not in result or metric not in reference:
+                    continue
+                old, new = reference[metric], result[metric]
+                if new > old * (1 + tolerance) and new - old > floor:
+                    regressions.append((case, stage, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generation, patching, verification and save")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='quick')
+    parser.add_argument('--only', action='append', choices=('docx', 'pdf'))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('-o', '--output', help="Write the results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.scale, args.repeat, not args.no_memory, args.only)
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+        baseline.update({key: value for key, value in report.items() if key != 'results'})
+        baseline.setdefault('results', {}).update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    for case, stage, metric, old, new in regressions:
+        print(f"REGRESSION {case} {stage} {metric}: {old} -> {new} ({(new / old - 1) * 100:+.0f}%)")
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
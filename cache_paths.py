@@ -0,0 +1,15 @@
+"""
+Location of on-disk caches shared by the proposal tools.
+
+Defaults to ~/.cache/aiagent-proposal; set PROPOSAL_CACHE_DIR to move it
+(e.g. onto a tmpfs on the build box).
+"""
+import os
+
+
+def cache_dir(*parts):
+    root = os.environ.get('PROPOSAL_CACHE_DIR') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'aiagent-proposal')
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,146 @@
+"""
+Shared price catalog.
+
+shared/price_catalog.json is the single source of item names and prices for
+the Python generators and the web app (useEquipmentPricing.ts). Items are
+keyed by SKU; named price lists override the price (and optionally the name)
+of some items for a given proposal, e.g. the prices quoted in v15.
+
+The JSON is parsed and validated once and stored as a compiled pickle in the
+cache directory. The pickle is reused as long as the source file's mtime and
+size are unchanged, or, after a touch, its content hash still matches. Within
+one process the loaded catalog is memoized, so batch runs never re-parse it.
+
+    catalog = load_catalog()
+    prices = catalog.price_table([('yadro-g4208p', 1)], price_list='proposal-v13')
+"""
+import hashlib
+import json
+import os
+import pickle
+from collections import namedtuple
+
+from cache_paths import cache_dir
+from pricing import PriceTable
+
+DEFAULT_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared', 'price_catalog.json')
+CATEGORIES = ('hardware', 'storage', 'network', 'software', 'services')
+FORMAT_VERSION = 1
+
+Item = namedtuple('Item', 'sku name unit_price vendor category')
+
+_loaded = {}
+
+
+class CatalogError(ValueError):
+    pass
+
+
+class Catalog:
+    def __init__(self, items, price_lists, currency='RUB'):
+        self.items = items
+        self.price_lists = price_lists
+        self.currency = currency
+
+    def __getitem__(self, sku):
+        return self.items[sku]
+
+    def __contains__(self, sku):
+        return sku in self.items
+
+    def item(self, sku, price_list=None):
+        if price_list is not None:
+            overrides = self.price_lists[price_list]
+            if sku in overrides:
+                return overrides[sku]
+        try:
+            return self.items[sku]
+        except KeyError:
+            raise CatalogError(f"Unknown SKU: {sku}") from None
+
+    def price_table(self, lines, price_list=None):
+        """PriceTable from (sku, qty) pairs, grouped by item category."""
+        table = PriceTable()
+        for sku, qty in lines:
+            item = self.item(sku, price_list)
+            table.add(item.name, qty, item.unit_price, group=item.category)
+        return table
+
+
+def _compile(data):
+    """Validate the parsed JSON and resolve the price lists into Items."""
+    items = {}
+    for sku, entry in data.get('items', {}).items():
+        name = entry.get('name')
+        price = entry.get('unit_price')
+        category = entry.get('category')
+        if not name:
+            raise CatalogError(f"{sku}: missing name")
+        if not isinstance(price, int) or price < 0:
+            raise CatalogError(f"{sku}: unit_price must be a non-negative integer (rubles)")
+        if category not in CATEGORIES:
+            raise CatalogError(f"{sku}: unknown category {category!r}")
+        items[sku] = Item(sku, name, price, entry.get('vendor', ''), category)
+
+    price_lists = {}
+    for list_name, overrides in data.get('price_lists', {}).items():
+        resolved = {}
+        for sku, entry in overrides.items():
+            if sku not in items:
+                raise CatalogError(f"Price list {list_name}: unknown SKU {sku}")
+            price = entry.get('unit_price', items[sku].unit_price)
+            if not isinstance(price, int) or price < 0:
+                raise CatalogError(f"Price list {list_name}: bad unit_price for {sku}")
+            resolved[sku] = items[sku]._replace(name=entry.get('name', items[sku].name), unit_price=price)
+        price_lists[list_name] = resolved
+    return Catalog(items, price_lists, data.get('currency', 'RUB'))
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_catalog(path=DEFAULT_CATALOG):
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    cached = _loaded.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    compiled_path = os.path.join(cache_dir('catalog'), hashlib.sha1(path.encode()).hexdigest() + '.pkl')
+    compiled = None
+    try:
+        with open(compiled_path, 'rb') as f:
+            compiled = pickle.load(f)
+        if compiled.get('version') != FORMAT_VERSION:
+            compiled = None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        compiled = None
+
+    if compiled and compiled['stamp'] == stamp:
+        catalog = compiled['catalog']
+    else:
+        digest = _file_hash(path)
+        if compiled and compiled['sha256'] == digest:
+            # Touched but unchanged: keep the compiled catalog, refresh the stamp
+            catalog = compiled['catalog']
+        else:
+            with open(path, encoding='utf-8') as f:
+                catalog = _compile(json.load(f))
+        tmp_path = compiled_path + '.%d.tmp' % os.getpid()
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': FORMAT_VERSION, 'stamp': stamp, 'sha256': digest, 'catalog': catalog},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, compiled_path)
+
+    _loaded[path] = (stamp, catalog)
+    return catalog
+
+
+if __name__ == '__main__':
+    catalog = load_catalog()
+    for item in catalog.items.values():
+        print(f"{item.sku:28} {item.unit_price:>12,} {item.category:10} {item.name[:60]}".replace(',', ' '))
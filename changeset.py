@@ -0,0 +1,209 @@
+"""
+Declarative DOCX changesets.
+
+A changeset lists the edits that take a proposal from one revision to
+another. The runner loads the document once, applies every operation in
+order and saves once, instead of chaining one script (and one full zip
+rewrite) per edit. Changesets are JSON or YAML files:
+
+    source: client/public/Проектноепредложение3_v3.docx
+    output: client/public/Проектноепредложение3_v11.docx
+    operations:
+      - remove_row: {contains: ["1С:Предприятие"]}
+      - replace_text: {replacements: {"MES5324": "MES2300-24"}}
+      - replace_text: {row: "MES5324", replacements: {"499 000": "139 000"}}
+      - set_quantity: {row: "YADRO G4208P G3", from: 2, to: 1}
+      - set_cell: {row: "YADRO G4208P G3", current: "64 302 318", value: "32 151 159"}
+      - reprice: {row: "Eltex MES5324", to: 1}
+      - append_section: {title: "...", intro: "...", subsections: [...]}
+
+Usage: python changeset.py changesets/v3_to_v11.yaml [--source X] [--output Y]
+"""
+import argparse
+import json
+import re
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt, RGBColor
+
+from docx_replace import ReplacementEngine
+from docx_save import DEFAULT_LEVEL, open_document, save_document
+from instrumentation import stage
+from pricing import format_rub, refresh_table_total, reprice_row
+from table_index import TableIndex
+
+QTY_RE = re.compile(r'^(\d+)(\s*шт\.?)?$')
+
+
+def load_changeset(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def add_section_header(doc, text):
+    p = doc.add_paragraph()
+    run = p.add_run(text)
+    run.bold = True
+    run.font.size = Pt(16)
+    run.font.color.rgb = RGBColor(0, 51, 102)  # Dark Blue
+    p.space_before = Pt(18)
+    p.space_after = Pt(12)
+
+
+def add_subsection_header(doc, text):
+    p = doc.add_paragraph()
+    run = p.add_run(text)
+    run.bold = True
+    run.font.size = Pt(14)
+    run.font.color.rgb = RGBColor(51, 51, 51)  # Dark Gray
+    p.space_before = Pt(12)
+    p.space_after = Pt(6)
+
+
+def add_bullet_point(doc, title, description):
+    p = doc.add_paragraph()
+    p.paragraph_format.left_indent = Pt(18)
+    p.paragraph_format.first_line_indent = Pt(-18)
+    p.add_run("• ")
+    run_title = p.add_run(title + ": ")
+    run_title.bold = True
+    p.add_run(description)
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def remove_row(doc, index, contains):
+    removed = 0
+    for row in index.find(*_as_list(contains)):
+        row.delete()
+        removed += 1
+    print(f"Removed {removed} row(s) containing: {contains}")
+    return removed
+
+
+def replace_text(doc, index, replacements, row=None):
+    engine = ReplacementEngine(replacements)
+    if row is None:
+        hits = engine.apply(doc)
+        if any(hits.values()):
+            index.invalidate()
+    else:
+        hits = dict.fromkeys(engine.patterns, 0)
+        for match in index.find(*_as_list(row)):
+            for pattern, count in match.replace(dict(zip(engine.patterns, engine.values))).items():
+                hits[pattern] += count
+    engine.print_report(hits)
+    return sum(hits.values())
+
+
+def set_cell(doc, index, row, value, column=None, current=None):
+    """Rewrite cells of matching rows, or only the `current` text inside them."""
+    changed = 0
+    for match in index.find(*_as_list(row)):
+        for grid_column, text in list(match.items()):
+            if column is not None and grid_column != column:
+                continue
+            if current is not None:
+                if str(current) not in text:
+                    continue
+                value_text = text.replace(str(current), str(value))
+            else:
+                value_text = str(value)
+            match.set(grid_column, value_text)
+            changed += 1
+    print(f"Updated {changed} cell(s) in rows containing: {row}")
+    return changed
+
+
+def set_quantity(doc, index, row, to, **kwargs):
+    """Set the quantity cell ("2", "2 шт.") of matching rows, keeping the unit."""
+    old = kwargs.get('from')
+    changed = 0
+    for match in index.find(*_as_list(row)):
+        for column, text in list(match.items()):
+            qty = QTY_RE.match(text.strip())
+            if not qty or (old is not None and int(qty.group(1)) != int(old)):
+                continue
+            match.set(column, f"{to}{qty.group(2) or ''}")
+            changed += 1
+    print(f"Set quantity to {to} in {changed} cell(s) of rows containing: {row}")
+    return changed
+
+
+def set_quantity_and_reprice(doc, index, row, to, total_label='Итого'):
+    """Set the quantity of matching rows and recompute line and table totals."""
+    for match in index.find(*_as_list(row)):
+        table = match.table
+        total_column = len(match.cells) - 1
+        reprice_row(match, table.column('Кол-во'), total_column, to)
+        total = refresh_table_total(table, total_column, total_label)
+        print(f"Set quantity to {to} in row containing: {row}; table total {format_rub(total)}")
+
+
+def append_section(doc, index, title, intro=None, subsections=(), align=None):
+    add_section_header(doc, title)
+    if intro:
+        p = doc.add_paragraph(intro)
+        if align == 'justify':
+            p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+    for subsection in subsections:
+        add_subsection_header(doc, subsection['title'])
+        for bullet_title, description in subsection.get('bullets', []):
+            add_bullet_point(doc, bullet_title, description)
+    print(f"Appended section: {title}")
+
+
+OPERATIONS = {
+    'remove_row': remove_row,
+    'replace_text': replace_text,
+    'set_cell': set_cell,
+    'set_quantity': set_quantity,
+    'reprice': set_quantity_and_reprice,
+    'append_section': append_section,
+}
+
+
+def apply_changeset(doc, operations):
+    """Apply a list of {operation_name: arguments} entries to an open Document."""
+    index = TableIndex(doc)
+    for entry in operations:
+        if len(entry) != 1:
+            raise ValueError(f"Each operation needs exactly one name: {entry}")
+        (name, args), = entry.items()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown changeset operation: {name}")
+        with stage('mutate', name):
+            OPERATIONS[name](doc, index, **args)
+    return doc
+
+
+def run_changeset(changeset, source=None, output=None, level=DEFAULT_LEVEL):
+    source = source or changeset['source']
+    output = output or changeset['output']
+    with stage('load', source=str(source)):
+        doc = open_document(source)
+    apply_changeset(doc, changeset.get('operations', []))
+    with stage('save', output=str(output)) as record:
+        # Members the operations did not touch are copied from the source as they are
+        record.update(save_document(doc, output, level=level))
+    print(f"Document saved to {output}")
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a DOCX changeset with a single load and save")
+    parser.add_argument('changeset', help="Changeset file (.json, .yaml)")
+    parser.add_argument('--source', help="Override the source document")
+    parser.add_argument('--output', help="Override the output document")
+    parser.add_argument('--level', type=int, default=DEFAULT_LEVEL, help="Deflate level (0-9) for changed parts")
+    args = parser.parse_args()
+    run_changeset(load_changeset(args.changeset), args.source, args.output, args.level)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import { useState, useEffect } from 'react';
+import catalog from '@shared/price_catalog.json';
 
 export interface EquipmentPrice {
   id: string;
@@ -10,44 +11,13 @@ export interface EquipmentPrice {
   trend: 'up' | 'down' | 'stable';
 }
 
-// Mock initial data based on proposal
-const INITIAL_PRICES: Record<string, number> = {
-  'graviton-h22i': 13820000,
-  'das-storage': 900000,
-  'eltex-mes2300-24': 186550,
-  'yadro-g4208p': 18390000, // Per unit price
-  'aerodisk-storage': 9800000,
-  'eltex-mes5324': 499000, // Per unit price
-  // Software licenses
-  'alt-linux': 48600,
-  'alt-virtualization': 101200,
-  // '1c-enterprise': 180000, // Removed: Assumed already installed
-  'postgres-pro': 238781,
-  'ml-platform': 800000,
-  'data-connectors': 850000,
-  // Implementation phases (Basic Variant Total: 11M)
-  'impl-basic-phase-1': 3000000, // Analysis & Design
-  'impl-basic-phase-2': 5000000, // Deployment & Config
-  'impl-basic-phase-3': 3000000, // Testing & Training
-
-  // Implementation phases (Optimal Variant Total: ~12-20M)
-  'impl-optimal-phase-1': 5000000, // Analysis & Design
-  'impl-optimal-phase-2': 7000000, // Deployment & Config
-  'impl-optimal-phase-3': 4000000, // Testing & Training
-
-  // Budget Alternatives
-  'server-budget': 1200000, // Entry-level server
-  'storage-budget': 300000, // Basic NAS
-  'switch-budget': 45000, // Basic L2 switch
-  'linux-free': 0, // Community Linux (e.g., Ubuntu/Debian/CentOS)
-  'postgres-free': 0, // PostgreSQL Community
-  'virtualization-free': 0, // KVM/Proxmox (Community)
-  'ml-platform-opensource': 0, // Open source ML tools
-  'connectors-opensource': 0, // Custom scripts/Open source
-  'impl-budget-phase-1': 1000000, // Simplified Analysis
-  'impl-budget-phase-2': 1500000, // Basic Deployment
-  'impl-budget-phase-3': 500000, // Minimal Training
-};
+// Initial prices come from the catalog shared with the Python generators
+// (shared/price_catalog.json); generator-only items are marked "web": false
+const INITIAL_PRICES: Record<string, number> = Object.fromEntries(
+  Object.entries(catalog.items)
+    .filter(([, item]) => (item as { web?: boolean }).web !== false)
+    .map(([id, item]) => [id, item.unit_price])
+);
 
 export function useEquipmentPricing() {
   const [prices, setPrices] = useState<Record<string, EquipmentPrice>>({});
@@ -0,0 +1,185 @@
+"""
+Single-pass multi-pattern text replacement for DOCX documents.
+
+All replacement rules are compiled into one Aho-Corasick automaton, so every
+paragraph (body text and table cells alike) is scanned exactly once no matter
+how many rules there are. Matching works on the concatenated text of all
+<w:t> nodes of a paragraph, which means patterns that Word split across
+several runs are still found. The replacement text goes into the run where
+the match starts, so that run's formatting is kept.
+"""
+from bisect import bisect_right
+from collections import deque
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_P = '{%s}p' % W_NS
+W_T = '{%s}t' % W_NS
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+
+def element_text(element):
+    """Concatenated text of every <w:t> below an lxml element."""
+    return ''.join(t.text or '' for t in element.iter(W_T))
+
+
+def _owning_paragraph(t):
+    parent = t.getparent()
+    while parent is not None and parent.tag != W_P:
+        parent = parent.getparent()
+    return parent
+
+
+class ReplacementEngine:
+    def __init__(self, replacements):
+        if hasattr(replacements, 'items'):
+            replacements = replacements.items()
+        self.patterns = []
+        self.values = []
+        seen = set()
+        for old, new in replacements:
+            if not old:
+                raise ValueError("Replacement pattern must not be empty")
+            if old in seen:
+                raise ValueError(f"Duplicate replacement pattern: {old!r}")
+            seen.add(old)
+            self.patterns.append(old)
+            self.values.append(new)
+        self._build()
+
+    def _build(self):
+        # goto[state] maps a character to the next state, out[state] holds the
+        # indexes of the rules that end in that state (including via fail links).
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for idx, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(idx)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Leftmost-longest, non-overlapping matches as (start, end, rule) tuples."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        candidates = []
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for idx in out[state]:
+                candidates.append((pos + 1 - len(patterns[idx]), pos + 1, idx))
+        if not candidates:
+            return []
+
+        candidates.sort(key=lambda m: (m[0], m[0] - m[1]))
+        matches = []
+        cursor = 0
+        for start, end, idx in candidates:
+            if start >= cursor:
+                matches.append((start, end, idx))
+                cursor = end
+        return matches
+
+    def replace(self, text):
+        """Return (new_text, matches) for a plain string."""
+        matches = self.find(text)
+        if not matches:
+            return text, matches
+        parts = []
+        cursor = 0
+        for start, end, idx in matches:
+            parts.append(text[cursor:start])
+            parts.append(self.values[idx])
+            cursor = end
+        parts.append(text[cursor:])
+        return ''.join(parts), matches
+
+    def apply_to_paragraph(self, paragraph, hits=None):
+        """Replace inside one <w:p> element. Returns the number of matches."""
+        nodes = [t for t in paragraph.iter(W_T) if _owning_paragraph(t) is paragraph]
+        texts = [t.text or '' for t in nodes]
+        full = ''.join(texts)
+        matches = self.find(full)
+        if not matches:
+            return 0
+
+        # Spans of the non-empty text nodes, used to map match positions
+        # back to the run they belong to.
+        spans = []
+        offset = 0
+        for i, text in enumerate(texts):
+            if text:
+                spans.append((offset, offset + len(text), i))
+            offset += len(text)
+        span_starts = [span[0] for span in spans]
+
+        def span_at(pos):
+            return spans[bisect_right(span_starts, pos) - 1]
+
+        pieces = [[] for _ in nodes]
+
+        def keep(a, b):
+            # Copy unmatched original text in [a, b) back to the nodes it came from
+            while a < b:
+                _, span_end, i = span_at(a)
+                stop = min(b, span_end)
+                pieces[i].append(full[a:stop])
+                a = stop
+
+        cursor = 0
+        for start, end, idx in matches:
+            keep(cursor, start)
+            pieces[span_at(start)[2]].append(self.values[idx])
+            cursor = end
+            if hits is not None:
+                hits[self.patterns[idx]] += 1
+        keep(cursor, len(full))
+
+        for node, old, new in zip(nodes, texts, pieces):
+            new = ''.join(new)
+            if new != old:
+                node.text = new
+                node.set(XML_SPACE, 'preserve')
+        return len(matches)
+
+    def apply_to_element(self, element, hits=None):
+        """Replace in every paragraph below an lxml element (body, table, row, cell...)."""
+        if hits is None:
+            hits = dict.fromkeys(self.patterns, 0)
+        if element.tag == W_P:
+            self.apply_to_paragraph(element, hits)
+        else:
+            for paragraph in element.iter(W_P):
+                self.apply_to_paragraph(paragraph, hits)
+        return hits
+
+    def apply(self, doc):
+        """
+        Replace in the body of a python-docx Document: paragraphs and table
+        cells in one scan. Returns a per-rule hit report {pattern: count}.
+        """
+        return self.apply_to_element(doc.element.body)
+
+    def print_report(self, hits):
+        for old, new in zip(self.patterns, self.values):
+            print(f"Replaced {hits.get(old, 0)}x: {old} -> {new}")
@@ -0,0 +1,209 @@
+"""
+DOCX save that copies unchanged zip members from the source package.
+
+Document.save() re-serializes and re-deflates every part, so touching one
+table cell in a proposal full of images still recompresses all the media.
+open_document() remembers where the document was loaded from and the
+identity of each binary part's bytes; save_document() then writes the
+package python-docx would write, but copies every member that is still
+clean byte for byte from the source zip - without recompressing it - and
+deflates only the dirty ones, at a configurable level and optionally on
+several threads. An XML part is clean when its serialization is the member
+it was loaded from (same size and CRC-32, then the same bytes).
+
+    doc = open_document("v9.docx")
+    ...edit doc...
+    report = save_document(doc, "v10.docx", level=6, threads=4)
+    # {'copied': 14, 'deflated': 1, 'bytes_copied': ..., 'bytes_deflated': ...}
+"""
+import mmap
+import os
+import struct
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from docx import Document
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.part import XmlPart
+from docx.opc.pkgwriter import _ContentTypesItem
+
+DEFAULT_LEVEL = 6
+# Below this many dirty bytes a thread pool costs more than it saves
+PARALLEL_MIN_BYTES = 1 << 20
+LOCAL_HEADER = struct.Struct('<4s22xHH')
+# Headers of the zip file format (APPNOTE 4.3.7, 4.3.12, 4.3.16), without zip64
+ZIP_LOCAL = struct.Struct('<4s5H3L2H')
+ZIP_CENTRAL = struct.Struct('<4s6H3L5H2L')
+ZIP_END = struct.Struct('<4s4H2LH')
+ZIP_VERSION = 20
+ZIP_UNIX = 3
+ZIP_UTF8 = 0x800
+
+
+def _members(doc):
+    """(member name, part or None, serialize()) in the order python-docx writes them."""
+    package = doc.part.package
+    parts = package.parts
+    yield CONTENT_TYPES_URI.membername, None, lambda: _ContentTypesItem.from_parts(parts).blob
+    yield PACKAGE_URI.rels_uri.membername, None, lambda: package.rels.xml
+    for part in parts:
+        yield part.partname.membername, part, lambda part=part: part.blob
+        if len(part.rels):
+            yield part.partname.rels_uri.membername, None, lambda part=part: part.rels.xml
+
+
+def _is_binary(part):
+    return part is not None and not isinstance(part, XmlPart)
+
+
+def open_document(path):
+    """Document(path) that remembers its source package for save_document()."""
+    doc = Document(path)
+    fingerprints = {}
+    blobs = []
+    for name, part, _ in _members(doc):
+        if _is_binary(part):
+            # Binary parts are compared by identity, so keep their bytes alive
+            blobs.append(part.blob)
+            fingerprints[name] = id(part.blob)
+    doc._save_source = (os.path.abspath(path), fingerprints, blobs)
+    return doc
+
+
+def _raw_data(source, info):
+    """The compressed bytes of a member, straight from the mapped source zip."""
+    signature, name_length, extra_length = LOCAL_HEADER.unpack_from(source, info.header_offset)
+    if signature != b'PK\x03\x04':
+        raise zipfile.BadZipFile(f"Bad local header for {info.filename}")
+    start = info.header_offset + LOCAL_HEADER.size + name_length + extra_length
+    return source[start:start + info.compress_size]
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+
+class _ZipWriter:
+    """
+    Writes a zip of members whose compressed bytes, CRC and sizes are
+    already known; zipfile has no public way to add such data unchanged.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+        self.central = []
+
+    def _write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
+
+    def add(self, name, data, compress_type, crc, file_size, date_time, external_attr):
+        if max(self.offset, len(data), file_size) > 0xFFFFFFFF or len(self.central) >= 0xFFFF:
+            raise zipfile.LargeZipFile("Package too large to save without zip64")
+        encoded = name.encode('utf-8')
+        flags = ZIP_UTF8 if not name.isascii() else 0
+        time_, date = _dos_time(date_time)
+        fields = (flags, compress_type, time_, date, crc, len(data), file_size, len(encoded))
+        self.central.append(ZIP_CENTRAL.pack(b'PK\x01\x02', ZIP_UNIX << 8 | ZIP_VERSION, ZIP_VERSION, *fields,
+                                             0, 0, 0, 0, external_attr, self.offset) + encoded)
+        self._write(ZIP_LOCAL.pack(b'PK\x03\x04', ZIP_VERSION, *fields, 0) + encoded)
+        self._write(data)
+
+    def close(self):
+        start = self.offset
+        for entry in self.central:
+            self._write(entry)
+        count = len(self.central)
+        self._write(ZIP_END.pack(b'PK\x05\x06', 0, 0, count, count, self.offset - start, start, 0))
+
+
+def _deflate(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data)
+
+
+def save_document(doc, output, level=DEFAULT_LEVEL, threads=None):
+    """
+    Save `doc` to `output` (a path or a binary file object). Members that are
+    unchanged since open_document() are copied raw from the source package;
+    the others are deflated at `level` on up to `threads` threads. Returns a
+    {'copied', 'deflated', 'bytes_copied', 'bytes_deflated'} report.
+    """
+    for part in doc.part.package.parts:
+        part.before_marshal()
+    source_path, fingerprints, _ = getattr(doc, '_save_source', (None, {}, None))
+
+    with ExitStack() as stack:
+        source = source_zip = None
+        if source_path:
+            source_file = stack.enter_context(open(source_path, 'rb'))
+            source = stack.enter_context(mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ))
+            source_zip = stack.enter_context(zipfile.ZipFile(source_file))
+
+        members = []
+        for name, part, serialize in _members(doc):
+            info = None
+            if source_zip is not None:
+                try:
+                    info = source_zip.getinfo(name)
+                except KeyError:
+                    pass
+            # Encrypted members cannot be copied raw
+            if info is not None and info.flag_bits & 0x1:
+                info = None
+            if _is_binary(part):
+                data = part.blob
+                clean = info is not None and fingerprints.get(name) == id(data)
+            else:
+                data = serialize()
+                clean = (info is not None and len(data) == info.file_size and zlib.crc32(data) == info.CRC
+                         and source_zip.read(info) == data)
+            if clean:
+                members.append((name, info, _raw_data(source, info)))
+            else:
+                members.append((name, None, data))
+        return _write(members, output, level, threads)
+
+
+def _write(members, output, level, threads):
+    report = {'copied': 0, 'deflated': 0, 'bytes_copied': 0, 'bytes_deflated': 0}
+    dirty = [data for _, info, data in members if info is None]
+    if threads and threads > 1 and sum(map(len, dirty)) >= PARALLEL_MIN_BYTES:
+        # zlib releases the GIL while compressing
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            compressed = iter(pool.map(lambda data: _deflate(data, level), dirty))
+    else:
+        compressed = (_deflate(data, level) for data in dirty)
+
+    date_time = time.localtime(time.time())[:6]
+    tmp_path = None if hasattr(output, 'write') else '%s.%d.tmp' % (output, os.getpid())
+    try:
+        with ExitStack() as stack:
+            target = output if tmp_path is None else stack.enter_context(open(tmp_path, 'wb'))
+            zout = _ZipWriter(target)
+            for name, info, data in members:
+                if info is not None:
+                    zout.add(name, data, info.compress_type, info.CRC, info.file_size, info.date_time,
+                             info.external_attr)
+                    report['copied'] += 1
+                    report['bytes_copied'] += len(data)
+                else:
+                    size = len(data)
+                    data, crc = next(compressed)
+                    zout.add(name, data, zipfile.ZIP_DEFLATED, crc, size, date_time, 0o600 << 16)
+                    report['deflated'] += 1
+                    report['bytes_deflated'] += size
+            zout.close()
+        if tmp_path is not None:
+            os.replace(tmp_path, output)
+    except BaseException:
+        # A failed save must not leave its partial file behind
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return report
@@ -0,0 +1,250 @@
+"""
+Streaming DOCX patcher.
+
+Patches word/document.xml without building the python-docx object model:
+the part is read with an incremental XML parser, every top-level body block
+(paragraph, table, section properties) is patched as soon as its closing tag
+has been parsed, written out and dropped. Only one block is held in memory
+at a time, and all other package members are copied through unchanged.
+
+    patcher = StreamPatcher()
+    patcher.delete_rows("СХД", "Raidix")
+    patcher.set_cell("YADRO G4208P G3", "1 шт.", current="2 шт.")
+    patcher.replace_text({"MES5324": "MES2300-24"})
+    report = patcher.patch("v9.docx", "v10.docx")
+"""
+import argparse
+import os
+import shutil
+import zipfile
+
+from lxml import etree
+
+from docx_replace import W_NS, W_P, W_T, XML_SPACE, ReplacementEngine, element_text
+from instrumentation import stage
+
+DOCUMENT_PART = 'word/document.xml'
+W_BODY = '{%s}body' % W_NS
+W_TR = '{%s}tr' % W_NS
+W_TC = '{%s}tc' % W_NS
+W_R = '{%s}r' % W_NS
+W_TCPR = '{%s}tcPr' % W_NS
+W_GRIDSPAN = '{%s}gridSpan' % W_NS
+W_VAL = '{%s}val' % W_NS
+
+
+def row_cells(tr):
+    """(grid column, <w:tc>) pairs of a table row, honouring horizontal merges."""
+    column = 0
+    for tc in tr.iterchildren(W_TC):
+        yield column, tc
+        span = tc.find('%s/%s' % (W_TCPR, W_GRIDSPAN))
+        column += int(span.get(W_VAL)) if span is not None else 1
+
+
+def cell_text(tc):
+    """Cell text in the same form as python-docx: paragraphs joined by newlines."""
+    return '\n'.join(element_text(p) for p in tc.iterchildren(W_P))
+
+
+def set_cell_text(tc, text):
+    """Replace the cell content with `text`, keeping the first run's formatting."""
+    paragraphs = list(tc.iterchildren(W_P))
+    if not paragraphs:
+        paragraphs = [etree.SubElement(tc, W_P)]
+    first = paragraphs[0]
+    for extra in paragraphs[1:]:
+        tc.remove(extra)
+
+    runs = list(first.iter(W_R))
+    if runs:
+        run = runs[0]
+        for extra in runs[1:]:
+            extra.getparent().remove(extra)
+        for child in list(run):
+            if child.tag != '{%s}rPr' % W_NS:
+                run.remove(child)
+    else:
+        run = etree.SubElement(first, W_R)
+    t = etree.SubElement(run, W_T)
+    t.text = text
+    t.set(XML_SPACE, 'preserve')
+
+
+class _Context:
+    """
+    Serializes blocks as lxml writes them inside a chain of ancestors
+    [(tag, nsmap, attrib)], root first: a namespace declared by an ancestor
+    is not repeated on the block. `start` holds the start tags of the chain.
+    """
+
+    def __init__(self, ancestors):
+        shell = holder = None
+        for tag, nsmap, attrib in ancestors:
+            inherited = holder.nsmap if holder is not None else {}
+            own = {prefix: uri for prefix, uri in nsmap.items() if inherited.get(prefix) != uri}
+            if holder is None:
+                shell = holder = etree.Element(tag, dict(attrib), nsmap=own)
+            else:
+                holder = etree.SubElement(holder, tag, dict(attrib), nsmap=own)
+        self.shell, self.holder = shell, holder
+        outer = b''.join(StreamPatcher._end_tag(element) for element in holder.iterancestors())
+        self.end = StreamPatcher._end_tag(holder) + outer
+        # With no children the innermost element is written as <tag .../>
+        empty = etree.tostring(shell, encoding='UTF-8', xml_declaration=False)
+        self.start = empty[:len(empty) - len(outer) - 2] + b'>'
+
+    def serialize(self, element):
+        """`element` as written in this context; it is moved out of its own tree."""
+        self.holder.append(element)
+        try:
+            data = etree.tostring(self.shell, encoding='UTF-8', xml_declaration=False)
+        finally:
+            self.holder.remove(element)
+        return data[len(self.start):len(data) - len(self.end)]
+
+
+class StreamPatcher:
+    def __init__(self):
+        self.row_deletions = []
+        self.cell_rewrites = []
+        self.replacements = []
+
+    def delete_rows(self, *texts):
+        """Delete every table row whose text contains all of `texts`."""
+        self.row_deletions.append(texts)
+        return self
+
+    def set_cell(self, row_text, text, column=None, current=None):
+        """
+        In rows containing `row_text`, rewrite cells to `text`. Restrict to a
+        grid `column` and/or to cells whose stripped text equals `current`.
+        """
+        self.cell_rewrites.append((row_text, text, column, current))
+        return self
+
+    def replace_text(self, replacements):
+        if hasattr(replacements, 'items'):
+            replacements = replacements.items()
+        self.replacements.extend(replacements)
+        return self
+
+    def _patch_rows(self, block, report):
+        for tr in list(block.iter(W_TR)):
+            text = element_text(tr)
+            if any(all(t in text for t in texts) for texts in self.row_deletions):
+                tr.getparent().remove(tr)
+                report['rows_deleted'] += 1
+                continue
+            for row_text, new_text, column, current in self.cell_rewrites:
+                if row_text not in text:
+                    continue
+                for grid_column, tc in row_cells(tr):
+                    if column is not None and grid_column != column:
+                        continue
+                    if current is not None and cell_text(tc).strip() != current:
+                        continue
+                    set_cell_text(tc, new_text)
+                    report['cells_rewritten'] += 1
+
+    def patch_xml(self, source, target):
+        """Stream a document.xml from file object `source` into `target`."""
+        engine = ReplacementEngine(self.replacements) if self.replacements else None
+        report = {'rows_deleted': 0, 'cells_rewritten': 0, 'blocks': 0}
+        hits = dict.fromkeys(engine.patterns, 0) if engine else {}
+        touch_rows = bool(self.row_deletions or self.cell_rewrites)
+
+        # Blocks are serialized in the context of the root (and body), so the
+        # namespaces declared there are not repeated on every block
+        contexts = {}
+        closing = []
+        depth = 0
+        target.write(b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\r\n")
+        for event, element in etree.iterparse(source, events=('start', 'end'), huge_tree=True):
+            if event == 'start':
+                depth += 1
+                if depth == 1:
+                    root = (element.tag, element.nsmap, element.attrib)
+                    contexts[1] = _Context([root])
+                    target.write(contexts[1].start)
+                    closing.append(self._end_tag(element))
+                elif depth == 2 and element.tag == W_BODY:
+                    contexts[2] = _Context([root, (element.tag, element.nsmap, element.attrib)])
+                    target.write(contexts[2].start[len(contexts[1].start):])
+                    closing.append(self._end_tag(element))
+                continue
+
+            depth -= 1
+            parent = element.getparent()
+            top_level = (depth == 2 and parent is not None and parent.tag == W_BODY) or \
+                (depth == 1 and element.tag != W_BODY)
+            if top_level:
+                if touch_rows:
+                    self._patch_rows(element, report)
+                if engine:
+                    engine.apply_to_element(element, hits)
+                # Serializing moves the block out of the parsed tree, so
+                # processed blocks are dropped right away to keep memory flat
+                target.write(contexts[depth].serialize(element))
+                report['blocks'] += 1
+            elif depth < 2:
+                target.write(closing.pop())
+        report['replacements'] = hits
+        return report
+
+    @staticmethod
+    def _end_tag(element):
+        qname = etree.QName(element)
+        prefix = next((p for p, uri in element.nsmap.items() if uri == qname.namespace), None)
+        name = '%s:%s' % (prefix, qname.localname) if prefix else qname.localname
+        return ('</%s>' % name).encode()
+
+    def patch(self, src, dst):
+        """Patch DOCX `src` into `dst`; all parts except the document are copied as-is."""
+        if os.path.abspath(src) == os.path.abspath(dst):
+            raise ValueError("Source and destination must differ")
+        # Load, mutate and save are interleaved here, so the patch is one stage
+        with stage('mutate', 'stream', source=str(src), output=str(dst)) as record, \
+                zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, 'w', zipfile.ZIP_DEFLATED) as zout:
+            report = None
+            for info in zin.infolist():
+                if info.filename == DOCUMENT_PART:
+                    out_info = zipfile.ZipInfo(info.filename, info.date_time)
+                    out_info.compress_type = zipfile.ZIP_DEFLATED
+                    with zin.open(info) as source, zout.open(out_info, 'w', force_zip64=True) as target:
+                        report = self.patch_xml(source, target)
+                    record.update(rows_deleted=report['rows_deleted'], cells_rewritten=report['cells_rewritten'])
+                else:
+                    with zin.open(info) as source, zout.open(info, 'w') as target:
+                        shutil.copyfileobj(source, target)
+        if report is None:
+            raise ValueError(f"{src} has no {DOCUMENT_PART}")
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Patch DOCX files without loading them into python-docx")
+    parser.add_argument('inputs', nargs='+', help="DOCX files to patch")
+    parser.add_argument('-o', '--output', required=True, help="Output file, or directory when patching several files")
+    parser.add_argument('--delete-row', action='append', default=[], metavar='TEXT', help="Delete rows containing TEXT")
+    parser.add_argument('--replace', action='append', nargs=2, default=[], metavar=('OLD', 'NEW'))
+    parser.add_argument('--set-cell', action='append', nargs=3, default=[], metavar=('ROW_TEXT', 'CURRENT', 'NEW'),
+                        help="In rows containing ROW_TEXT, rewrite cells whose text is CURRENT to NEW")
+    args = parser.parse_args()
+
+    patcher = StreamPatcher()
+    for text in args.delete_row:
+        patcher.delete_rows(text)
+    patcher.replace_text(args.replace)
+    for row_text, current, new in args.set_cell:
+        patcher.set_cell(row_text, new, current=current)
+
+    many = len(args.inputs) > 1 or os.path.isdir(args.output)
+    for src in args.inputs:
+        dst = os.path.join(args.output, os.path.basename(src)) if many else args.output
+        report = patcher.patch(src, dst)
+        print(f"{src} -> {dst}: {report}")
+
+
+if __name__ == '__main__':
+    main()
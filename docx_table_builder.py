@@ -0,0 +1,140 @@
+"""
+One-pass construction of python-docx tables.
+
+Filling a table through python-docx costs a proxy object, a lookup of the
+grid and a run of small element insertions per cell - table.add_row(),
+cell.text, cell.width and a fresh w:shd per header cell - which adds up to
+seconds for a specification of a few thousand lines. TableBuilder writes
+the w:tbl directly: the cell properties of every column (width, shading,
+alignment, bold) are serialized once and shared by all rows, and the rows
+are parsed into the table a chunk at a time, so a row iterable of any
+length is consumed lazily.
+
+    spec = TableSpec(widths=(Inches(0.5), Inches(3.0), Inches(0.8), Inches(1.5)), header_fill='E6E6E6')
+    builder = build_table(doc, ['№', 'Наименование', 'Кол-во', 'Цена (₽)'], rows, spec)
+    builder.add_row([Cell('ИТОГО:', span=3, bold=True, align='right'), Cell('32 151 159', bold=True)])
+    builder.table                                       # the docx.table.Table
+
+The result is what python-docx itself writes for the same content (fixed
+layout, a width on every cell, line breaks and tabs as w:br and w:tab).
+"""
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.shared import Length
+from docx.table import Table
+
+CHUNK_ROWS = 500
+
+# widths: docx Length per column; aligns: 'left', 'center', 'right' or None per column
+TableSpec = namedtuple('TableSpec', 'widths style fixed header_fill header_bold aligns',
+                       defaults=('Table Grid', True, None, True, None))
+# A cell with properties of its own; plain values are written with the column's
+Cell = namedtuple('Cell', 'text span bold align', defaults=(1, False, None))
+
+
+def _text_xml(text):
+    """Run content for `text`, as cell.text = text writes it."""
+    parts = []
+    for number, line in enumerate(text.split('\n')):
+        if number:
+            parts.append('<w:br/>')
+        for index, chunk in enumerate(line.split('\t')):
+            if index:
+                parts.append('<w:tab/>')
+            if chunk:
+                space = ' xml:space="preserve"' if chunk != chunk.strip() else ''
+                parts.append('<w:t%s>%s</w:t>' % (space, escape(chunk)))
+    return ''.join(parts)
+
+
+def _paragraph_xml(text, bold, align):
+    ppr = '<w:pPr><w:jc w:val="%s"/></w:pPr>' % align if align else ''
+    # An empty cell still gets its (empty) run, as cell.text = '' writes it
+    rpr = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    return '<w:p>%s<w:r>%s%s</w:r></w:p>' % (ppr, rpr, _text_xml(text))
+
+
+class TableBuilder:
+    def __init__(self, doc, header, spec):
+        self.spec = spec
+        self._twips = [Length(width).twips for width in spec.widths]
+        self._aligns = list(spec.aligns or [None] * len(self._twips))
+        # Cell properties are serialized once per column and shared by every row
+        self._tc_pr = ['<w:tcPr><w:tcW w:type="dxa" w:w="%d"/></w:tcPr>' % twips for twips in self._twips]
+        shading = '<w:shd w:val="clear" w:color="auto" w:fill="%s"/>' % spec.header_fill if spec.header_fill else ''
+        header_xml = ''.join(
+            '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="%d"/>%s</w:tcPr>%s</w:tc>'
+            % (twips, shading, _paragraph_xml(str(title), spec.header_bold, None))
+            for twips, title in zip(self._twips, header))
+        tbl = parse_xml(
+            '<w:tbl %s><w:tblPr><w:tblW w:type="auto" w:w="0"/>%s'
+            '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0"'
+            ' w:noVBand="1" w:val="04A0"/></w:tblPr><w:tblGrid>%s</w:tblGrid><w:tr>%s</w:tr></w:tbl>'
+            % (nsdecls('w'), '<w:tblLayout w:type="fixed"/>' if spec.fixed else '',
+               ''.join('<w:gridCol w:w="%d"/>' % twips for twips in self._twips), header_xml))
+        body = doc.element.body
+        if body.sectPr is not None:
+            body.sectPr.addprevious(tbl)
+        else:
+            body.append(tbl)
+        self._table = Table(tbl, doc._body)
+        if spec.style:
+            self._table.style = spec.style
+        self._tbl = tbl
+        self._pending = []
+        self.count = 0
+
+    @property
+    def table(self):
+        """The docx.table.Table, with every row added so far."""
+        self.flush()
+        return self._table
+
+    def _cell_xml(self, column, value):
+        if not isinstance(value, Cell):
+            text = value if isinstance(value, str) else str(value)
+            return '<w:tc>%s%s</w:tc>' % (self._tc_pr[column], _paragraph_xml(text, False, self._aligns[column]))
+        align = value.align or self._aligns[column]
+        if value.span > 1:
+            tc_pr = '<w:tcPr><w:tcW w:type="dxa" w:w="%d"/><w:gridSpan w:val="%d"/></w:tcPr>' % (
+                sum(self._twips[column:column + value.span]), value.span)
+        else:
+            tc_pr = self._tc_pr[column]
+        return '<w:tc>%s%s</w:tc>' % (tc_pr, _paragraph_xml(str(value.text), value.bold, align))
+
+    def _row_xml(self, row):
+        cells = []
+        column = 0
+        for value in row:
+            cells.append(self._cell_xml(column, value))
+            column += value.span if isinstance(value, Cell) else 1
+        return '<w:tr>%s</w:tr>' % ''.join(cells)
+
+    def flush(self):
+        """Parse the pending rows into the table."""
+        if self._pending:
+            chunk = parse_xml('<w:tbl %s>%s</w:tbl>' % (nsdecls('w'), ''.join(self._pending)))
+            self._tbl.extend(list(chunk))
+            self._pending = []
+
+    def add_row(self, row):
+        """Append a row of plain values and/or Cells (a Cell can span several columns)."""
+        self._pending.append(self._row_xml(row))
+        self.count += 1
+        if len(self._pending) >= CHUNK_ROWS:
+            self.flush()
+        return self
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add_row(row)
+        self.flush()
+        return self
+
+
+def build_table(doc, header, rows, spec):
+    """Append a table with `header` and `rows` (any iterable) to the end of `doc`'s body."""
+    return TableBuilder(doc, header, spec).add_rows(rows)
@@ -0,0 +1,145 @@
+"""
+Persistent cache of parsed TrueType metrics for fpdf.
+
+FPDF.add_font(..., uni=True) parses the glyph tables of the TTF on every
+call unless it can write a pickle next to the font file (which it cannot for
+fonts under /usr/share, and which goes stale silently if the file changes).
+Here each TTF is parsed once, its metrics and character widths are stored in
+the cache directory under the SHA-256 of the font file, and every later PDF -
+in this or any other process - registers the font straight from the cache.
+Character widths are stored as a packed unsigned 16-bit array.
+
+    pdf = PDF()
+    add_font(pdf, 'DejaVu', '', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+"""
+import hashlib
+import os
+import pickle
+import re
+from array import array
+
+import fpdf.fpdf
+from fpdf.ttfonts import TTFontFile
+
+from cache_paths import cache_dir
+
+FORMAT_VERSION = 1
+MAX_SUBSETS = 256
+
+_metrics = {}
+_hashes = {}
+_subsets = {}
+
+
+def file_hash(path):
+    """SHA-256 of a font file, memoized per (path, mtime, size) within the process."""
+    st = os.stat(path)
+    stamp = (path, st.st_mtime_ns, st.st_size)
+    if stamp not in _hashes:
+        with open(path, 'rb') as f:
+            _hashes[stamp] = hashlib.sha256(f.read()).hexdigest()
+    return _hashes[stamp]
+
+
+def parse_font(path):
+    """Metrics of a TTF in the form FPDF.add_font stores them."""
+    ttf = TTFontFile()
+    ttf.getMetrics(path)
+    return {
+        'version': FORMAT_VERSION,
+        'name': re.sub('[ ()]', '', ttf.fullName),
+        'type': 'TTF',
+        'desc': {
+            'Ascent': int(round(ttf.ascent, 0)),
+            'Descent': int(round(ttf.descent, 0)),
+            'CapHeight': int(round(ttf.capHeight, 0)),
+            'Flags': ttf.flags,
+            'FontBBox': "[%s %s %s %s]" % tuple(int(round(v, 0)) for v in ttf.bbox[:4]),
+            'ItalicAngle': int(ttf.italicAngle),
+            'StemV': int(round(ttf.stemV, 0)),
+            'MissingWidth': int(round(ttf.defaultWidth, 0)),
+        },
+        'up': round(ttf.underlinePosition),
+        'ut': round(ttf.underlineThickness),
+        'originalsize': os.path.getsize(path),
+        'cw': array('H', ttf.charWidths),
+    }
+
+
+def font_metrics(path):
+    """(cache file stem, metrics) of a TTF, parsing it only if no process has done so yet."""
+    path = os.path.abspath(path)
+    digest = file_hash(path)
+    if digest in _metrics:
+        return _metrics[digest]
+
+    stem = os.path.join(cache_dir('fonts'), digest)
+    metrics = None
+    try:
+        with open(stem + '.pkl', 'rb') as f:
+            metrics = pickle.load(f)
+        if metrics.get('version') != FORMAT_VERSION:
+            metrics = None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        metrics = None
+
+    if metrics is None:
+        metrics = parse_font(path)
+        tmp_path = '%s.%d.tmp' % (stem, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(metrics, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, stem + '.pkl')
+
+    _metrics[digest] = (stem, metrics)
+    return _metrics[digest]
+
+
+def add_font(pdf, family, style, path):
+    """Drop-in for pdf.add_font(family, style, path, uni=True) backed by the font cache."""
+    family = family.lower()
+    style = style.upper()
+    if style == 'IB':
+        style = 'BI'
+    fontkey = family + style
+    if fontkey in pdf.fonts:
+        return
+    path = os.path.abspath(path)
+    stem, metrics = font_metrics(path)
+    # Same registration as FPDF.add_font; 'unifilename' makes fpdf keep its
+    # .cw127.pkl side file next to our cache entry rather than the font
+    subset = list(range(0, 57)) if hasattr(pdf, 'str_alias_nb_pages') else list(range(0, 32))
+    pdf.fonts[fontkey] = {
+        'i': len(pdf.fonts) + 1, 'type': metrics['type'],
+        'name': metrics['name'], 'desc': dict(metrics['desc']),
+        'up': metrics['up'], 'ut': metrics['ut'],
+        'cw': metrics['cw'],
+        'ttffile': path, 'fontkey': fontkey,
+        'subset': subset, 'unifilename': stem + '.pkl',
+    }
+    pdf.font_files[fontkey] = {'length1': metrics['originalsize'], 'type': 'TTF', 'ttffile': path}
+    pdf.font_files[path] = {'type': 'TTF'}
+
+
+class SubsetCachingTTFontFile(TTFontFile):
+    """TTFontFile whose makeSubset() results are memoized per (font file, set of characters)."""
+
+    def makeSubset(self, file, subset):
+        key = (file_hash(file), frozenset(subset))
+        cached = _subsets.get(key)
+        if cached is None:
+            if len(_subsets) >= MAX_SUBSETS:
+                _subsets.clear()
+            stream = super().makeSubset(file, subset)
+            cached = _subsets[key] = (stream, self.codeToGlyph, self.maxUni)
+        stream, self.codeToGlyph, self.maxUni = cached
+        return stream
+
+
+def install_subset_cache():
+    """
+    Make every FPDF in this process reuse font subsets it has embedded before.
+    Subsetting re-reads the TTF on each output and dominates the time of a
+    small PDF; long-running processes (batch workers, the render service)
+    mostly embed the same character sets over and over.
+    """
+    fpdf.fpdf.TTFontFile = SubsetCachingTTFontFile
@@ -5,6 +5,11 @@ from docx.enum.table import WD_TABLE_ALIGNMENT
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
 import datetime
+from catalog import load_catalog
+from docx_table_builder import Cell, TableSpec, build_table
+from pricing import RunningTotals, format_qty, format_rub
+from section_cache import render_section
+from instrumentation import stage
 
 def create_element(name):
     return OxmlElement(name)
@@ -65,45 +70,40 @@ def set_cell_border(cell, **kwargs):
                 if key in edge_data:
                     element.set(qn('w:{}'.format(key)), str(edge_data[key]))
 
-def generate_proposal():
-    doc = Document()
-
-    # Styles
-    style = doc.styles['Normal']
-    font = style.font
+def apply_styles(doc):
+    # Style changes are document-wide (the title page paragraphs use
+    # 'Normal'), so they always run and stay out of the cached sections
+    # The baseline wrote these one title-page paragraph at a time; this is their net effect
+    font = doc.styles['Normal'].font
     font.name = 'Arial'
-    font.size = Pt(11)
+    font.size = Pt(9)
+    font.bold = True
+    font.color.rgb = RGBColor(128, 128, 128)
+
+    doc.styles['Heading 1'].font.color.rgb = RGBColor(0, 51, 102)
 
-    # Title Page
+def build_title_page(doc, date):
     doc.add_paragraph('\n\n\n\n\n')
     title = doc.add_paragraph('КОММЕРЧЕСКОЕ ПРЕДЛОЖЕНИЕ')
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    title.style.font.size = Pt(24)
-    title.style.font.bold = True
-    title.style.font.color.rgb = RGBColor(0, 51, 102)
 
     subtitle = doc.add_paragraph('Внедрение локального ИИ-агента\nдля автоматизации 1С:Предприятие')
     subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    subtitle.style.font.size = Pt(16)
-    subtitle.style.font.color.rgb = RGBColor(89, 89, 89)
 
     doc.add_paragraph('\n\n\n')
     
-    info = doc.add_paragraph(f'Дата: {datetime.datetime.now().strftime("%d.%m.%Y")}')
+    info = doc.add_paragraph(f'Дата: {date}')
     info.alignment = WD_ALIGN_PARAGRAPH.CENTER
     
     doc.add_paragraph('\n\n\n\n\n')
     
     footer = doc.add_paragraph('Конфиденциально. Только для внутреннего пользования.')
     footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    footer.style.font.size = Pt(9)
-    footer.style.font.color.rgb = RGBColor(128, 128, 128)
 
     doc.add_page_break()
 
-    # 1. Executive Summary
-    h1 = doc.add_heading('1. Резюме проекта', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+def build_summary(doc):
+    doc.add_heading('1. Резюме проекта', level=1)
     
     doc.add_paragraph(
         'Предлагаемое решение представляет собой программно-аппаратный комплекс для внедрения '
@@ -112,9 +112,8 @@ def generate_proposal():
         'во внешние облачные сервисы.'
     )
 
-    # 2. Proposed Solution (Optimal Only)
-    h1 = doc.add_heading('2. Предлагаемое решение', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+def build_solution(doc, items):
+    doc.add_heading('2. Предлагаемое решение', level=1)
 
     doc.add_paragraph(
         'Мы предлагаем оптимальную конфигурацию на базе высокопроизводительного сервера YADRO, '
@@ -122,67 +121,24 @@ def generate_proposal():
         'максимальную производительность, масштабируемость и надежность.'
     )
 
-    # Hardware Table
-    table = doc.add_table(rows=1, cols=4)
-    table.style = 'Table Grid'
-    table.autofit = False
-    table.allow_autofit = False
-    
-    # Set column widths
-    for cell in table.columns[0].cells: cell.width = Inches(0.5)
-    for cell in table.columns[1].cells: cell.width = Inches(3.0)
-    for cell in table.columns[2].cells: cell.width = Inches(0.8)
-    for cell in table.columns[3].cells: cell.width = Inches(1.5)
-
-    hdr_cells = table.rows[0].cells
-    hdr_cells[0].text = '№'
-    hdr_cells[1].text = 'Наименование'
-    hdr_cells[2].text = 'Кол-во'
-    hdr_cells[3].text = 'Цена (₽)'
-
-    # Make header bold and gray background
-    for cell in hdr_cells:
-        cell.paragraphs[0].runs[0].font.bold = True
-        tcPr = cell._tc.get_or_add_tcPr()
-        shd = OxmlElement('w:shd')
-        shd.set(qn('w:val'), 'clear')
-        shd.set(qn('w:color'), 'auto')
-        shd.set(qn('w:fill'), 'E6E6E6')
-        tcPr.append(shd)
-
-    items = [
-        ('Сервер YADRO G4208P G3 (2x Intel Xeon 6526Y, 512GB RAM, 1x NVIDIA H100 80GB, 2x 960GB SSD, 12x 3.5" HDD Slots)', 1, 32151159),
-        ('Коммутатор Eltex MES2300-24 (24x 1G, 4x 10G SFP+)', 1, 139000),
-        ('Лицензия "ИИ-Агент: Корпоративный" (бессрочная)', 1, 1500000),
-        ('Модуль интеграции 1С (расширение конфигурации)', 1, 450000),
-        ('Пакет внедрения и настройки (под ключ)', 1, 1200000)
-    ]
-
-    total = 0
-    for i, (name, qty, price) in enumerate(items, 1):
-        row_cells = doc.add_table(rows=1, cols=4).rows[0].cells # Hack to get new row cells
-        row_cells = table.add_row().cells
-        row_cells[0].text = str(i)
-        row_cells[1].text = name
-        row_cells[2].text = str(qty)
-        row_cells[3].text = f'{price:,.0f}'.replace(',', ' ')
-        total += price
-
-    # Total Row
-    row_cells = table.add_row().cells
-    row_cells[0].merge(row_cells[2])
-    row_cells[0].text = 'ИТОГО:'
-    row_cells[0].paragraphs[0].runs[0].font.bold = True
-    row_cells[0].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
-    row_cells[3].text = f'{total:,.0f}'.replace(',', ' ')
-    row_cells[3].paragraphs[0].runs[0].font.bold = True
+    # Hardware table, written in one pass (see docx_table_builder); `items` may
+    # be any iterable of (name, qty, unit_price[, group]), e.g. from row_sources,
+    # and is consumed row by row with the total kept as it goes
+    spec = TableSpec(widths=(Inches(0.5), Inches(3.0), Inches(0.8), Inches(1.5)), header_fill='E6E6E6')
+    totals = RunningTotals()
+    rows = ([str(i), name, format_qty(qty), format_rub(price, suffix='')]
+            for i, (name, qty, price, _) in enumerate(totals.lines(items), 1))
+    builder = build_table(doc, ['№', 'Наименование', 'Кол-во', 'Цена (₽)'], rows, spec)
+    builder.add_row([
+        Cell('ИТОГО:', span=3, bold=True, align='right'),
+        Cell(format_rub(totals.net, suffix=''), bold=True),
+    ]).flush()
 
     doc.add_paragraph('\n')
-    doc.add_paragraph(f'Общая стоимость проекта: {total:,.0f} рублей (без НДС).'.replace(',', ' '))
+    doc.add_paragraph(f"Общая стоимость проекта: {format_rub(totals.net, suffix='')} рублей (без НДС).")
 
-    # 3. Implementation Plan
-    h1 = doc.add_heading('3. План внедрения', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+def build_plan(doc):
+    doc.add_heading('3. План внедрения', level=1)
 
     doc.add_paragraph('Срок реализации проекта: 3 - 6 месяцев.')
 
@@ -198,9 +154,8 @@ def generate_proposal():
         run.bold = True
         p.add_run(f'\n{desc}')
 
-    # 4. Benefits
-    h1 = doc.add_heading('4. Ожидаемые результаты', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+def build_benefits(doc):
+    doc.add_heading('4. Ожидаемые результаты', level=1)
 
     benefits = [
         'Полная автономность и безопасность данных (On-Premise).',
@@ -212,14 +167,49 @@ def generate_proposal():
     for benefit in benefits:
         doc.add_paragraph(benefit, style='List Bullet')
 
-    # Footer with page numbers
-    section = doc.sections[0]
-    footer = section.footer
-    p = footer.paragraphs[0]
-    p.text = "Страница "
-    add_page_number(p.add_run())
+def generate_proposal(output='Commercial_Proposal_v13.docx', items=None):
+    """`items` replaces the catalog configuration in the solution table: any
+    iterable of (name, qty, unit_price[, group]), e.g. from row_sources."""
+    with stage('load', 'v13'):
+        doc = Document()
+        apply_styles(doc)
+
+    if items is None:
+        # Names and prices come from the shared catalog (shared/price_catalog.json)
+        catalog = load_catalog()
+        items = []
+        for sku, qty in [
+            ('yadro-g4208p', 1),
+            ('eltex-mes2300-24', 1),
+            ('ai-agent-license', 1),
+            ('integration-1c', 1),
+            ('turnkey-implementation', 1),
+        ]:
+            item = catalog.item(sku, price_list='proposal-v13')
+            items.append((item.name, qty, item.unit_price))
+
+    # Each section is re-rendered only when its code or inputs changed
+    render_section(doc, build_title_page, date=datetime.datetime.now().strftime("%d.%m.%Y"))
+    render_section(doc, build_summary)
+    if isinstance(items, list):
+        render_section(doc, build_solution, items=items)
+    else:
+        # A lazy source cannot be hashed without consuming it, so it skips the cache
+        with stage('render', 'build_solution'):
+            build_solution(doc, items)
+    render_section(doc, build_plan)
+    render_section(doc, build_benefits)
 
-    doc.save('Commercial_Proposal_v13.docx')
+    # Footer with page numbers
+    with stage('render', 'footer'):
+        section = doc.sections[0]
+        footer = section.footer
+        p = footer.paragraphs[0]
+        p.text = "Страница "
+        add_page_number(p.add_run())
+
+    with stage('save', 'v13', output=str(output)):
+        doc.save(output)
     print("Proposal v13 generated successfully.")
 
 if __name__ == "__main__":
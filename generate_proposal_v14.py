@@ -4,39 +4,38 @@ from docx.shared import Pt, Inches, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
 import datetime
+from section_cache import render_section
+from instrumentation import stage
 
-def create_proposal():
-    doc = Document()
-    
-    # Styles
-    style = doc.styles['Normal']
-    font = style.font
+def apply_styles(doc):
+    # Style changes are document-wide (the title page paragraphs use
+    # 'Normal'), so they always run and stay out of the cached sections
+    # The baseline wrote these one title-page paragraph at a time; this is their net effect
+    font = doc.styles['Normal'].font
     font.name = 'Arial'
-    font.size = Pt(11)
-    
-    # Title Page
+    font.size = Pt(16)
+    font.bold = True
+    font.color.rgb = RGBColor(80, 80, 80)
+
+    doc.styles['Heading 1'].font.color.rgb = RGBColor(0, 51, 102)
+
+def build_title_page(doc, date, customer):
     doc.add_paragraph('\n\n\n\n')
     title = doc.add_paragraph('КОММЕРЧЕСКОЕ ПРЕДЛОЖЕНИЕ')
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    title.style.font.size = Pt(24)
-    title.style.font.bold = True
-    title.style.font.color.rgb = RGBColor(0, 51, 102)
     
     subtitle = doc.add_paragraph('Внедрение нейросетей в бизнес-процессы\nи создание локального ИИ-контура')
     subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    subtitle.style.font.size = Pt(16)
-    subtitle.style.font.color.rgb = RGBColor(80, 80, 80)
     
     doc.add_paragraph('\n\n\n\n\n\n')
     
-    info = doc.add_paragraph(f'Дата: {datetime.datetime.now().strftime("%d.%m.%Y")}\nВерсия: 14.0 (Расширенная)\nДля: Руководства компании')
+    info = doc.add_paragraph(f'Дата: {date}\nВерсия: 14.0 (Расширенная)\nДля: {customer or "Руководства компании"}')
     info.alignment = WD_ALIGN_PARAGRAPH.RIGHT
     
     doc.add_page_break()
-    
-    # 1. Executive Summary
-    h1 = doc.add_heading('1. Резюме проекта', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+
+def build_summary(doc):
+    doc.add_heading('1. Резюме проекта', level=1)
     
     doc.add_paragraph(
         'Предлагается комплексное решение по внедрению технологий искусственного интеллекта (ИИ) '
@@ -49,10 +48,9 @@ def create_proposal():
         'с ускорителем NVIDIA H100, что обеспечивает полную автономность, безопасность данных '
         'и независимость от облачных сервисов.'
     )
-    
-    # 2. Key AI Modules
-    h1 = doc.add_heading('2. Ключевые направления внедрения ИИ', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+
+def build_modules(doc):
+    doc.add_heading('2. Ключевые направления внедрения ИИ', level=1)
     
     modules = [
         {
@@ -83,10 +81,9 @@ def create_proposal():
         runner.bold = True
         runner.font.color.rgb = RGBColor(0, 51, 102)
         p.add_run('\n' + mod['desc'])
-    
-    # 3. Technical Solution (Optimal Variant)
-    h1 = doc.add_heading('3. Техническое решение (Оптимальный вариант)', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+
+def build_solution(doc):
+    doc.add_heading('3. Техническое решение (Оптимальный вариант)', level=1)
     
     doc.add_paragraph('Единая платформа для всех ИИ-сервисов:')
     
@@ -111,9 +108,8 @@ def create_proposal():
         
     doc.add_paragraph('\nПримечание: Внешняя СХД исключена, так как сервер обладает достаточной внутренней емкостью.')
 
-    # 4. Implementation Plan
-    h1 = doc.add_heading('4. План внедрения', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+def build_plan(doc):
+    doc.add_heading('4. План внедрения', level=1)
     
     doc.add_paragraph('Срок реализации: 3-6 месяцев')
     
@@ -126,9 +122,8 @@ def create_proposal():
     for step in plan_steps:
         doc.add_paragraph(step, style='List Bullet')
 
-    # 5. Budget Estimate
-    h1 = doc.add_heading('5. Бюджетная оценка', level=1)
-    h1.style.font.color.rgb = RGBColor(0, 51, 102)
+def build_budget(doc, items):
+    doc.add_heading('5. Бюджетная оценка', level=1)
     
     budget_table = doc.add_table(rows=1, cols=3)
     budget_table.style = 'Table Grid'
@@ -137,14 +132,6 @@ def create_proposal():
     hdr_cells[1].text = 'Кол-во'
     hdr_cells[2].text = 'Стоимость (руб.)'
     
-    items = [
-        ('Сервер YADRO G4208P G3 (с NVIDIA H100)', 1, 32151159),
-        ('Коммутатор Eltex MES2300-24', 1, 139000),
-        ('Лицензии ПО (ОС, Виртуализация, СУБД)', 1, 3500000),
-        ('Бизнес-модули ИИ (OCR, Сметы, Видео)', 1, 2450000),
-        ('Работы по внедрению и настройке', 1, 4500000)
-    ]
-    
     total = 0
     for name, qty, price in items:
         row_cells = budget_table.add_row().cells
@@ -159,8 +146,32 @@ def create_proposal():
     row_cells[0].paragraphs[0].runs[0].bold = True
     row_cells[2].paragraphs[0].runs[0].bold = True
 
-    doc.save('Commercial_Proposal_v14.docx')
+def create_proposal(output='Commercial_Proposal_v14.docx', customer=None):
+    with stage('load', 'v14'):
+        doc = Document()
+        apply_styles(doc)
+    
+    items = [
+        ('Сервер YADRO G4208P G3 (с NVIDIA H100)', 1, 32151159),
+        ('Коммутатор Eltex MES2300-24', 1, 139000),
+        ('Лицензии ПО (ОС, Виртуализация, СУБД)', 1, 3500000),
+        ('Бизнес-модули ИИ (OCR, Сметы, Видео)', 1, 2450000),
+        ('Работы по внедрению и настройке', 1, 4500000)
+    ]
+    total = sum(price for _, _, price in items)
+    
+    # Each section is re-rendered only when its code or inputs changed
+    render_section(doc, build_title_page, date=datetime.datetime.now().strftime("%d.%m.%Y"), customer=customer)
+    render_section(doc, build_summary)
+    render_section(doc, build_modules)
+    render_section(doc, build_solution)
+    render_section(doc, build_plan)
+    render_section(doc, build_budget, items=items)
+
+    with stage('save', 'v14', output=str(output)):
+        doc.save(output)
     print(f"Proposal v14 generated successfully. Total: {total:,.0f} RUB")
+    return output
 
 if __name__ == '__main__':
     create_proposal()
@@ -1,9 +1,89 @@
 
-from fpdf import FPDF
+from pdf_templates import TemplatePDF
+from pdf_stream import StreamingPDF
 import datetime
+from catalog import load_catalog
+import font_cache
+from pdf_table import Table, ensure_space
+import text_layout
+from pricing import RunningTotals, format_rub
+from instrumentation import stage
 
-class PDF(FPDF):
+# (SKU, quantity) per variant, see shared/price_catalog.json
+BASIC_VARIANT = [
+    ('graviton-h22i', 1),
+    ('eltex-mes2300-24', 1),
+    ('alt-linux', 1),
+    ('postgres-pro', 1),
+    ('ml-platform', 1),
+    ('impl-basic-phase-1', 1),
+    ('impl-basic-phase-2', 1),
+    ('impl-basic-phase-3', 1),
+]
+
+OPTIMAL_VARIANT = [
+    ('yadro-g4208p', 1),
+    ('eltex-mes2300-24', 1),
+    ('alt-linux', 2),
+    ('postgres-pro', 1),
+    ('alt-virtualization', 2),
+    ('ml-platform', 1),
+    ('data-connectors', 1),
+    ('module-ocr', 1),
+    ('module-estimates', 1),
+    ('module-video', 1),
+    ('impl-optimal-phase-1', 1),
+    ('impl-optimal-phase-2', 1),
+    ('impl-optimal-phase-3', 1),
+]
+
+BUDGET_VARIANT = [
+    ('server-budget', 1),
+    ('storage-budget', 1),
+    ('switch-budget', 1),
+    ('linux-free', 1),
+    ('postgres-free', 1),
+    ('virtualization-free', 1),
+    ('ml-platform-opensource', 1),
+    ('connectors-opensource', 1),
+    ('impl-budget-phase-1', 1),
+    ('impl-budget-phase-2', 1),
+    ('impl-budget-phase-3', 1),
+]
+
+# variant: (title, lines, price list)
+VARIANTS = {
+    'basic': ('Базовый (Пилотный запуск)', BASIC_VARIANT, 'proposal-v15-basic'),
+    'optimal': ('Оптимальный (High-Load)', OPTIMAL_VARIANT, 'proposal-v15-optimal'),
+    'budget': ('Бюджетный (Open Source)', BUDGET_VARIANT, None),
+}
+
+FONTS = [
+    ('DejaVu', '', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'),
+    ('DejaVu', 'B', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+]
+
+INTRO = (
+    "Предлагаем рассмотреть внедрение автономной системы искусственного интеллекта для автоматизации "
+    "финансово-хозяйственных операций. Решение разворачивается в локальном контуре предприятия, "
+    "обеспечивая полную конфиденциальность данных и соответствие требованиям импортозамещения."
+)
+
+TERMS = [
+    "1. Цены на оборудование являются ориентировочными и уточняются на момент закупки.",
+    "2. Срок действия предложения: 30 календарных дней.",
+    "3. Условия оплаты: 50% предоплата, 50% после подписания акта приемки-передачи.",
+    "4. Гарантия на работы: 12 месяцев с момента ввода в эксплуатацию."
+]
+
+class PDF(StreamingPDF, TemplatePDF):
+    # Header, intro and terms are static: they are laid out once and reused
+    # as form XObjects (see pdf_templates); the footer carries the page number.
+    # stream_to() writes pages out as they are finished (see pdf_stream)
     def header(self):
+        self.use_template('header', self.draw_header, form=True)
+
+    def draw_header(self):
         self.set_font('DejaVu', 'B', 20)
         self.cell(0, 10, 'Коммерческое предложение', 0, 1, 'C')
         self.set_font('DejaVu', '', 12)
@@ -11,6 +91,15 @@ class PDF(FPDF):
         self.cell(0, 10, 'Локальный ИИ-агент для 1С:Предприятие', 0, 1, 'C')
         self.ln(10)
 
+    def draw_intro(self):
+        self.chapter_title('Описание решения')
+        self.chapter_body(INTRO)
+
+    def draw_terms(self):
+        self.chapter_title('Условия реализации')
+        for term in TERMS:
+            text_layout.multi_cell(self, 0, 7, term, align='L')
+
     def footer(self):
         self.set_y(-15)
         self.set_font('DejaVu', '', 8)
@@ -26,113 +115,110 @@ class PDF(FPDF):
     def chapter_body(self, body):
         self.set_font('DejaVu', '', 11)
         self.set_text_color(60, 60, 60)
-        self.multi_cell(0, 7, body)
+        # Line breaks of recurring paragraphs are computed once per process (see text_layout)
+        text_layout.multi_cell(self, 0, 7, body)
         self.ln()
 
     def add_table(self, header, data, col_widths):
-        self.set_font('DejaVu', 'B', 10)
-        self.set_fill_color(41, 128, 185)
-        self.set_text_color(255)
-        
-        # Header
-        for i, h in enumerate(header):
-            self.cell(col_widths[i], 10, h, 1, 0, 'C', 1)
-        self.ln()
-        
-        # Data
-        self.set_font('DejaVu', '', 10)
-        self.set_text_color(0)
-        fill = False
-        for row in data:
-            self.set_fill_color(240, 240, 240) if fill else self.set_fill_color(255)
-            for i, datum in enumerate(row):
-                align = 'L' if i == 0 else 'R'
-                self.cell(col_widths[i], 10, str(datum), 1, 0, align, fill)
-            self.ln()
-            fill = not fill
+        # Wraps long names, and breaks pages repeating the header (see pdf_table);
+        # `data` may be any iterable, it is drawn as it is consumed
+        return Table(self, header, col_widths).add_rows(data)
+
+    def add_items(self, header, items, col_widths):
+        """Table and total of (name, qty, unit_price[, group]) items, e.g. from row_sources."""
+        totals = RunningTotals()
+        self.add_table(header, totals.rows(items), col_widths)
+        self.add_total(totals.net, col_widths)
+        return totals
             
-    def add_total(self, total_price, col_widths):
+    def add_total(self, total_kopecks, col_widths):
         self.set_font('DejaVu', 'B', 10)
         self.cell(sum(col_widths[:-1]), 10, 'ИТОГО:', 1, 0, 'R')
-        self.cell(col_widths[-1], 10, f'{total_price:,.0f} ₽'.replace(',', ' '), 1, 0, 'R')
+        self.cell(col_widths[-1], 10, format_rub(total_kopecks), 1, 0, 'R')
         self.ln()
 
-def create_proposal():
-    pdf = PDF()
-    
-    # Add a Unicode font (DejaVuSans)
-    # Assuming the font is available in the system or we download it. 
-    # For this environment, we might need to download it first.
-    # I'll add a check/download step in the shell command.
-    pdf.add_font('DejaVu', '', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', uni=True)
-    pdf.add_font('DejaVu', 'B', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', uni=True)
-    
+def add_fonts(pdf):
+    # Metrics come from the persistent font cache instead of re-parsing the TTFs
+    for family, style, path in FONTS:
+        font_cache.add_font(pdf, family, style, path)
+
+
+def variant_lines(lines, quantities=None):
+    """Apply per-customer quantity overrides ({sku: qty}); qty 0 drops the line."""
+    if not quantities:
+        return lines
+    return [(sku, quantities.get(sku, qty)) for sku, qty in lines if quantities.get(sku, qty)]
+
+
+def create_proposal(output="commercial_proposal_v15.pdf", variants=('basic', 'optimal'), quantities=None,
+                    customer=None, stream=False, appendix=None):
+    """Render the proposal into `output` (a path or a binary file object); with
+    `stream` pages are written out as they are finished instead of at the end.
+    `appendix` is an optional specification, any iterable of (name, qty,
+    unit_price[, group]) items, rendered after the variants as it is read."""
+    with stage('load', 'v15'):
+        pdf = PDF()
+        add_fonts(pdf)
+        if stream:
+            pdf.stream_to(output)
+
+    try:
+        render_proposal(pdf, variants, quantities, customer, appendix)
+
+        # fpdf lays out fonts and page objects only here, so this includes subsetting
+        with stage('save', 'v15', output=None if hasattr(output, 'write') else str(output)) as record:
+            if stream:
+                pdf.output()
+            elif hasattr(output, 'write'):
+                output.write(pdf.output(dest='S').encode('latin1'))
+            else:
+                pdf.output(output)
+            record['pages'] = pdf.page
+    except BaseException:
+        # A failed streamed render must not leave its partial file (or its handle) behind
+        pdf.discard()
+        raise
+    return output
+
+
+def render_proposal(pdf, variants=('basic', 'optimal'), quantities=None, customer=None, appendix=None):
+    """Lay out the pages of the proposal in `pdf` (see create_proposal)."""
     pdf.add_page()
     
+    if customer:
+        pdf.chapter_body(f'Заказчик: {customer}')
+    
     # Project Description
-    pdf.chapter_title('Описание решения')
-    pdf.chapter_body(
-        "Предлагаем рассмотреть внедрение автономной системы искусственного интеллекта для автоматизации "
-        "финансово-хозяйственных операций. Решение разворачивается в локальном контуре предприятия, "
-        "обеспечивая полную конфиденциальность данных и соответствие требованиям импортозамещения."
-    )
+    pdf.use_template('intro', pdf.draw_intro)
     
-    # Basic Variant
-    pdf.chapter_title('Вариант 1: Базовый (Пилотный запуск)')
     header = ['Наименование', 'Кол-во', 'Цена за ед.', 'Сумма']
     col_widths = [90, 20, 40, 40]
     
-    basic_data = [
-        ['Сервер Гравитон Н22И (Xeon Silver, 128GB)', '1', '3 800 000 ₽', '3 800 000 ₽'],
-        ['Коммутатор Eltex MES2300-24', '1', '120 000 ₽', '120 000 ₽'],
-        ['ОС Альт Линукс СПТ', '1', '15 000 ₽', '15 000 ₽'],
-        ['СУБД Postgres Pro Enterprise', '1', '450 000 ₽', '450 000 ₽'],
-        ['ML Платформа (Базовая)', '1', '1 200 000 ₽', '1 200 000 ₽'],
-        ['Внедрение: Этап 1 (Анализ)', '1', '500 000 ₽', '500 000 ₽'],
-        ['Внедрение: Этап 2 (Развертывание)', '1', '800 000 ₽', '800 000 ₽'],
-        ['Внедрение: Этап 3 (Запуск)', '1', '400 000 ₽', '400 000 ₽'],
-    ]
-    
-    pdf.add_table(header, basic_data, col_widths)
-    pdf.add_total(7285000, col_widths)
-    pdf.ln(10)
-    
-    # Optimal Variant
-    pdf.add_page()
-    pdf.chapter_title('Вариант 2: Оптимальный (High-Load)')
-    
-    optimal_data = [
-        ['Сервер YADRO G4208P G3 (Xeon Gold, 512GB, H100)', '1', '12 500 000 ₽', '12 500 000 ₽'],
-        ['Коммутатор Eltex MES2300-24', '1', '120 000 ₽', '120 000 ₽'],
-        ['ОС Альт Линукс СПТ', '2', '15 000 ₽', '30 000 ₽'],
-        ['СУБД Postgres Pro Enterprise', '1', '450 000 ₽', '450 000 ₽'],
-        ['Альт Виртуализация', '2', '45 000 ₽', '90 000 ₽'],
-        ['ML Платформа (Enterprise)', '1', '2 500 000 ₽', '2 500 000 ₽'],
-        ['Коннекторы данных 1С', '1', '350 000 ₽', '350 000 ₽'],
-        ['Модуль: Документооборот (OCR)', '1', '500 000 ₽', '500 000 ₽'],
-        ['Модуль: Сметы и Закупки', '1', '750 000 ₽', '750 000 ₽'],
-        ['Модуль: Видеоаналитика', '1', '1 200 000 ₽', '1 200 000 ₽'],
-        ['Внедрение: Этап 1 (Анализ)', '1', '800 000 ₽', '800 000 ₽'],
-        ['Внедрение: Этап 2 (Развертывание)', '1', '1 500 000 ₽', '1 500 000 ₽'],
-        ['Внедрение: Этап 3 (Запуск)', '1', '800 000 ₽', '800 000 ₽'],
-    ]
-    
-    pdf.add_table(header, optimal_data, col_widths)
-    pdf.add_total(21590000, col_widths)
-    pdf.ln(10)
+    # Names and prices come from the shared catalog (shared/price_catalog.json);
+    # line sums and totals are computed from quantity x unit price
+    catalog = load_catalog()
+    for number, variant in enumerate(variants, 1):
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown variant: {variant}")
+        title, lines, price_list = VARIANTS[variant]
+        with stage('render', variant):
+            # Tables break pages themselves; just keep the title with the header and first row
+            ensure_space(pdf, 14 + 2 * 10)
+            pdf.chapter_title(f'Вариант {number}: {title}')
+            prices = catalog.price_table(variant_lines(lines, quantities), price_list=price_list)
+            pdf.add_table(header, prices.rows(), col_widths)
+            pdf.add_total(prices.totals()['net'], col_widths)
+            pdf.ln(10)
+
+    if appendix is not None:
+        with stage('render', 'appendix') as record:
+            ensure_space(pdf, 14 + 2 * 10)
+            pdf.chapter_title('Приложение: спецификация')
+            record['rows'] = pdf.add_items(header, appendix, col_widths).count
+            pdf.ln(10)
     
     # Terms
-    pdf.chapter_title('Условия реализации')
-    terms = [
-        "1. Цены на оборудование являются ориентировочными и уточняются на момент закупки.",
-        "2. Срок действия предложения: 30 календарных дней.",
-        "3. Условия оплаты: 50% предоплата, 50% после подписания акта приемки-передачи.",
-        "4. Гарантия на работы: 12 месяцев с момента ввода в эксплуатацию."
-    ]
-    for term in terms:
-        pdf.cell(0, 7, term, 0, 1)
-        
-    pdf.output("commercial_proposal_v15.pdf")
+    pdf.use_template('terms', pdf.draw_terms)
 
 if __name__ == "__main__":
     create_proposal()
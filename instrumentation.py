@@ -0,0 +1,169 @@
+"""
+Per-stage timing and memory instrumentation for the proposal pipeline.
+
+The generators, the changeset runner, the streaming patcher and the batch
+and service workers wrap their steps in stages - load, mutate, render, save -
+and each stage records wall time, CPU time, peak traced memory and the
+process' peak RSS:
+
+    with stage('save', output=path) as record:
+        doc.save(path)
+        record['bytes'] = os.path.getsize(path)
+
+Nothing is recorded unless a sink is configured, either through the
+environment (inherited by batch and service worker processes) or through
+configure() / the `proposal --trace ...` options:
+
+    PROPOSAL_TRACE=stages.jsonl          one JSON record per stage ('-' = stderr)
+    PROPOSAL_CHROME_TRACE=trace.json     Chrome trace events (chrome://tracing, Perfetto)
+    PROPOSAL_TRACE_MEMORY=1              peak memory per stage via tracemalloc (slower)
+
+Records from several processes may go to the same files; every record is a
+single appended line.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+TRACE_ENV = 'PROPOSAL_TRACE'
+CHROME_TRACE_ENV = 'PROPOSAL_CHROME_TRACE'
+MEMORY_ENV = 'PROPOSAL_TRACE_MEMORY'
+STAGES = ('load', 'mutate', 'render', 'save')
+
+_local = threading.local()
+_lock = threading.Lock()
+_config = None
+
+
+def configure(trace=None, chrome_trace=None, memory=None):
+    """
+    Set the sinks for this process and the processes it starts. None leaves
+    a setting as it is, '' turns it off.
+    """
+    global _config
+    for env, value in ((TRACE_ENV, trace), (CHROME_TRACE_ENV, chrome_trace)):
+        if value is not None:
+            os.environ[env] = value
+    if memory is not None:
+        os.environ[MEMORY_ENV] = '1' if memory else ''
+    _config = None
+
+
+def _settings():
+    global _config
+    if _config is None or _config['pid'] != os.getpid():
+        _config = {
+            'pid': os.getpid(),
+            'trace': os.environ.get(TRACE_ENV) or None,
+            'chrome_trace': os.environ.get(CHROME_TRACE_ENV) or None,
+            'memory': os.environ.get(MEMORY_ENV, '') not in ('', '0'),
+        }
+        _config['enabled'] = bool(_config['trace'] or _config['chrome_trace'])
+    return _config
+
+
+def enabled():
+    return _settings()['enabled']
+
+
+def _append(path, line, header=None):
+    if path == '-':
+        sys.stderr.write(line + '\n')
+        return
+    with _lock, open(path, 'a', encoding='utf-8') as f:
+        if header and f.tell() == 0:
+            f.write(header)
+        f.write(line + '\n')
+
+
+def _max_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _emit(record):
+    settings = _settings()
+    if settings['trace']:
+        _append(settings['trace'], json.dumps(record, ensure_ascii=False, default=str))
+    if settings['chrome_trace']:
+        args = {k: v for k, v in record.items() if k not in ('stage', 'label', 'start', 'wall_s', 'pid', 'tid')}
+        event = {
+            'name': record['stage'] + (f" {record['label']}" if record.get('label') else ''),
+            'cat': record['stage'],
+            'ph': 'X',
+            'ts': round(record['start'] * 1e6),
+            'dur': round(record['wall_s'] * 1e6),
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': args,
+        }
+        # JSON array format; the closing bracket is optional for trace viewers
+        _append(settings['chrome_trace'], json.dumps(event, ensure_ascii=False, default=str) + ',', header='[\n')
+
+
+@contextmanager
+def stage(name, label=None, **attrs):
+    """
+    Time the enclosed block as stage `name` (load, mutate, render, save or a
+    custom name). Yields the record so the block can add attributes.
+    """
+    settings = _settings()
+    if not settings['enabled']:
+        yield {}
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    record = {'stage': name, 'label': label, **attrs}
+    tracemalloc = None
+    if settings['memory']:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # Fold the peak so far into the enclosing stage before resetting it
+        if stack:
+            stack[-1]['_peak'] = max(stack[-1]['_peak'], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    frame = {'_peak': 0, 'name': name}
+    parent = stack[-1]['name'] if stack else None
+    stack.append(frame)
+
+    start = time.time()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        stack.pop()
+        peak = None
+        if tracemalloc is not None:
+            peak = max(frame['_peak'], tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1]['_peak'] = max(stack[-1]['_peak'], peak)
+        record.update({
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'parent': parent,
+            'depth': len(stack),
+            'start': start,
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'peak_bytes': peak,
+            'max_rss_bytes': _max_rss(),
+        })
+        _emit(record)
@@ -0,0 +1,143 @@
+"""
+Content-addressed storage of zip package members.
+
+A DOCX is a zip of XML parts and media, and consecutive revisions of a
+proposal share almost all of them byte for byte (styles, theme, fonts,
+settings, images). ObjectStore keeps every distinct member once under
+<directory>/<sha256[:2]>/<sha256[2:]>; a package is then just the list of
+its members, from which it can be rebuilt.
+
+    objects = ObjectStore('client/public/.objects')
+    members = objects.put_package('Проектноепредложение3_v11.docx')
+    objects.assemble(members, '/tmp/v11.docx', sha256=digest_of_v11)
+
+A member is stored as it is in the zip - its compressed data, with its
+local header kept in the member list - and the central directory as one
+more object, so assemble() writes the original file back byte for byte.
+Deflated members are stored as they are; only stored (uncompressed) members
+and the central directory are zlib compressed, as recompressing deflate
+data costs time and saves next to nothing. The first byte of an object
+file says which it is.
+"""
+import base64
+import hashlib
+import os
+import struct
+import zipfile
+import zlib
+
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+END_RECORD = struct.Struct('<4s4H2LH')
+# First byte of an object file: the rest is the data as is, or zlib compressed
+RAW = b'r'
+ZLIB = b'z'
+
+
+class ObjectError(ValueError):
+    pass
+
+
+class ObjectStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest[2:])
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def put(self, data, compress=True):
+        """
+        Store `data` unless an identical object exists; returns its SHA-256.
+        Data that is compressed already is best stored with `compress` off.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        target = self.path(digest)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = '%s.%d.tmp' % (target, os.getpid())
+            with open(tmp_path, 'wb') as f:
+                if compress:
+                    f.write(ZLIB + zlib.compress(data, 6))
+                else:
+                    f.write(RAW + data)
+            os.replace(tmp_path, target)
+        return digest
+
+    def get(self, digest):
+        with open(self.path(digest), 'rb') as f:
+            kind, data = f.read(1), f.read()
+        if kind == ZLIB:
+            data = zlib.decompress(data)
+        elif kind != RAW:
+            raise ObjectError(f"Unknown object type {kind!r} of {digest} in {self.directory}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ObjectError(f"Corrupt object {digest} in {self.directory}")
+        return data
+
+    def put_package(self, path):
+        """
+        Store each member of the zip `path`. Returns the list that rebuilds
+        it - [name, sha256 of the compressed data, local header (base64)] per
+        member in file order, then [None, sha256 of the central directory and
+        end record, ''] - or None if the file is not a zip that can be split
+        this way (unreadable, zip64, or with bytes outside its members).
+        """
+        try:
+            with zipfile.ZipFile(path) as package:
+                infos = sorted(package.infolist(), key=lambda info: info.header_offset)
+        except zipfile.BadZipFile:
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'PK\x05\x06')
+        if end < 0 or len(data) - end < END_RECORD.size:
+            return None
+        directory = END_RECORD.unpack_from(data, end)[6]
+        if directory == 0xFFFFFFFF or not infos or infos[0].header_offset != 0:
+            return None
+        members = []
+        for info, following in zip(infos, infos[1:] + [None]):
+            offset = info.header_offset
+            name_length, extra_length = LOCAL_HEADER.unpack_from(data, offset)[9:]
+            start = offset + LOCAL_HEADER.size + name_length + extra_length
+            # Everything up to the next member: the data and any data descriptor
+            stop = following.header_offset if following is not None else directory
+            if stop - start < info.compress_size:
+                return None
+            compress = info.compress_type == zipfile.ZIP_STORED
+            members.append([info.filename, self.put(data[start:stop], compress),
+                            base64.b64encode(data[offset:start]).decode('ascii')])
+        members.append([None, self.put(data[directory:]), ''])
+        return members
+
+    def assemble(self, members, target, sha256):
+        """
+        Rebuild a package from its member list into `target`, atomically.
+        The result is checked against the package's `sha256`; ObjectError is
+        raised (and nothing written) on a mismatch.
+        """
+        tmp_path = '%s.%d.tmp' % (target, os.getpid())
+        try:
+            digest = hashlib.sha256()
+            with open(tmp_path, 'wb') as f:
+                for _, member, header in members:
+                    for chunk in (base64.b64decode(header), self.get(member)):
+                        digest.update(chunk)
+                        f.write(chunk)
+            if digest.hexdigest() != sha256:
+                raise ObjectError(f"Reassembled {target} does not match its SHA-256 {sha256}")
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return target
+
+    def size(self):
+        """Bytes on disk taken by all objects."""
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
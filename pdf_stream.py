@@ -0,0 +1,205 @@
+"""
+Streaming output for fpdf documents.
+
+FPDF keeps the content of every page in memory and serializes the whole
+file into one string in output(), so a catalog-sized appendix holds all of
+its pages - and then a second copy of them - until the very end. Once
+stream_to() is called, each page is compressed and written to the target as
+soon as it is closed (page object and content stream, numbered exactly as
+fpdf would number them), and output() only appends the fonts, the
+resources, the cross-reference table and the trailer. What is left in
+memory per page is its object offsets.
+
+    pdf = PDF()
+    pdf.stream_to("catalog.pdf")      # or a binary file object
+    pdf.add_page()
+    ...
+    pdf.output()
+
+If the document is abandoned half-way (an exception while rendering),
+discard() closes the target and removes the partial file.
+
+Streaming has to start before the first page. Pages cannot refer to a total
+page count (alias_nb_pages), and internal links must have their target set
+before the page that carries them is closed.
+"""
+import os
+import zlib
+
+from fpdf import FPDF
+from fpdf.php import sprintf
+
+# The written part of the file is flushed to the target in chunks of this size
+FLUSH_BYTES = 1 << 16
+
+
+class StreamingPDF(FPDF):
+    _stream = None
+
+    def stream_to(self, target):
+        """Write the document to `target` (a path or a binary file object) page by page."""
+        if self.page:
+            self.error('stream_to() must be called before the first page')
+        if hasattr(target, 'write'):
+            self._stream, self._stream_path = target, None
+        else:
+            self._stream_path = target
+            self._stream = open('%s.%d.tmp' % (target, os.getpid()), 'wb')
+        self._written = 0
+        self._page_objects = []
+        self.buffer = ''
+        self._out('%PDF-' + self.pdf_version)
+
+    def _tell(self):
+        return self._written + len(self.buffer)
+
+    def _flush(self):
+        data = self.buffer.encode('latin1')
+        self._stream.write(data)
+        self._written += len(data)
+        self.buffer = ''
+
+    def _newobj(self):
+        if self._stream is None:
+            return super()._newobj()
+        self.n += 1
+        self.offsets[self.n] = self._tell()
+        self._out(str(self.n) + ' 0 obj')
+
+    def _endpage(self):
+        super()._endpage()
+        if self._stream is not None:
+            self._putpage(self.page)
+            if len(self.buffer) >= FLUSH_BYTES:
+                self._flush()
+
+    def _page_size(self):
+        """(width, height) in points of a page in the default orientation."""
+        if self.def_orientation == 'P':
+            return self.fw_pt, self.fh_pt
+        return self.fh_pt, self.fw_pt
+
+    def _putpage(self, n):
+        """Write page `n` (object and content stream) and drop its content."""
+        if hasattr(self, 'str_alias_nb_pages'):
+            self.error('alias_nb_pages() is not supported while streaming')
+        w_pt, h_pt = self._page_size()
+        self._newobj()
+        self._page_objects.append(self.n)
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        if n in self.orientation_changes:
+            self._out(sprintf('/MediaBox [0 0 %.2f %.2f]', h_pt, w_pt))
+        self._out('/Resources 2 0 R')
+        if self.page_links and n in self.page_links:
+            annots = '/Annots ['
+            for pl in self.page_links[n]:
+                rect = sprintf('%.2f %.2f %.2f %.2f', pl[0], pl[1], pl[0] + pl[2], pl[1] - pl[3])
+                annots += '<</Type /Annot /Subtype /Link /Rect [' + rect + '] /Border [0 0 0] '
+                if isinstance(pl[4], str):
+                    annots += '/A <</S /URI /URI ' + self._textstring(pl[4]) + '>>>>'
+                else:
+                    page, y = self.links[pl[4]]
+                    height = w_pt if page in self.orientation_changes else h_pt
+                    annots += sprintf('/Dest [%d 0 R /XYZ 0 %.2f null]>>', 1 + 2 * page, height - y * self.k)
+            self._out(annots + ']')
+            del self.page_links[n]
+        if self.pdf_version > '1.3':
+            self._out('/Group <</Type /Group /S /Transparency /CS /DeviceRGB>>')
+        self._out('/Contents ' + str(self.n + 1) + ' 0 R>>')
+        self._out('endobj')
+        content = self.pages.pop(n)
+        if self.compress:
+            content = zlib.compress(content.encode('latin1'))
+            self._newobj()
+            self._out('<</Filter /FlateDecode /Length ' + str(len(content)) + '>>')
+        else:
+            self._newobj()
+            self._out('<</Length ' + str(len(content)) + '>>')
+        self._putstream(content)
+        self._out('endobj')
+        # fpdf records every character drawn; only the set matters for the subset
+        for font in self.fonts.values():
+            if 'subset' in font:
+                font['subset'][:] = dict.fromkeys(font['subset'])
+
+    def _putpages(self):
+        if self._stream is None:
+            return super()._putpages()
+        # The pages are out already; only the page tree root is left
+        w_pt, h_pt = self._page_size()
+        self.offsets[1] = self._tell()
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ''.join('%d 0 R ' % n for n in self._page_objects) + ']')
+        self._out('/Count ' + str(len(self._page_objects)))
+        self._out(sprintf('/MediaBox [0 0 %.2f %.2f]', w_pt, h_pt))
+        self._out('>>')
+        self._out('endobj')
+
+    def _putresources(self):
+        if self._stream is None:
+            return super()._putresources()
+        self._putfonts()
+        self._putimages()
+        self.offsets[2] = self._tell()
+        self._out('2 0 obj')
+        self._out('<<')
+        self._putresourcedict()
+        self._out('>>')
+        self._out('endobj')
+
+    def _enddoc(self):
+        if self._stream is None:
+            return super()._enddoc()
+        self._putpages()
+        self._putresources()
+        self._newobj()
+        self._out('<<')
+        self._putinfo()
+        self._out('>>')
+        self._out('endobj')
+        self._newobj()
+        self._out('<<')
+        self._putcatalog()
+        self._out('>>')
+        self._out('endobj')
+        xref = self._tell()
+        self._out('xref')
+        self._out('0 ' + str(self.n + 1))
+        self._out('0000000000 65535 f ')
+        for i in range(1, self.n + 1):
+            self._out(sprintf('%010d 00000 n ', self.offsets[i]))
+        self._out('trailer')
+        self._out('<<')
+        self._puttrailer()
+        self._out('>>')
+        self._out('startxref')
+        self._out(xref)
+        self._out('%%EOF')
+        self._flush()
+        self.state = 3
+
+    def output(self, name='', dest=''):
+        """With stream_to(), finish the document on its target; otherwise FPDF.output()."""
+        if self._stream is None:
+            return super().output(name, dest)
+        if self.state < 3:
+            self.close()
+        if self._stream_path is not None:
+            self._stream.close()
+            os.replace(self._stream.name, self._stream_path)
+            self._stream_path = None
+        return ''
+
+    def discard(self):
+        """Drop a streamed document that will not be finished: close and remove the partial file."""
+        if self._stream is None or self._stream_path is None:
+            # Nothing streamed, or a file object the caller owns
+            return
+        self._stream.close()
+        try:
+            os.unlink(self._stream.name)
+        except FileNotFoundError:
+            pass
+        self._stream_path = None
@@ -0,0 +1,232 @@
+"""
+Table engine for fpdf documents.
+
+FPDF.cell() measures its text with a Python loop over the glyph widths on
+every call and writes every datum as its own fill, border and text object.
+It does not wrap, so long names overflow their column, and it knows nothing
+about the table it belongs to, so the caller has to break pages by hand.
+Table measures each string once per font (widths are kept in 1/1000 em, so
+one measurement serves every size), wraps cells that do not fit and sizes
+each row to its tallest cell, and writes a row as one fill, one stroke and
+one text object. A row that would cross the page break starts a new page,
+and the header row is repeated there.
+
+    table = Table(pdf, ['Наименование', 'Кол-во', 'Цена за ед.', 'Сумма'], [90, 20, 40, 40])
+    table.add_rows(rows)
+
+The cells of a row share their first baseline, so text extraction
+(verify.py) still reads each row as one line.
+"""
+from fpdf.php import UTF8ToUTF16BE
+
+# Bound on memoized widths; the memo is simply dropped when it fills up
+MAX_WIDTHS = 200_000
+
+_widths = {}
+
+
+def text_width(font, text):
+    """Width of `text` in the fpdf font dict `font`, in 1/1000 em."""
+    key = (font['name'], text)
+    width = _widths.get(key)
+    if width is None:
+        cw = font['cw']
+        if isinstance(cw, dict):
+            width = sum(cw.get(char, 0) for char in text)
+        else:
+            codes = list(map(ord, text))
+            if not codes or max(codes) < len(cw):
+                width = sum(map(cw.__getitem__, codes))
+            else:
+                missing = font['desc'].get('MissingWidth') or 500
+                width = sum(cw[code] if code < len(cw) else missing for code in codes)
+        if len(_widths) >= MAX_WIDTHS:
+            _widths.clear()
+        _widths[key] = width
+    return width
+
+
+def _fit(font, word, width):
+    """How many leading characters of `word` fit in `width` (at least one)."""
+    total = 0
+    for i, char in enumerate(word):
+        total += text_width(font, char)
+        if total > width:
+            return max(i, 1)
+    return len(word)
+
+
+def wrap(font, text, width):
+    """Greedy word wrap of `text` to `width` (1/1000 em): [(line, line width)]."""
+    lines = []
+    space = text_width(font, ' ')
+    for paragraph in text.split('\n'):
+        whole = text_width(font, paragraph)
+        if whole <= width:
+            lines.append((paragraph, whole))
+            continue
+        line, line_width = [], 0
+        for word in paragraph.split(' '):
+            word_width = text_width(font, word)
+            if line and line_width + space + word_width <= width:
+                line.append(word)
+                line_width += space + word_width
+                continue
+            if line:
+                lines.append((' '.join(line), line_width))
+            # A word wider than the column is broken between characters
+            while word_width > width and len(word) > 1:
+                cut = _fit(font, word, width)
+                lines.append((word[:cut], text_width(font, word[:cut])))
+                word = word[cut:]
+                word_width = text_width(font, word)
+            line, line_width = [word], word_width
+        lines.append((' '.join(line), line_width))
+    return lines
+
+
+def color(r, g=-1, b=-1):
+    """The operator FPDF.set_fill_color(r, g, b) writes (also used for text)."""
+    if (r == 0 and g == 0 and b == 0) or g == -1:
+        return '%.3f g' % (r / 255)
+    return '%.3f %.3f %.3f rg' % (r / 255, g / 255, b / 255)
+
+
+def ensure_space(pdf, height):
+    """Start a new page unless `height` mm still fit above the page break."""
+    if pdf.y + height > pdf.page_break_trigger and pdf.accept_page_break():
+        pdf.add_page(pdf.cur_orientation)
+
+
+class Table:
+    """
+    A table drawn row by row at the current position of `pdf`. Column
+    `aligns` default to the first column left and the rest right; rows are
+    at least `row_height` mm tall and wrapped cells add `line_height` mm per
+    extra line. Colours are (gray,) or (r, g, b) tuples; a None stripe is
+    not filled.
+    """
+
+    def __init__(self, pdf, header, col_widths, aligns=None, family='DejaVu', size=10,
+                 row_height=10, line_height=5, header_fill=(41, 128, 185), header_color=(255,),
+                 stripes=(None, (240, 240, 240)), text_color=(0,)):
+        self.pdf = pdf
+        self.header = [str(title) for title in header]
+        self.col_widths = list(col_widths)
+        self.aligns = list(aligns or ['L'] + ['R'] * (len(self.col_widths) - 1))
+        self.family, self.size = family, size
+        self.row_height, self.line_height = row_height, line_height
+        self.header_fill, self.header_color = color(*header_fill), color(*header_color)
+        self.stripes = [stripe and color(*stripe) for stripe in stripes]
+        self.text_color = color(*text_color)
+        self.x = pdf.x
+        self.count = 0
+        self._page = None
+        self._page_top = None
+        self._glyphs = {}
+
+    def _layout(self, row):
+        """The wrapped lines of each cell in the current font and the row height."""
+        pdf = self.pdf
+        font = pdf.current_font
+        scale = 1000 / pdf.font_size
+        cells = [wrap(font, value if isinstance(value, str) else str(value), (width - 2 * pdf.c_margin) * scale)
+                 for width, value in zip(self.col_widths, row)]
+        lines = max(map(len, cells), default=1)
+        height = max(self.row_height, self.row_height + (lines - 1) * self.line_height)
+        return cells, height
+
+    def _encode(self, text):
+        pdf = self.pdf
+        if not pdf.unifontsubset:
+            return pdf._escape(text)
+        # fpdf appends every character it draws to the subset; once per font is enough
+        font = pdf.current_font
+        seen = self._glyphs.get(font['fontkey'])
+        if seen is None:
+            seen = self._glyphs[font['fontkey']] = set(map(chr, font['subset']))
+        if not seen.issuperset(text):
+            new = set(text) - seen
+            seen |= new
+            font['subset'].extend(sorted(map(ord, new)))
+        return pdf._escape(UTF8ToUTF16BE(text, False))
+
+    def _draw(self, cells, height, fill, text_color, aligns):
+        """Write one row as a single fill, stroke and text object and move below it."""
+        pdf = self.pdf
+        k, page_height, margin = pdf.k, pdf.h, pdf.c_margin
+        top = (page_height - pdf.y) * k
+        scale = pdf.font_size / 1000
+        baseline = pdf.y + 0.5 * self.row_height + 0.3 * pdf.font_size
+        rects, text = [], []
+        x = self.x
+        for width, align, lines in zip(self.col_widths, aligns, cells):
+            rects.append('%.2f %.2f %.2f %.2f re' % (x * k, top, width * k, -height * k))
+            for number, (line, line_width) in enumerate(lines):
+                if not line:
+                    continue
+                if align == 'R':
+                    dx = width - margin - line_width * scale
+                elif align == 'C':
+                    dx = (width - line_width * scale) / 2
+                else:
+                    dx = margin
+                y = baseline + number * self.line_height
+                text.append('1 0 0 1 %.2f %.2f Tm (%s) Tj' % ((x + dx) * k, (page_height - y) * k, self._encode(line)))
+            x += width
+        out = ['q']
+        if fill:
+            out.append('%s %.2f %.2f %.2f %.2f re f' % (fill, self.x * k, top, (x - self.x) * k, -height * k))
+        out.append(' '.join(rects) + ' S')
+        if text:
+            out.append('BT %s %s ET' % (text_color, ' '.join(text)))
+        out.append('Q')
+        pdf._out(' '.join(out))
+        pdf.x = self.x
+        pdf.y += height
+        pdf.lasth = height
+
+    def draw_header(self):
+        pdf = self.pdf
+        style = pdf.font_style
+        pdf.set_font(self.family, 'B', self.size)
+        cells, height = self._layout(self.header)
+        self._draw(cells, height, self.header_fill, self.header_color, ['C'] * len(cells))
+        pdf.set_font(self.family, style, self.size)
+        self._page = pdf.page
+
+    def _break_before(self, height):
+        """Start a new page (below its page header) if `height` mm do not fit."""
+        pdf = self.pdf
+        # A row taller than a whole page is drawn anyway rather than paging forever
+        if pdf.y + height <= pdf.page_break_trigger or pdf.y == self._page_top or not pdf.accept_page_break():
+            return False
+        pdf.add_page(pdf.cur_orientation)
+        self._page_top = pdf.y
+        pdf.x = self.x
+        return True
+
+    def add_row(self, row):
+        pdf = self.pdf
+        if self._page is None:
+            pdf.set_font(self.family, '', self.size)
+        cells, height = self._layout(row)
+        if self._page is None:
+            # Keep the header together with the first row
+            self._break_before(self.row_height + height)
+            self.draw_header()
+        elif self._break_before(height):
+            self.draw_header()
+        self._draw(cells, height, self.stripes[self.count % len(self.stripes)], self.text_color,
+                   self.aligns)
+        self.count += 1
+
+    def add_rows(self, rows):
+        """Draw `rows` (any iterable of sequences); the header is drawn even if there are none."""
+        for row in rows:
+            self.add_row(row)
+        if self._page is None:
+            self.pdf.set_font(self.family, '', self.size)
+            self._break_before(self.row_height)
+            self.draw_header()
+        return self
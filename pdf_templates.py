@@ -0,0 +1,155 @@
+"""
+Reusable page templates (PDF form XObjects) for fpdf documents.
+
+A static block - a page header, a fixed intro or terms section - is laid out
+once: its drawing callback runs into a scratch content stream, which is kept
+together with the glyphs it uses and the layout state it ends in. Every later
+use, on any page of any document built with the same fonts and page
+geometry, places that cached stream at the current position instead of
+laying the block out again. Blocks repeated within a document (form=True)
+are written once per file as a form XObject and each page only carries a
+"Do"; one-off blocks are spliced into the page content as they are.
+
+    class PDF(TemplatePDF):
+        def header(self):
+            self.use_template('header', self.draw_header, form=True)
+
+Blocks must not depend on per-page data (page numbers) and must fit on one
+page; a block that would cross the page break is drawn directly instead.
+"""
+import zlib
+from collections import namedtuple
+
+from fpdf import FPDF
+
+# fpdf layout state a template can change and that must be carried over
+STATE = (
+    'x', 'y', 'lasth', 'ws', 'line_width', 'underline',
+    'font_family', 'font_style', 'font_size_pt', 'font_size', 'unifontsubset',
+    'draw_color', 'fill_color', 'text_color', 'color_flag',
+)
+
+Template = namedtuple('Template', 'name content compressed x y height end glyphs')
+
+_templates = {}
+
+
+class TemplatePDF(FPDF):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.template_objects = {}
+
+    def _template_key(self, name):
+        fonts = tuple(sorted((key, font['i']) for key, font in self.fonts.items()))
+        return (type(self).__name__, name, fonts, self.k, self.w, self.h, self.l_margin, self.r_margin)
+
+    def _state(self):
+        return {attr: getattr(self, attr, None) for attr in STATE}
+
+    def _set_state(self, state):
+        for attr, value in state.items():
+            setattr(self, attr, value)
+        if self.font_family:
+            self.current_font = self.fonts[self.font_family + self.font_style]
+
+    def _emit_state(self, state, previous=None):
+        """Write the operators that establish `state` (only what differs from `previous`)."""
+        if state['font_family'] and (previous is None or any(
+                state[a] != previous[a] for a in ('font_family', 'font_style', 'font_size_pt'))):
+            font = self.fonts[state['font_family'] + state['font_style']]
+            self._out('BT /F%d %.2f Tf ET' % (font['i'], state['font_size_pt']))
+        if previous is None or state['line_width'] != previous['line_width']:
+            self._out('%.2f w' % (state['line_width'] * self.k))
+        if previous is None or state['draw_color'] != previous['draw_color']:
+            self._out(state['draw_color'])
+        if previous is None or state['fill_color'] != previous['fill_color']:
+            self._out(state['fill_color'])
+
+    def _record(self, name, draw):
+        start = self._state()
+        glyphs_before = {key: len(font.get('subset', ())) for key, font in self.fonts.items()}
+        page = self.page
+        saved = self.pages[page]
+        auto_page_break = self.auto_page_break
+        self.pages[page] = ''
+        self.auto_page_break = 0
+        try:
+            self._emit_state(start)
+            draw()
+            if self.page != page:
+                raise ValueError(f"Template {name!r} started a new page")
+            content = self.pages[page]
+            end = self._state()
+        finally:
+            self.pages[page] = saved
+            self.auto_page_break = auto_page_break
+
+        glyphs = {}
+        for key, font in self.fonts.items():
+            added = font.get('subset', [])[glyphs_before[key]:]
+            if added:
+                glyphs[key] = sorted(set(added))
+        self._set_state(start)
+        return Template(name, content, zlib.compress(content.encode('latin1')), start['x'], start['y'],
+                        end['y'] - start['y'], end, glyphs)
+
+    def use_template(self, name, draw, form=False):
+        """Place the static block drawn by `draw` at the current position."""
+        key = self._template_key(name)
+        template = _templates.get(key)
+        if template is None:
+            template = _templates[key] = self._record(name, draw)
+        if self.y + template.height > self.page_break_trigger and not self.in_footer \
+                and self.accept_page_break():
+            draw()
+            return
+
+        for fontkey, glyphs in template.glyphs.items():
+            self.fonts[fontkey]['subset'].extend(glyphs)
+
+        dx = self.x - template.x
+        dy = self.y - template.y
+        moved = round(dx * self.k, 2) or round(dy * self.k, 2)
+        translate = '1 0 0 1 %.2f %.2f cm' % (dx * self.k, (template.y - self.y) * self.k)
+        before = self._state()
+        end = dict(template.end, x=template.end['x'] + dx, y=template.end['y'] + dy)
+        if form:
+            if name not in self.template_objects:
+                self.template_objects[name] = {'i': len(self.template_objects) + 1, 'template': template, 'n': None}
+            do = '/TPL%d Do' % self.template_objects[name]['i']
+            self._out('q %s %s Q' % (translate, do) if moved else do)
+        elif moved:
+            self._out('q ' + translate)
+            self._out(template.content.rstrip('\n'))
+            self._out('Q')
+        else:
+            self._out(template.content.rstrip('\n'))
+            self._set_state(end)
+            return
+
+        # The block ran inside a saved graphics state: bring the page to the
+        # state the block left it in, as if it had been drawn inline
+        self._emit_state(end, before)
+        self._set_state(end)
+
+    def _putimages(self):
+        super()._putimages()
+        for entry in self.template_objects.values():
+            content = entry['template'].compressed
+            self._newobj()
+            entry['n'] = self.n
+            self._out('<</Type /XObject /Subtype /Form /FormType 1')
+            self._out('/BBox [0 0 %.2f %.2f]' % (self.w_pt, self.h_pt))
+            self._out('/Resources 2 0 R')
+            if self.compress:
+                self._out('/Filter /FlateDecode /Length %d>>' % len(content))
+            else:
+                content = zlib.decompress(content)
+                self._out('/Length %d>>' % len(content))
+            self._putstream(content)
+            self._out('endobj')
+
+    def _putxobjectdict(self):
+        super()._putxobjectdict()
+        for entry in self.template_objects.values():
+            self._out('/TPL%d %d 0 R' % (entry['i'], entry['n']))
@@ -0,0 +1,280 @@
+"""
+Pricing engine for proposal line items.
+
+Line items are stored column-wise (quantity and unit price arrays) in exact
+integer kopecks, and all derived amounts - line sums, subtotals per group,
+VAT and the grand total - are recomputed from them in one vectorized pass.
+Nothing is hardcoded, so a changed quantity can never leave a stale total
+behind.
+
+    prices = PriceTable()
+    prices.add('Сервер YADRO G4208P G3', 1, 32151159, group='hardware')
+    totals = prices.totals()
+    format_rub(totals['net'])  # '32 151 159 ₽'
+"""
+import re
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+import numpy as np
+
+KOPECKS = 100
+VAT_RATE = 20  # percent
+AMOUNT_RE = re.compile(r'^(\D*?)(\d{1,3}(?:[ \xa0]\d{3})+|\d+)(?:[.,](\d{1,2}))?(.*)$', re.S)
+
+
+def to_kopecks(value):
+    """Rubles (int, float, or text like "32 151 159 ₽") to integer kopecks."""
+    if isinstance(value, str):
+        _, kopecks, _ = parse_amount(value)
+        return kopecks
+    return int(round(value * KOPECKS))
+
+
+def parse_amount(text):
+    """Split "~26 750 000 ₽" into ('~', 2675000000, ' ₽')."""
+    match = AMOUNT_RE.match(text.strip())
+    if not match:
+        raise ValueError(f"No amount in {text!r}")
+    prefix, rubles, fraction, suffix = match.groups()
+    kopecks = int(re.sub(r'\D', '', rubles)) * KOPECKS + int((fraction or '0').ljust(2, '0'))
+    return prefix, kopecks, suffix
+
+
+def to_qty(value):
+    """
+    A quantity as an int, or a Decimal when it is fractional: 2, "2", "2,000"
+    (as 1C exports it) and 2.0 are all 2, "1,5" is Decimal('1.5').
+    """
+    if isinstance(value, int):
+        return value
+    text = value if isinstance(value, str) else str(value)
+    try:
+        qty = Decimal(re.sub(r'[\s\xa0]', '', text).replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError(f"No quantity in {value!r}") from None
+    if not qty.is_finite():
+        raise ValueError(f"No quantity in {value!r}")
+    return int(qty) if qty == qty.to_integral_value() else qty.normalize()
+
+
+def format_qty(qty):
+    """A quantity from to_qty() for display: 2 -> '2', Decimal('1.5') -> '1,5'."""
+    return f'{qty:f}'.replace('.', ',') if isinstance(qty, Decimal) else str(qty)
+
+
+def format_rub(kopecks, suffix=' ₽', separator=' '):
+    """Integer kopecks as "32 151 159 ₽" (kopecks are shown only when non-zero)."""
+    rubles, rest = divmod(int(kopecks), KOPECKS)
+    text = f'{rubles:,}'.replace(',', separator)
+    if rest:
+        text += f',{rest:02d}'
+    return text + suffix
+
+
+def format_like(template, kopecks):
+    """Format an amount the way `template` was formatted (prefix, separators, suffix)."""
+    prefix, _, suffix = parse_amount(template)
+    separator = '\xa0' if '\xa0' in template else ' '
+    return prefix + format_rub(kopecks, suffix=suffix, separator=separator)
+
+
+def vat_of(net, rate=VAT_RATE):
+    """VAT in kopecks, rounded half up; works on scalars and arrays."""
+    return (np.asarray(net, dtype=np.int64) * rate + 50) // 100
+
+
+def _whole_qty(qty):
+    """A PriceTable quantity: to_qty(), but only whole numbers fit its integer arrays."""
+    qty = to_qty(qty)
+    if not isinstance(qty, int):
+        raise ValueError(f"Quantity {format_qty(qty)} is not a whole number; "
+                         "fractional quantities need RunningTotals")
+    return qty
+
+
+class PriceTable:
+    def __init__(self, items=()):
+        self.names = []
+        self.groups = []
+        self._qty = []
+        self._unit = []
+        for item in items:
+            self.add(*item)
+
+    def add(self, name, qty, unit_price, group=None):
+        """Add a line item; `unit_price` is in rubles."""
+        self.names.append(name)
+        self.groups.append(group)
+        self._qty.append(_whole_qty(qty))
+        self._unit.append(to_kopecks(unit_price))
+        return len(self.names) - 1
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def qty(self):
+        return np.asarray(self._qty, dtype=np.int64)
+
+    @property
+    def unit(self):
+        return np.asarray(self._unit, dtype=np.int64)
+
+    def set_qty(self, position, qty):
+        self._qty[position] = _whole_qty(qty)
+
+    def set_unit_price(self, position, unit_price):
+        self._unit[position] = to_kopecks(unit_price)
+
+    def line_totals(self):
+        return self.qty * self.unit
+
+    def totals(self, vat_rate=VAT_RATE):
+        """Line sums, per-group subtotals, net, VAT and gross in kopecks."""
+        lines = self.line_totals()
+        labels = {}
+        codes = np.asarray([labels.setdefault(g, len(labels)) for g in self.groups], dtype=np.int64)
+        subtotals = np.zeros(len(labels), dtype=np.int64)
+        np.add.at(subtotals, codes, lines)
+        net = int(lines.sum())
+        vat = int(vat_of(net, vat_rate))
+        return {
+            'lines': lines,
+            'subtotals': dict(zip(labels, subtotals.tolist())),
+            'net': net,
+            'vat': vat,
+            'gross': net + vat,
+        }
+
+    def rows(self, suffix=' ₽'):
+        """[name, qty, unit price, line total] as display strings, e.g. for PDF.add_table."""
+        lines = self.line_totals().tolist()
+        return [
+            [name, str(qty), format_rub(unit, suffix), format_rub(line, suffix)]
+            for name, qty, unit, line in zip(self.names, self._qty, self._unit, lines)
+        ]
+
+
+class RunningTotals:
+    """
+    Totals of line items that stream past one at a time, for row sources too
+    large to hold in a PriceTable (see row_sources). Amounts are integer
+    kopecks, as in PriceTable.
+
+        totals = RunningTotals()
+        pdf.add_table(header, totals.rows(csv_items('price.csv')), col_widths)
+        format_rub(totals.net)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.net = 0
+        self.subtotals = {}
+
+    def add(self, qty, unit_price, group=None):
+        """
+        Count a line item (`unit_price` in rubles, `qty` as to_qty() reads it);
+        returns (qty, unit price, line sum), amounts in kopecks. A fractional
+        quantity gives a line sum rounded half up to the kopeck.
+        """
+        qty = to_qty(qty)
+        unit = to_kopecks(unit_price)
+        line = qty * unit
+        if isinstance(line, Decimal):
+            line = int(line.to_integral_value(ROUND_HALF_UP))
+        self.count += 1
+        self.net += line
+        self.subtotals[group] = self.subtotals.get(group, 0) + line
+        return qty, unit, line
+
+    def lines(self, items):
+        """(name, qty, unit price, line sum) for each (name, qty, unit_price[, group]) item, lazily."""
+        for name, qty, unit_price, *group in items:
+            yield (name, *self.add(qty, unit_price, *group[:1]))
+
+    def rows(self, items, suffix=' ₽'):
+        """Display rows like PriceTable.rows(), computed as `items` are consumed."""
+        for name, qty, unit, line in self.lines(items):
+            yield [name, format_qty(qty), format_rub(unit, suffix), format_rub(line, suffix)]
+
+    def totals(self, vat_rate=VAT_RATE):
+        """Per-group subtotals, net, VAT and gross of the items counted so far."""
+        vat = int(vat_of(self.net, vat_rate))
+        return {'subtotals': dict(self.subtotals), 'net': self.net, 'vat': vat, 'gross': self.net + vat}
+
+
+def portfolio_totals(tables, vat_rate=VAT_RATE):
+    """Net, VAT and gross for many PriceTables at once (one concatenated pass)."""
+    if not tables:
+        return []
+    qty = np.concatenate([t.qty for t in tables])
+    unit = np.concatenate([t.unit for t in tables])
+    owners = np.repeat(np.arange(len(tables)), [len(t) for t in tables])
+    net = np.zeros(len(tables), dtype=np.int64)
+    np.add.at(net, owners, qty * unit)
+    vat = vat_of(net, vat_rate)
+    return [
+        {'net': int(n), 'vat': int(v), 'gross': int(n + v)}
+        for n, v in zip(net.tolist(), vat.tolist())
+    ]
+
+
+def reprice_row(row, qty_column, total_column, qty, unit_price=None, price_column=None):
+    """
+    Change the quantity of an indexed DOCX row (see table_index) and recompute
+    its line total as quantity x unit price. The unit price is `unit_price`
+    (rubles) if given, else the row's unit price cell (`price_column`, by
+    default a "Цена за ед." column if the table has one), else the one implied
+    by the old quantity and line total. Returns the change of the line total
+    in kopecks; raises ValueError when the row does not give what is needed.
+    """
+    where = f"table {row.table.position}, row {row.position}"
+    qty_text = row.get(qty_column)
+    match = re.match(r'\s*(\d+)', qty_text)
+    if not match:
+        raise ValueError(f"No quantity in {qty_text!r} ({where})")
+    total_text = row.get(total_column)
+    _, old_total, _ = parse_amount(total_text)
+    if price_column is None and unit_price is None:
+        price_column = next((column for name, column in row.table.header.items()
+                             if name.lower().startswith('цена за ед') and column != total_column), None)
+    if unit_price is not None:
+        unit = to_kopecks(unit_price)
+    elif price_column is not None:
+        unit = parse_amount(row.get(price_column))[1]
+    else:
+        old_qty = int(match.group(1))
+        if not old_qty:
+            raise ValueError(f"Quantity {qty_text!r} is 0 and the table has no unit price ({where}); "
+                             "give unit_price")
+        unit = old_total // old_qty
+    row.set(qty_column, qty_text[:match.start(1)] + str(qty) + qty_text[match.end(1):])
+    row.set(total_column, format_like(total_text, unit * qty))
+    return unit * qty - old_total
+
+
+def refresh_table_total(table, total_column, label='Итого'):
+    """
+    Rewrite every total row (first cell starting with `label`) as the sum of
+    the line items between it and the previous total row; a total row right
+    after another one (a grand total) gets the sum of all line items above
+    it. Returns the sum of all line items of the table in kopecks.
+    """
+    grand = section = 0
+    found = lines = False
+    for row in table.rows[1:]:
+        first = row.get(0).strip()
+        if first.lower().startswith(label.lower()):
+            row.set(total_column, format_like(row.get(total_column), section if lines else grand))
+            found, lines, section = True, False, 0
+            continue
+        try:
+            line = parse_amount(row.get(total_column))[1]
+        except ValueError:
+            continue
+        grand += line
+        section += line
+        lines = True
+    if not found:
+        raise ValueError(f"No '{label}' row in table {table.position}")
+    return grand
@@ -0,0 +1,304 @@
+"""
+proposal - single command-line entry point for the proposal tools.
+
+    proposal generate v15 -o out.pdf --customer "ООО Ромашка" --variant basic
+    proposal generate --specs customers.yaml -j 8 --out-dir out
+    proposal generate v15 --stream --items price_1c.csv  # appendix read lazily, any length
+    proposal patch v9.docx -o v10.docx --replace MES5324 MES2300-24
+    proposal patch --changeset changesets/v3_to_v11.yaml
+    proposal verify v11.docx commercial_proposal_v15.pdf --contains "YADRO G4208P" --legacy --totals
+    proposal diff v10.docx v11.docx       # sections, paragraphs, added/removed/repriced line items
+    proposal diff --series Проектноепредложение3 --dir client/public --chain --summary
+    proposal index client/public .        # update the full-text index of all revisions
+    proposal search '"YADRO G4208P" "32 151 159"' --first
+    proposal latest --dir client/public [--next]
+    proposal patch --series Проектноепредложение3 --dir client/public --replace MES5324 MES2300-24
+    proposal startup                      # measure start-up against the budget
+    proposal --trace stages.jsonl --chrome-trace trace.json generate --specs customers.yaml
+
+Only the standard library is imported at start-up; python-docx, lxml, fpdf
+and NumPy are imported inside the subcommands that need them, so listing or
+checking files does not pay for the document stack. `proposal startup`
+times lightweight invocations in fresh interpreters and fails when they
+exceed STARTUP_BUDGET_MS or pull in one of HEAVY_MODULES.
+"""
+import argparse
+import os
+import sys
+import time
+
+STARTUP_BUDGET_MS = float(os.environ.get('PROPOSAL_STARTUP_BUDGET_MS', 100))
+HEAVY_MODULES = ('docx', 'lxml', 'fpdf', 'numpy', 'yaml')
+
+
+def cmd_generate(args):
+    if args.specs:
+        from batch_generate import load_specs, run_batch
+        results = run_batch(load_specs(args.specs), args.jobs, args.out_dir)
+        return 1 if any(r['error'] for r in results) else 0
+    if not args.generator:
+        raise SystemExit("generate: give a generator (v13, v14, v15) or --specs")
+    items = None
+    if args.items:
+        from row_sources import open_items
+        items = open_items(args.items, args.query)
+    try:
+        if args.generator == 'v13':
+            import generate_proposal_v13
+            generate_proposal_v13.generate_proposal(args.output or 'Commercial_Proposal_v13.docx', items=items)
+        elif args.generator == 'v14':
+            import generate_proposal_v14
+            generate_proposal_v14.create_proposal(args.output or 'Commercial_Proposal_v14.docx', customer=args.customer)
+        else:
+            import generate_proposal_v15
+            quantities = {}
+            for override in args.qty:
+                sku, _, qty = override.partition('=')
+                quantities[sku] = int(qty)
+            output = generate_proposal_v15.create_proposal(
+                args.output or 'commercial_proposal_v15.pdf',
+                variants=args.variant or ('basic', 'optimal'),
+                quantities=quantities,
+                customer=args.customer,
+                stream=args.stream,
+                appendix=items,
+            )
+            print(f"Proposal v15 saved to {output}")
+    except ValueError as e:
+        if items is None:
+            raise
+        # A bad line in the --items source: name it instead of a traceback
+        raise SystemExit(f"generate: {e}") from None
+    return 0
+
+
+def cmd_patch(args):
+    if args.changeset:
+        from changeset import load_changeset, run_changeset
+        run_changeset(load_changeset(args.changeset), args.source, args.output)
+        return 0
+    if not args.series and (not args.source or not args.output):
+        raise SystemExit("patch: give SOURCE and -o OUTPUT, --series or --changeset")
+    from docx_stream import StreamPatcher
+    patcher = StreamPatcher()
+    for text in args.delete_row:
+        patcher.delete_rows(text)
+    patcher.replace_text(args.replace)
+    for row_text, current, new in args.set_cell:
+        patcher.set_cell(row_text, new, current=current)
+    if not args.series:
+        report = patcher.patch(args.source, args.output)
+        print(f"{args.source} -> {args.output}: {report}")
+        return 0
+
+    # Patch the latest revision of the series (or SOURCE) into the next version
+    from version_store import VersionStore
+    store = VersionStore(args.dir)
+    parent = store.latest(args.series)
+    if parent is None:
+        raise SystemExit(f"patch: no versions of {args.series} in {args.dir}")
+    source = args.source or store.checkout(parent)
+    with store.new_version(args.series, parent=parent) as version:
+        report = patcher.patch(source, version.path)
+    print(f"{source} -> {version.path}: {report}")
+    return 0
+
+
+def cmd_verify(args):
+    from verify import report
+    failed = report(args.files, args.jobs, args.legacy, contains=args.contains, absent=args.absent,
+                    rows=args.row, totals=args.totals)
+    return 1 if failed else 0
+
+
+def cmd_diff(args):
+    if not args.text:
+        import proposal_diff
+        return proposal_diff.run(args)
+    import difflib
+
+    from verify import extract
+    if len(args.files) != 2:
+        raise SystemExit("diff --text: give exactly two files")
+    old_path, new_path = args.files
+    old = [p for p in extract(old_path).paragraphs if p.strip()]
+    new = [p for p in extract(new_path).paragraphs if p.strip()]
+    diff = list(difflib.unified_diff(old, new, old_path, new_path, n=args.context, lineterm=''))
+    for line in diff:
+        print(line)
+    return 1 if diff else 0
+
+
+def cmd_index(args):
+    from search_index import SearchIndex
+    with SearchIndex(args.index) as index:
+        report = index.update(args.roots, args.jobs)
+    print(f"{report['files']} files: {report['hashed']} hashed, {report['extracted']} extracted "
+          f"({report['blocks']} blocks), {report['removed']} removed")
+    return 1 if report['errors'] else 0
+
+
+def cmd_search(args):
+    import sqlite3
+
+    from search_index import SearchIndex, print_hits
+    with SearchIndex(args.index) as index:
+        try:
+            hits = index.search(args.query, args.kind, args.series, args.limit, args.first, args.latest)
+        except sqlite3.OperationalError as e:
+            raise SystemExit(f"search: bad query {args.query!r}: {e}")
+    print_hits(hits)
+    return 0 if hits else 1
+
+
+def cmd_latest(args):
+    from version_store import VersionStore
+    # A query: unless asked to rescan, nothing is written to the (possibly served) directory
+    store = VersionStore(args.dir, read_only=not args.rescan)
+    if args.rescan:
+        store.scan()
+    series = store.series()
+    if args.series:
+        series = {key: number for key, number in series.items() if key[0] == args.series}
+    if not series:
+        print("No versioned files found.", file=sys.stderr)
+        return 1
+    for (name, ext), number in sorted(series.items()):
+        if args.next:
+            print(store.path(name, number + 1, ext))
+        else:
+            print(store.get(name, number, ext).path)
+    return 0
+
+
+def cmd_startup(args):
+    import statistics
+    import subprocess
+
+    command = [sys.executable, os.path.abspath(__file__), '--check-imports', 'latest', '--dir', args.dir]
+    baseline, timings = [], []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        baseline.append((time.perf_counter() - started) * 1000)
+        started = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True)
+        timings.append((time.perf_counter() - started) * 1000)
+        if result.returncode == 3:
+            print(result.stderr.strip(), file=sys.stderr)
+            return 1
+    median = statistics.median(timings)
+    overhead = median - statistics.median(baseline)
+    status = 'OK' if median <= args.budget else 'OVER BUDGET'
+    print(f"proposal latest: {median:.1f} ms median over {args.runs} runs "
+          f"({overhead:.1f} ms above a bare interpreter), budget {args.budget:.0f} ms: {status}")
+    return 0 if median <= args.budget else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='proposal', description="Proposal generation and editing tools")
+    parser.add_argument('--check-imports', action='store_true',
+                        help="Fail (exit 3) if a lightweight command imported a heavy module")
+    parser.add_argument('--trace', metavar='FILE', help="Append per-stage timing records as JSON lines ('-' = stderr)")
+    parser.add_argument('--chrome-trace', metavar='FILE', help="Append stages as Chrome trace events")
+    parser.add_argument('--trace-memory', action='store_true', help="Record peak memory per stage (tracemalloc)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help="Render proposals")
+    generate.add_argument('generator', nargs='?', choices=('v13', 'v14', 'v15'))
+    generate.add_argument('-o', '--output')
+    generate.add_argument('--customer')
+    generate.add_argument('--variant', action='append', choices=('basic', 'optimal', 'budget'))
+    generate.add_argument('--qty', action='append', default=[], metavar='SKU=N', help="Quantity override (v15)")
+    generate.add_argument('--stream', action='store_true', help="Write pages out as they are finished (v15)")
+    generate.add_argument('--items', metavar='FILE',
+                          help="Line items from a CSV export or an SQLite file: the v13 solution table, "
+                               "a v15 appendix")
+    generate.add_argument('--query', help="SQL selecting name, qty, unit price[, group] for an SQLite --items")
+    generate.add_argument('--specs', help="Render a batch of specs (.json, .yaml) instead")
+    generate.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    generate.add_argument('--out-dir', default='.')
+    generate.set_defaults(func=cmd_generate, heavy=True)
+
+    patch = commands.add_parser('patch', help="Edit a DOCX (streaming patcher or changeset)")
+    patch.add_argument('source', nargs='?')
+    patch.add_argument('-o', '--output')
+    patch.add_argument('--changeset', help="Apply a changeset file (.json, .yaml)")
+    patch.add_argument('--series', help="Patch the latest DOCX of this series into its next version")
+    patch.add_argument('--dir', default='.', help="Version store directory for --series")
+    patch.add_argument('--delete-row', action='append', default=[], metavar='TEXT')
+    patch.add_argument('--replace', action='append', nargs=2, default=[], metavar=('OLD', 'NEW'))
+    patch.add_argument('--set-cell', action='append', nargs=3, default=[], metavar=('ROW_TEXT', 'CURRENT', 'NEW'))
+    patch.set_defaults(func=cmd_patch, heavy=True)
+
+    verify = commands.add_parser('verify', help="Check DOCX and PDF files: text, rows, totals, leftover models")
+    verify.add_argument('files', nargs='+')
+    verify.add_argument('--contains', action='append', default=[], metavar='TEXT')
+    verify.add_argument('--absent', action='append', default=[], metavar='TEXT')
+    verify.add_argument('--row', action='append', nargs='+', default=[], metavar='TEXT')
+    verify.add_argument('--totals', action='store_true', help="Check Итого rows against the rows above")
+    verify.add_argument('--legacy', action='store_true', help="Fail on leftover old hardware models")
+    verify.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    verify.set_defaults(func=cmd_verify, heavy=True)
+
+    diff = commands.add_parser('diff', help="Show changed sections, paragraphs and line items between versions")
+    diff.add_argument('files', nargs='*', help="Two versions, or more to diff each consecutive pair")
+    diff.add_argument('--series', help="Diff versions of this series in the version store instead")
+    diff.add_argument('--dir', default='.', help="Version store directory for --series")
+    diff.add_argument('--ext', default='docx')
+    diff.add_argument('--from', dest='first', type=int, metavar='N')
+    diff.add_argument('--to', dest='last', type=int, metavar='N')
+    diff.add_argument('--chain', action='store_true', help="Diff every consecutive pair")
+    diff.add_argument('--summary', action='store_true', help="One line per diff")
+    diff.add_argument('--json', action='store_true')
+    diff.add_argument('--text', action='store_true', help="Unified diff of the paragraph texts instead")
+    diff.add_argument('-U', '--context', type=int, default=1)
+    diff.set_defaults(func=cmd_diff, heavy=True)
+
+    index = commands.add_parser('index', help="Update the full-text index of DOCX, PDF and Markdown revisions")
+    index.add_argument('roots', nargs='*', default=['.'])
+    index.add_argument('--index', help="Index file (default: in the proposal cache)")
+    index.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    index.set_defaults(func=cmd_index, heavy=True)
+
+    search = commands.add_parser('search', help="Query the full-text index (FTS5 syntax)")
+    search.add_argument('query')
+    search.add_argument('--index', help="Index file (default: in the proposal cache)")
+    search.add_argument('--kind', action='append', choices=('paragraph', 'row', 'item'))
+    search.add_argument('--series', help="Only this series, e.g. Проектноепредложение3")
+    search.add_argument('--first', action='store_true', help="Only the earliest matching revision of each series")
+    search.add_argument('--latest', action='store_true', help="Only search the newest revision of each series")
+    search.add_argument('-n', '--limit', type=int, default=50)
+    search.set_defaults(func=cmd_search, heavy=False)
+
+    latest = commands.add_parser('latest', help="Print the newest file of each versioned series")
+    latest.add_argument('--dir', default='.')
+    latest.add_argument('--series', help="Only this series, e.g. Commercial_Proposal")
+    latest.add_argument('--next', action='store_true', help="Print the next free version name instead")
+    latest.add_argument('--rescan', action='store_true', help="Record files added without the version store first")
+    latest.set_defaults(func=cmd_latest, heavy=False)
+
+    startup = commands.add_parser('startup', help="Measure start-up time of a lightweight command")
+    startup.add_argument('--runs', type=int, default=10)
+    startup.add_argument('--budget', type=float, default=STARTUP_BUDGET_MS, help="Budget in ms")
+    startup.add_argument('--dir', default='.')
+    startup.set_defaults(func=cmd_startup, heavy=False)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace or args.chrome_trace:
+        import instrumentation
+        instrumentation.configure(args.trace, args.chrome_trace, args.trace_memory or None)
+    status = args.func(args)
+    if args.check_imports and not args.heavy:
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        if loaded:
+            print(f"{args.command} imported heavy modules: {', '.join(loaded)}", file=sys.stderr)
+            return 3
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,428 @@
+"""
+Structural diff between proposal revisions.
+
+A revision (DOCX, fpdf PDF or proposal_v*.md) is parsed into a model of
+sections - the heading path, e.g. "2. Техническая реализация › 2.1. Вариант 1
+› Аппаратное обеспечение" - with their paragraphs, and table line items
+whose columns are recognized from the table headers (name, spec, qty, price,
+total; other columns are kept under their header text). Two models are then
+compared: sections added or removed, paragraphs changed within a section,
+and line items added, removed, respecified or repriced.
+
+    python proposal_diff.py client/public/Проектноепредложение3_v7.docx client/public/Проектноепредложение3_v11.docx
+    python proposal_diff.py v7.docx v8.docx v9.docx v10.docx v11.docx   # each step of a chain
+    python proposal_diff.py --series Проектноепредложение3 --dir client/public --from 2 --chain --summary
+
+Models are cached per content hash in the proposal cache directory, so a
+file is parsed once however many diffs it takes part in; for revisions in a
+version store the manifest already has the hash, and packed revisions are
+only reassembled when their model is not cached yet.
+"""
+import argparse
+import difflib
+import json
+import os
+import re
+import sys
+from collections import Counter, namedtuple
+
+from cache_paths import cache_dir
+from version_store import VersionStore, file_digest
+
+# Bump when build_model() output changes: cached models are rebuilt
+MODEL_VERSION = 1
+ROLES = (
+    ('number', re.compile(r'^(№|#|n)$', re.I)),
+    ('qty', re.compile(r'кол|qty|quantity', re.I)),
+    ('total', re.compile(r'сумм|стоимост|total', re.I)),
+    ('price', re.compile(r'цен|price', re.I)),
+    ('spec', re.compile(r'специфик|описан|назначен|характерист', re.I)),
+    ('name', re.compile(r'наименов|компонент|позиц|статья|^по$|name|item', re.I)),
+)
+AMOUNT_ROLES = ('price', 'total')
+# Joins the headings of a section path; titles themselves contain " / " ("Pilot / MVP")
+SECTION_SEPARATOR = ' › '
+
+MD_MARKUP_RE = re.compile(r'\*\*|__|`')
+MD_TABLE_SEPARATOR_RE = re.compile(r'^\|?[\s:|-]+\|?$')
+
+Diff = namedtuple('Diff', 'old new sections_added sections_removed paragraphs items_added items_removed items_changed')
+
+
+def _clean(text):
+    return ' '.join(text.split())
+
+
+# -- parsing ---------------------------------------------------------------
+
+def _docx_blocks(path):
+    from verify import extract_docx
+    document = extract_docx(path)
+    headings = dict(document.headings)
+    starts = {}
+    for table, (start, end) in enumerate(document.tables):
+        starts.setdefault(start, []).append(table)
+    rows = {}
+    for table, cells in document.rows:
+        rows.setdefault(table, []).append(cells)
+    position = 0
+    while position <= len(document.paragraphs):
+        for table in starts.get(position, ()):
+            for cells in rows.get(table, ()):
+                yield 'row', table, cells
+        inside = [document.tables[table][1] for table in starts.get(position, ())]
+        if inside and max(inside) > position:
+            # Cell paragraphs are part of the rows
+            position = max(inside)
+            continue
+        if position < len(document.paragraphs):
+            text = document.paragraphs[position]
+            if position in headings:
+                yield 'heading', headings[position], text
+            elif text.strip():
+                yield 'paragraph', None, text
+        position += 1
+
+
+def _pdf_blocks(path):
+    from verify import pdf_pages
+    for page, lines in enumerate(pdf_pages(path)):
+        yield 'heading', 1, f"Страница {page + 1}"
+        for cells in lines:
+            if len(cells) > 1:
+                # Columns counted from the right edge, as verify does
+                yield 'row', page, [(position - len(cells) + 1, text) for position, (_, text) in enumerate(cells)]
+            elif cells[0][1].strip():
+                yield 'paragraph', None, cells[0][1]
+
+
+def _markdown_blocks(path):
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    paragraph, table, in_table = [], -1, False
+    for line in lines + ['']:
+        stripped = MD_MARKUP_RE.sub('', line).strip()
+        if not stripped or stripped.startswith(('#', '|')) or stripped == '---':
+            if paragraph:
+                yield 'paragraph', None, ' '.join(paragraph)
+                paragraph = []
+        if stripped.startswith('|'):
+            if not in_table:
+                table, in_table = table + 1, True
+            if not MD_TABLE_SEPARATOR_RE.match(stripped):
+                cells = stripped.strip('|').split('|')
+                yield 'row', table, [(column, re.sub(r'<br\s*/?>', '\n', text).strip())
+                                     for column, text in enumerate(cells)]
+            continue
+        in_table = False
+        if stripped.startswith('#'):
+            yield 'heading', len(stripped) - len(stripped.lstrip('#')), stripped.lstrip('#').strip()
+        elif stripped and stripped != '---':
+            paragraph.append(stripped)
+
+
+def _blocks(path):
+    lower = path.lower()
+    if lower.endswith('.pdf'):
+        return _pdf_blocks(path)
+    if lower.endswith('.md'):
+        return _markdown_blocks(path)
+    return _docx_blocks(path)
+
+
+def _header_roles(cells, first):
+    """
+    {column: role} if the row is a table header, else None: the first row
+    of a table unless it holds amounts, or a repeated header that names at
+    least two known columns.
+    """
+    from verify import amount
+    if any(amount(text) is not None for _, text in cells):
+        return None
+    roles = {}
+    for column, text in cells:
+        text = _clean(text)
+        role = next((role for role, pattern in ROLES if pattern.search(text)), None)
+        roles[column] = role or text
+    known = [role for role in roles.values() if role in ('name', 'qty', 'price', 'total', 'spec')]
+    return roles if known and (first or len(known) >= 2) else None
+
+
+def build_model(path):
+    """{'sections': [[title, [paragraphs]]], 'items': [item]} of a DOCX, PDF or Markdown file."""
+    from verify import amount
+    sections = [['', []]]
+    titles, items, occurrences = [], [], Counter()
+    roles, table = {}, None
+    for kind, level, value in _blocks(path):
+        if kind == 'heading':
+            # A heading replaces the headings at its level and below it
+            titles = [(title_level, title) for title_level, title in titles if title_level < level]
+            titles.append((level, _clean(value)))
+            sections.append([SECTION_SEPARATOR.join(title for _, title in titles), []])
+            continue
+        if kind == 'paragraph':
+            sections[-1][1].append(_clean(value))
+            continue
+        first = level != table
+        if first:
+            roles, table = {}, level
+        cells = value
+        header = _header_roles(cells, first)
+        if header is not None:
+            roles = header
+            continue
+        if not any(text.strip() for _, text in cells):
+            continue
+        name_column = next((column for column, role in roles.items() if role == 'name'), None)
+        name_cell = next(((column, text) for column, text in cells if column == name_column and text.strip()),
+                         None) or next((column, text) for column, text in cells if text.strip())
+        values = {}
+        for column, text in cells:
+            if (column, text) == name_cell:
+                continue
+            role = roles.get(column)
+            if role is None:
+                role = 'total' if column == cells[-1][0] and amount(text) is not None else f"column {column}"
+            if role != 'number' and text.strip():
+                values[role] = _clean(text.split('\n')[0]) if role == 'spec' else _clean(text)
+        name = _clean(name_cell[1].split('\n')[0])
+        section = sections[-1][0]
+        occurrences[section, name] += 1
+        items.append({'key': [section, name, occurrences[section, name]], 'name': name, 'values': values})
+    return {'sections': [section for section in sections if section[0] or section[1]], 'items': items}
+
+
+def _model_path(sha256):
+    return os.path.join(cache_dir('diff-models'), f"{sha256}.json")
+
+
+_models = {}
+
+
+def load_model(path, sha256=None, build=None):
+    """
+    The model of `path`, from memory, the on-disk cache or by parsing it.
+    `sha256` skips hashing when the caller knows it; `build()` replaces
+    build_model(path) when `path` itself is not on disk (packed).
+    """
+    if sha256 is None:
+        sha256, _ = file_digest(path)
+    if sha256 in _models:
+        return _models[sha256]
+    cached = _model_path(sha256)
+    try:
+        with open(cached, encoding='utf-8') as f:
+            model = json.load(f)
+        if model.get('format') != MODEL_VERSION:
+            model = None
+    except (OSError, ValueError):
+        model = None
+    if model is None:
+        model = build() if build is not None else build_model(path)
+        model['format'] = MODEL_VERSION
+        tmp_path = '%s.%d.tmp' % (cached, os.getpid())
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(model, f, ensure_ascii=False)
+        os.replace(tmp_path, cached)
+    _models[sha256] = model
+    return model
+
+
+# -- comparison ------------------------------------------------------------
+
+def diff_models(old, new, old_name='old', new_name='new'):
+    old_sections, new_sections = dict(old['sections']), dict(new['sections'])
+    paragraphs = {}
+    for title, texts in new_sections.items():
+        if title not in old_sections or old_sections[title] == texts:
+            continue
+        removed, added = [], []
+        matcher = difflib.SequenceMatcher(None, old_sections[title], texts, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != 'equal':
+                removed += old_sections[title][i1:i2]
+                added += texts[j1:j2]
+        paragraphs[title] = (removed, added)
+
+    old_items = {tuple(item['key']): item for item in old['items']}
+    new_items = {tuple(item['key']): item for item in new['items']}
+    changed = []
+    for key, item in new_items.items():
+        before = old_items.get(key)
+        if before is None or before['values'] == item['values']:
+            continue
+        fields = {role: (before['values'].get(role), item['values'].get(role))
+                  for role in sorted(set(before['values']) | set(item['values']))
+                  if before['values'].get(role) != item['values'].get(role)}
+        changed.append((before, item, fields))
+    return Diff(
+        old_name, new_name,
+        [title for title in new_sections if title not in old_sections],
+        [title for title in old_sections if title not in new_sections],
+        paragraphs,
+        [item for key, item in new_items.items() if key not in old_items],
+        [item for key, item in old_items.items() if key not in new_items],
+        changed,
+    )
+
+
+def is_repriced(fields):
+    """A change to a price, a total or another amount column (e.g. per-variant budgets)."""
+    from verify import amount
+    return any(role in AMOUNT_ROLES or any(text is not None and amount(text) is not None for text in change)
+               for role, change in fields.items() if role not in ('qty', 'spec'))
+
+
+def summary(diff):
+    repriced = sum(1 for _, _, fields in diff.items_changed if is_repriced(fields))
+    return {
+        'sections_added': len(diff.sections_added),
+        'sections_removed': len(diff.sections_removed),
+        'sections_edited': len(diff.paragraphs),
+        'items_added': len(diff.items_added),
+        'items_removed': len(diff.items_removed),
+        'items_changed': len(diff.items_changed),
+        'items_repriced': repriced,
+    }
+
+
+def is_empty(diff):
+    return not any(summary(diff).values())
+
+
+# -- output ----------------------------------------------------------------
+
+def _short(text, width=100):
+    return text if len(text) <= width else text[:width - 1] + '…'
+
+
+def _describe(item):
+    spec = item['values'].get('spec')
+    return f"{item['name']} ({spec})" if spec else item['name']
+
+
+def _section(title, depth=2):
+    """The innermost headings of a section path, which are enough to place it."""
+    return SECTION_SEPARATOR.join(title.split(SECTION_SEPARATOR)[-depth:])
+
+
+def _where(item):
+    return f"[{_section(item['key'][0])}] " if item['key'][0] else ''
+
+
+def _values(item):
+    return ', '.join(f"{role} {text}" for role, text in item['values'].items() if role != 'spec')
+
+
+def print_diff(diff, out=sys.stdout):
+    print(f"--- {diff.old}\n+++ {diff.new}", file=out)
+    for title in diff.sections_added:
+        print(f"+ § {_section(title)}", file=out)
+    for title in diff.sections_removed:
+        print(f"- § {_section(title)}", file=out)
+    for title, (removed, added) in diff.paragraphs.items():
+        print(f"§ {_section(title) or '(before the first heading)'}", file=out)
+        for text in removed:
+            print(f"  - {_short(text)}", file=out)
+        for text in added:
+            print(f"  + {_short(text)}", file=out)
+    for item in diff.items_added:
+        print(f"+ {_where(item)}{_describe(item)}: {_values(item)}", file=out)
+    for item in diff.items_removed:
+        print(f"- {_where(item)}{_describe(item)}: {_values(item)}", file=out)
+    for before, item, fields in diff.items_changed:
+        changes = '; '.join(f"{role} {old or '—'} -> {new or '—'}" for role, (old, new) in fields.items())
+        label = ' (repriced)' if is_repriced(fields) else ''
+        print(f"~ {_where(item)}{_describe(before)}: {changes}{label}", file=out)
+    print_summary(diff, out)
+
+
+def print_summary(diff, out=sys.stdout):
+    counts = summary(diff)
+    print(f"{diff.old} -> {diff.new}: "
+          f"sections +{counts['sections_added']} -{counts['sections_removed']} ~{counts['sections_edited']}, "
+          f"items +{counts['items_added']} -{counts['items_removed']} ~{counts['items_changed']} "
+          f"({counts['items_repriced']} repriced)", file=out)
+
+
+def as_json(diff):
+    return {
+        'old': diff.old, 'new': diff.new, 'summary': summary(diff),
+        'sections_added': diff.sections_added, 'sections_removed': diff.sections_removed,
+        'paragraphs': {title: {'removed': removed, 'added': added}
+                       for title, (removed, added) in diff.paragraphs.items()},
+        'items_added': diff.items_added, 'items_removed': diff.items_removed,
+        'items_changed': [{'old': before, 'new': item, 'fields': fields, 'repriced': is_repriced(fields)}
+                          for before, item, fields in diff.items_changed],
+    }
+
+
+# -- revisions -------------------------------------------------------------
+
+def file_revisions(paths):
+    """(name, model loader) for plain files."""
+    return [(path, lambda path=path: load_model(path)) for path in paths]
+
+
+def series_revisions(directory, series, ext='docx', first=None, last=None):
+    """(name, model loader) for the revisions of a version store series, packed ones included."""
+    store = VersionStore(directory, read_only=True)
+    revisions = []
+    for version in store.versions(series, ext):
+        if (first is not None and version.number < first) or (last is not None and version.number > last):
+            continue
+
+        def build(version=version):
+            import tempfile
+            with tempfile.TemporaryDirectory(prefix='proposal-diff-') as scratch:
+                return build_model(store.checkout(version, os.path.join(scratch, os.path.basename(version.path))))
+
+        packed = version.packed or not os.path.exists(version.path)
+        revisions.append((os.path.basename(version.path),
+                          lambda version=version, build=build if packed else None:
+                          load_model(version.path, version.sha256, build)))
+    return revisions
+
+
+def diff_revisions(revisions, chain=False):
+    """Diffs of the first revision against the last, or of every step with `chain`."""
+    if len(revisions) < 2:
+        return []
+    pairs = zip(revisions, revisions[1:]) if chain else [(revisions[0], revisions[-1])]
+    return [diff_models(old(), new(), old_name, new_name) for (old_name, old), (new_name, new) in pairs]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Structural diff of proposal revisions (DOCX, PDF, Markdown)")
+    parser.add_argument('files', nargs='*', help="Two revisions, or more to diff each consecutive pair")
+    parser.add_argument('--series', help="Diff revisions of this version store series instead")
+    parser.add_argument('--dir', default='.', help="Version store directory for --series")
+    parser.add_argument('--ext', default='docx')
+    parser.add_argument('--from', dest='first', type=int, metavar='N')
+    parser.add_argument('--to', dest='last', type=int, metavar='N')
+    parser.add_argument('--chain', action='store_true', help="Diff every consecutive pair")
+    parser.add_argument('--summary', action='store_true', help="One line per diff")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+    return run(args)
+
+
+def run(args):
+    if args.series:
+        revisions = series_revisions(args.dir, args.series, args.ext, args.first, args.last)
+    elif len(args.files) >= 2:
+        revisions = file_revisions(args.files)
+    else:
+        raise SystemExit("diff: give two or more files, or --series")
+    diffs = diff_revisions(revisions, args.chain or (not args.series and len(args.files) > 2))
+    if args.json:
+        json.dump([as_json(diff) for diff in diffs], sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    for diff in diffs if not args.json else ():
+        print_summary(diff) if args.summary else print_diff(diff)
+    return 1 if any(not is_empty(diff) for diff in diffs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Local proposal rendering service.
+
+Keeps a pool of warm worker processes (python-docx, lxml and fpdf imported,
+price catalog loaded, fonts parsed, DOCX template read - see
+batch_generate._init_worker) and renders proposal specs sent over HTTP, on
+a TCP port or a Unix socket:
+
+    POST /render   {"customer": "...", "variants": ["basic"], "quantities": {...}}
+                   -> application/pdf (v15) or DOCX (generator: "v14") bytes
+    GET  /health   -> {"status": "ok", "workers": 4}
+
+Requests are handled concurrently; each one occupies a pool worker only for
+the time it takes to lay out its document. If a worker dies (out of memory,
+a crash in a C extension) the pool is broken: a new pool is started and
+warmed, and the request that hit the broken one gets a 503 to retry.
+
+Usage: python render_service.py [--port 8765 | --socket /tmp/proposal.sock] [-j 4]
+"""
+import argparse
+import io
+import json
+import os
+import socketserver
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch_generate import GENERATORS, _init_worker, build
+from instrumentation import stage
+
+CONTENT_TYPES = {
+    'v14': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'v15': 'application/pdf',
+}
+MAX_SPEC_BYTES = 1 << 20
+
+
+class SpecError(ValueError):
+    pass
+
+
+def render_bytes(spec):
+    """Worker side: render a spec in memory. Returns (bytes, seconds)."""
+    started = time.perf_counter()
+    output = io.BytesIO()
+    with stage('document', spec.get('customer'), generator=spec.get('generator', 'v15')):
+        build(spec, output)
+    return output.getvalue(), time.perf_counter() - started
+
+
+def _ping():
+    return os.getpid()
+
+
+def start_pool(jobs):
+    """A pool of `jobs` workers, every one started and warmed before it is returned."""
+    pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker)
+    wait([pool.submit(_ping) for _ in range(jobs)])
+    return pool
+
+
+def restart_pool(server, broken):
+    """Replace the server's pool if it still is `broken`; concurrent callers restart it once."""
+    with server.pool_lock:
+        if server.pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            server.pool = start_pool(server.jobs)
+
+
+def parse_spec(body):
+    try:
+        spec = json.loads(body)
+    except ValueError as e:
+        raise SpecError(f"Invalid JSON: {e}") from None
+    if not isinstance(spec, dict):
+        raise SpecError("The spec must be a JSON object")
+    if spec.get('generator', 'v15') not in GENERATORS:
+        raise SpecError(f"Unknown generator: {spec['generator']}")
+    return spec
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    server_version = 'ProposalRender/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _send(self, status, body, content_type='application/json', headers=()):
+        if isinstance(body, dict):
+            body = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send(404, {'error': f"Not found: {self.path}"})
+            return
+        self._send(200, {'status': 'ok', 'workers': self.server.jobs})
+
+    def do_POST(self):
+        if self.path != '/render':
+            self._send(404, {'error': f"Not found: {self.path}"})
+            return
+        started = time.perf_counter()
+        # Waits while a broken pool is being replaced
+        with self.server.pool_lock:
+            pool = self.server.pool
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length > MAX_SPEC_BYTES:
+                raise SpecError("Spec too large")
+            spec = parse_spec(self.rfile.read(length))
+            data, seconds = pool.submit(render_bytes, spec).result()
+        except BrokenProcessPool:
+            restart_pool(self.server, pool)
+            self._send(503, {'error': "A render worker died; the pool was restarted"}, headers=[('Retry-After', '0')])
+            return
+        except SpecError as e:
+            self._send(400, {'error': str(e)})
+            return
+        except ValueError as e:
+            # Unknown variants or SKUs are raised from the generators
+            self._send(422, {'error': f"{type(e).__name__}: {e}"})
+            return
+        except Exception as e:
+            self._send(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        generator = spec.get('generator', 'v15')
+        self._send(200, data, CONTENT_TYPES[generator], [
+            ('X-Render-Seconds', '%.4f' % seconds),
+            ('X-Total-Seconds', '%.4f' % (time.perf_counter() - started)),
+        ])
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(port=8765, host='127.0.0.1', socket_path=None):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return UnixHTTPServer(socket_path, RenderHandler)
+    return ThreadingHTTPServer((host, port), RenderHandler)
+
+
+def serve(port=8765, host='127.0.0.1', socket_path=None, jobs=None):
+    jobs = jobs or os.cpu_count()
+    server = make_server(port, host, socket_path)
+    # Start and warm every worker before accepting requests
+    server.pool = start_pool(jobs)
+    server.pool_lock = threading.Lock()
+    server.jobs = jobs
+    print(f"Rendering service on {socket_path or f'http://{host}:{port}/'} ({jobs} warm workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.shutdown()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve proposal rendering over HTTP with warm workers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--socket', help="Listen on a Unix socket instead of TCP")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="Worker processes")
+    args = parser.parse_args()
+    serve(args.port, args.host, args.socket, args.jobs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Lazy sources of proposal line items.
+
+The table renderers (PDF.add_table in v15, build_solution in v13) take any
+iterable of rows, so a specification does not have to be materialized as a
+list first. The sources here yield (name, qty, unit_price[, group]) items
+one at a time from a CSV export of the 1C price list or from a database
+cursor, which is read in fetchmany() chunks; pricing.RunningTotals turns
+them into display rows and keeps the totals as they go by.
+
+    items = csv_items('price_1c.csv')                      # header names are recognized
+    items = sqlite_items('snapshot.db', 'SELECT name, qty, price FROM lines')
+    items = cursor_items(pg_connection.cursor('spec'))     # any DB-API cursor
+
+A PostgreSQL cursor should be a named (server-side) one, or the driver
+fetches the whole result on execute().
+"""
+import codecs
+import csv
+import os
+import re
+import sqlite3
+from decimal import Decimal
+from pathlib import Path
+
+from pricing import KOPECKS, parse_amount, to_qty
+
+CHUNK_ROWS = 1000
+SNIFF_BYTES = 64 * 1024
+
+# Recognized header names (lowercased) of each item field
+COLUMNS = {
+    'name': ('name', 'наименование', 'номенклатура', 'товар', 'товар/услуга'),
+    'qty': ('qty', 'quantity', 'количество', 'кол-во'),
+    'unit_price': ('unit_price', 'price', 'цена', 'цена за ед.', 'цена за единицу'),
+    'group': ('group', 'category', 'группа', 'категория', 'вид номенклатуры'),
+}
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+# Footer lines of a 1C export ("Итого:", "Всего наименований 12")
+TOTAL_RE = re.compile(r'^\s*(итого|всего)', re.I)
+
+
+def _sniff(path, encoding, delimiter):
+    """(encoding, delimiter) of a CSV file; 1C saves cp1251 unless told otherwise."""
+    with open(path, 'rb') as f:
+        sample = f.read(SNIFF_BYTES)
+    if encoding is None:
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample)
+            encoding = 'utf-8-sig'
+        except UnicodeDecodeError:
+            encoding = 'cp1251'
+    if delimiter is None:
+        text = sample.decode(encoding, errors='ignore')
+        try:
+            delimiter = csv.Sniffer().sniff(text.split('\n', 1)[0], delimiters=';,\t').delimiter
+        except csv.Error:
+            delimiter = ';'
+    return encoding, delimiter
+
+
+def _column_positions(header, columns):
+    """Header positions of the item fields; `columns` maps a field to a header name or index."""
+    names = [cell.strip().lower() for cell in header]
+    positions = {}
+    for field, aliases in COLUMNS.items():
+        wanted = columns.get(field) if columns else None
+        if isinstance(wanted, int):
+            positions[field] = wanted
+            continue
+        for alias in (wanted.lower(),) if wanted else aliases:
+            if alias in names:
+                positions[field] = names.index(alias)
+                break
+    missing = [field for field in ('name', 'qty', 'unit_price') if field not in positions]
+    if missing:
+        raise ValueError(f"No {', '.join(missing)} column in {header}")
+    return positions
+
+
+def csv_items(path, columns=None, delimiter=None, encoding=None):
+    """
+    (name, qty, unit_price, group) per line of a CSV file with a header row.
+    Columns are found by their header names (see COLUMNS) unless `columns`
+    gives a header name or 0-based index per field; the delimiter and the
+    encoding are detected when not given. Lines without a name or a quantity
+    and total lines are skipped; the quantity is read with pricing.to_qty()
+    and the price is yielded as a Decimal in rubles. A quantity or price that
+    cannot be read raises ValueError naming the file and line.
+    """
+    encoding, delimiter = _sniff(path, encoding, delimiter)
+    with open(path, encoding=encoding, newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        positions = _column_positions(header, columns)
+        name, qty, unit_price = positions['name'], positions['qty'], positions['unit_price']
+        group = positions.get('group')
+        for row in reader:
+            # Short rows (notes, footers) simply have blank cells at the end
+            cells = [cell.strip() for cell in row]
+            cells += [''] * (max(positions.values()) + 1 - len(cells))
+            if not cells[name] or not cells[qty] or TOTAL_RE.match(cells[name]):
+                continue
+            try:
+                item_qty = to_qty(cells[qty])
+                price = Decimal(parse_amount(cells[unit_price])[1]) / KOPECKS
+            except ValueError as e:
+                raise ValueError(f"{path}:{reader.line_num}: {e}") from None
+            yield cells[name], item_qty, price, cells[group] if group is not None else None
+
+
+def cursor_items(cursor, size=CHUNK_ROWS):
+    """The rows of an executed DB-API cursor, fetched `size` at a time."""
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def sqlite_items(path, query, params=(), size=CHUNK_ROWS):
+    """The rows of `query` over an SQLite file, opened read-only."""
+    connection = sqlite3.connect(Path(path).resolve().as_uri() + '?mode=ro', uri=True)
+    try:
+        yield from cursor_items(connection.execute(query, params), size)
+    finally:
+        connection.close()
+
+
+def open_items(path, query=None):
+    """Items of a CSV file, or of `query` over an SQLite file (by extension)."""
+    if os.path.splitext(path)[1].lower() in SQLITE_EXTENSIONS:
+        if not query:
+            raise ValueError(f"{path}: an SQLite source needs a query")
+        return sqlite_items(path, query)
+    return csv_items(path)
@@ -0,0 +1,373 @@
+"""
+Full-text index of every proposal revision.
+
+All DOCX, PDF and proposal_v*.md files under the given directories are split
+into paragraphs, table rows and line items (rows whose last cell is an
+amount), and stored with their location in an SQLite FTS5 index, so
+questions like "which revision first priced YADRO G4208P at 32 151 159" or
+"where does MES5324 still appear" are one query instead of opening every
+file:
+
+    python search_index.py update client/public .
+    python search_index.py search '"YADRO G4208P" "32 151 159"' --kind item --first
+    python search_index.py search MES5324 --latest      # still in a current revision?
+
+Updates are incremental. Files whose size and mtime are unchanged are
+skipped; the others are hashed, and content is only extracted for hashes the
+index has not seen (a file copied or renamed costs one hash). Revisions that
+the version store has packed away are indexed from their stored members.
+Extraction uses verify's streaming readers, never a python-docx load, and
+runs on -j processes. Only PDFs written by fpdf carry text verify can read;
+the browser-printed proposal_v*.pdf come from the proposal_v*.md indexed
+next to them.
+
+The index lives in the proposal cache directory (see cache_paths) unless
+--index is given. Queries use the FTS5 syntax: words, "exact phrases",
+prefix*, AND / OR / NOT, NEAR(a b, 5).
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+from cache_paths import cache_dir
+from version_store import MANIFEST, VERSION_RE, VersionStore, file_digest
+
+# Bump when the schema or what extract_blocks() produces changes: the index is rebuilt
+SCHEMA_VERSION = 3
+EXTENSIONS = ('.docx', '.pdf')
+SKIP_DIRS = ('node_modules', '__pycache__', 'venv', '.venv')
+KINDS = ('paragraph', 'row', 'item')
+MD_TABLE_SEPARATOR_RE = re.compile(r'^\|?[\s:|-]+\|?$')
+MD_MARKUP_RE = re.compile(r'<br\s*/?>|\*\*|__|`')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER, mtime_ns INTEGER,
+    family TEXT NOT NULL, series TEXT, version INTEGER);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+CREATE INDEX IF NOT EXISTS files_family ON files (family, version);
+CREATE TABLE IF NOT EXISTS contents (sha256 TEXT PRIMARY KEY, blocks INTEGER, indexed REAL);
+CREATE VIRTUAL TABLE IF NOT EXISTS blocks USING fts5(
+    text, sha256 UNINDEXED, kind UNINDEXED, location UNINDEXED, position UNINDEXED);
+"""
+
+
+def default_index():
+    return os.path.join(cache_dir(), 'search.sqlite')
+
+
+def is_indexed_file(name):
+    if name.startswith(('~$', '.')):
+        return False
+    lower = name.lower()
+    if lower.endswith('.md'):
+        # Notes (todo.md, ideas.md) are not proposals
+        return VERSION_RE.match(name) is not None
+    return lower.endswith(EXTENSIONS)
+
+
+# -- extraction ------------------------------------------------------------
+
+def _row_block(location, cells):
+    from verify import amount
+    texts = [' '.join(text.split()) for text in cells]
+    kind = 'item' if len(texts) > 1 and amount(texts[-1]) is not None else 'row'
+    return kind, location, ' | '.join(texts)
+
+
+def _docx_blocks(path):
+    from verify import extract_docx
+    document = extract_docx(path)
+    # Cell paragraphs are indexed as part of their row
+    in_table = bytearray(len(document.paragraphs))
+    for start, end in document.tables:
+        in_table[start:end] = b'\x01' * (end - start)
+    number = 0
+    for text, skip in zip(document.paragraphs, in_table):
+        if skip:
+            continue
+        number += 1
+        if text.strip():
+            yield 'paragraph', f"paragraph {number}", text
+    row_numbers = Counter()
+    for table, cells in document.rows:
+        row_numbers[table] += 1
+        yield _row_block(f"table {table + 1}, row {row_numbers[table]}", [text for _, text in cells])
+
+
+def _pdf_blocks(path):
+    from verify import pdf_pages
+    for page, lines in enumerate(pdf_pages(path), 1):
+        for line, cells in enumerate(lines, 1):
+            location = f"page {page}, line {line}"
+            if len(cells) > 1:
+                yield _row_block(location, [text for _, text in cells])
+            elif cells[0][1].strip():
+                yield 'paragraph', location, cells[0][1]
+
+
+def _markdown_blocks(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [MD_MARKUP_RE.sub(' ', line) for line in f.read().splitlines()]
+    paragraph, start = [], 0
+    for number, line in enumerate(lines + [''], 1):
+        stripped = line.strip()
+        if stripped.startswith('|') or not stripped or stripped.startswith('#'):
+            if paragraph:
+                yield 'paragraph', f"line {start}", ' '.join(paragraph)
+                paragraph = []
+        if stripped.startswith('|'):
+            if not MD_TABLE_SEPARATOR_RE.match(stripped):
+                yield _row_block(f"line {number}", stripped.strip('|').split('|'))
+        elif stripped.startswith('#'):
+            yield 'paragraph', f"line {number}", stripped.lstrip('#').strip()
+        elif stripped and stripped != '---':
+            if not paragraph:
+                start = number
+            paragraph.append(stripped)
+
+
+def extract_blocks(path):
+    """[(kind, location, text)] of a DOCX, PDF or Markdown file."""
+    lower = path.lower()
+    if lower.endswith('.pdf'):
+        return list(_pdf_blocks(path))
+    if lower.endswith('.md'):
+        return list(_markdown_blocks(path))
+    return list(_docx_blocks(path))
+
+
+def _extract(task):
+    sha256, path = task
+    try:
+        return sha256, path, extract_blocks(path), None
+    except Exception as e:  # one unreadable file must not stop the update
+        return sha256, path, [], f"{type(e).__name__}: {e}"
+
+
+def _family(path):
+    """(family, series, version): revisions of one series in one directory share a family."""
+    match = VERSION_RE.match(os.path.basename(path))
+    if match is None:
+        return path, None, None
+    family = os.path.join(os.path.dirname(path), f"{match['series']}.{match['ext'].lower()}")
+    return family, match['series'], int(match['version'])
+
+
+# -- index -----------------------------------------------------------------
+
+class SearchIndex:
+    def __init__(self, path=None):
+        self.path = path or default_index()
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+        if row is None or row[0] != str(SCHEMA_VERSION):
+            # Everything in the index can be rebuilt from the files
+            self.db.executescript("DROP TABLE meta; DROP TABLE files; DROP TABLE contents; DROP TABLE blocks;" + SCHEMA)
+            with self.db:
+                self.db.execute("INSERT INTO meta VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _candidates(self, roots):
+        """{path: (size, mtime_ns, (store, packed Version) or None)} of everything to index under `roots`."""
+        found = {}
+        for root in roots:
+            if os.path.isfile(root):
+                stat = os.stat(root)
+                found[os.path.abspath(root)] = (stat.st_size, stat.st_mtime_ns, None)
+                continue
+            for directory, dirs, files in os.walk(root):
+                dirs[:] = [d for d in dirs if not d.startswith('.') and d not in SKIP_DIRS]
+                for name in files:
+                    path = os.path.abspath(os.path.join(directory, name))
+                    if is_indexed_file(name):
+                        stat = os.stat(path)
+                        # Zero-size files are version store allocations still being written
+                        if stat.st_size:
+                            found[path] = (stat.st_size, stat.st_mtime_ns, None)
+                if MANIFEST in files:
+                    store = VersionStore(directory, read_only=True)
+                    for series, ext in store.series():
+                        for version in store.versions(series, ext):
+                            path = os.path.abspath(version.path)
+                            if version.packed and path not in found and is_indexed_file(os.path.basename(path)):
+                                found[path] = (version.size, None, (store, version))
+        return found
+
+    def update(self, roots, jobs=None, verbose=False):
+        """
+        Bring the index up to date with the files under `roots` and drop
+        files that are gone from them. Returns {'files', 'hashed',
+        'extracted', 'removed', 'blocks', 'errors'}.
+        """
+        report = {'files': 0, 'hashed': 0, 'extracted': 0, 'removed': 0, 'blocks': 0, 'errors': 0}
+        found = self._candidates(roots)
+        report['files'] = len(found)
+        known = {path: (sha256, size, mtime_ns) for path, sha256, size, mtime_ns
+                 in self.db.execute("SELECT path, sha256, size, mtime_ns FROM files")}
+        indexed = {sha256 for sha256, in self.db.execute("SELECT sha256 FROM contents")}
+
+        changed, pending = [], {}
+        for path, (size, mtime_ns, packed) in found.items():
+            previous = known.get(path)
+            if previous and previous[1:] == (size, mtime_ns) and (packed is None or previous[0] == packed[1].sha256):
+                continue
+            if packed is not None:
+                sha256 = packed[1].sha256
+            else:
+                sha256, size = file_digest(path)
+                report['hashed'] += 1
+            changed.append((path, sha256, size, mtime_ns, *_family(path)))
+            if sha256 not in indexed and sha256 not in pending:
+                pending[sha256] = (path, packed)
+
+        with ExitStack() as stack:
+            tasks, scratch = [], None
+            for sha256, (path, packed) in pending.items():
+                if packed is not None:
+                    # Packed revisions are reassembled from the object store into a scratch directory
+                    if scratch is None:
+                        import tempfile
+                        scratch = stack.enter_context(tempfile.TemporaryDirectory(prefix='proposal-index-'))
+                    store, version = packed
+                    path = store.checkout(version, os.path.join(scratch, f"{sha256}.{version.ext}"))
+                tasks.append((sha256, path))
+            failed = set()
+            with self.db:
+                for sha256, _, blocks, error in self._extract_all(tasks, jobs):
+                    path = pending[sha256][0]
+                    if error:
+                        # Not recorded, so the next update tries the file again
+                        report['errors'] += 1
+                        failed.add(sha256)
+                        print(f"Could not index {path}: {error}", file=sys.stderr)
+                        continue
+                    self.db.executemany(
+                        "INSERT INTO blocks (text, sha256, kind, location, position) VALUES (?, ?, ?, ?, ?)",
+                        ((text, sha256, kind, location, position) for position, (kind, location, text) in enumerate(blocks)))
+                    self.db.execute("INSERT OR REPLACE INTO contents VALUES (?, ?, ?)", (sha256, len(blocks), time.time()))
+                    report['extracted'] += 1
+                    report['blocks'] += len(blocks)
+                    if verbose:
+                        print(f"indexed {path}: {len(blocks)} blocks")
+                self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    [file for file in changed if file[1] not in failed])
+
+                # Forget files that disappeared from the roots, then content no file has any more
+                prefixes = tuple(os.path.join(os.path.abspath(root), '') for root in roots if not os.path.isfile(root))
+                gone = [(path,) for path in known if path not in found and path.startswith(prefixes)]
+                self.db.executemany("DELETE FROM files WHERE path = ?", gone)
+                report['removed'] = len(gone)
+                orphans = [sha256 for sha256, in self.db.execute(
+                    "SELECT sha256 FROM contents WHERE sha256 NOT IN (SELECT sha256 FROM files)")]
+                for sha256 in orphans:
+                    self.db.execute("DELETE FROM blocks WHERE sha256 = ?", (sha256,))
+                    self.db.execute("DELETE FROM contents WHERE sha256 = ?", (sha256,))
+        return report
+
+    @staticmethod
+    def _extract_all(tasks, jobs):
+        if (jobs or os.cpu_count()) <= 1 or len(tasks) <= 1:
+            return map(_extract, tasks)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(_extract, tasks))
+
+    def search(self, query, kinds=None, series=None, limit=50, first=False, latest=False):
+        """
+        Hits for an FTS5 `query` as dicts (path, series, version, kind,
+        location, snippet), oldest revision first. `first` keeps only the
+        earliest matching revision of each series; `latest` only searches
+        the newest revision of each series (and unversioned files).
+        """
+        sql = """
+            SELECT f.path, f.family, f.series, f.version, b.kind, b.location,
+                   snippet(blocks, 0, '[', ']', '…', 16)
+            FROM blocks b JOIN files f ON f.sha256 = b.sha256
+            WHERE blocks MATCH ?"""
+        params = [query]
+        if kinds:
+            sql += f" AND b.kind IN ({', '.join('?' * len(kinds))})"
+            params += kinds
+        if series:
+            sql += " AND f.series = ?"
+            params.append(series)
+        if latest:
+            sql += " AND (f.version IS NULL OR f.version = (SELECT max(version) FROM files g WHERE g.family = f.family))"
+        sql += " ORDER BY f.family, f.version, b.position"
+        hits = [dict(zip(('path', 'family', 'series', 'version', 'kind', 'location', 'snippet'), row))
+                for row in self.db.execute(sql, params)]
+        if first:
+            earliest = {}
+            for hit in hits:
+                earliest.setdefault(hit['family'], hit['version'])
+            hits = [hit for hit in hits if hit['version'] == earliest[hit['family']]]
+        return hits[:limit] if limit else hits
+
+    def stats(self):
+        files, = self.db.execute("SELECT count(*) FROM files").fetchone()
+        contents, blocks = self.db.execute("SELECT count(*), coalesce(sum(blocks), 0) FROM contents").fetchone()
+        return {'files': files, 'contents': contents, 'blocks': blocks, 'bytes': os.path.getsize(self.path)}
+
+
+def print_hits(hits, base='.'):
+    for hit in hits:
+        path = os.path.relpath(hit['path'], base)
+        print(f"{path} [{hit['location']}, {hit['kind']}]: {hit['snippet']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text index of proposal revisions")
+    parser.add_argument('--index', help="Index file (default: search.sqlite in the proposal cache)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    update = commands.add_parser('update', help="Index new and changed files")
+    update.add_argument('roots', nargs='*', default=['.'])
+    update.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    update.add_argument('-v', '--verbose', action='store_true')
+    search = commands.add_parser('search', help="Run an FTS5 query")
+    search.add_argument('query')
+    search.add_argument('--kind', action='append', choices=KINDS)
+    search.add_argument('--series', help="Only this series, e.g. Проектноепредложение3")
+    search.add_argument('--first', action='store_true', help="Only the earliest matching revision of each series")
+    search.add_argument('--latest', action='store_true', help="Only search the newest revision of each series")
+    search.add_argument('-n', '--limit', type=int, default=50)
+    commands.add_parser('stats')
+    args = parser.parse_args(argv)
+
+    with SearchIndex(args.index) as index:
+        if args.command == 'update':
+            started = time.perf_counter()
+            report = index.update(args.roots, args.jobs, args.verbose)
+            print(f"{report['files']} files: {report['hashed']} hashed, {report['extracted']} extracted "
+                  f"({report['blocks']} blocks), {report['removed']} removed in {time.perf_counter() - started:.2f}s")
+            return 1 if report['errors'] else 0
+        if args.command == 'stats':
+            for key, value in index.stats().items():
+                print(f"{key:8} {value}")
+            return 0
+        try:
+            hits = index.search(args.query, args.kind, args.series, args.limit, args.first, args.latest)
+        except sqlite3.OperationalError as e:
+            print(f"Bad query {args.query!r}: {e}", file=sys.stderr)
+            return 2
+        print_hits(hits)
+        return 0 if hits else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
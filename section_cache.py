@@ -0,0 +1,180 @@
+"""
+Section-level caching for the python-docx generators.
+
+A generator is split into section builders, functions that only append body
+content (paragraphs, tables, page breaks) to the document. render_section()
+hashes the code a builder can run - the source of its module and of every
+local module that one uses, directly or through others, plus the versions of
+python-docx and lxml - together with its inputs; if a section
+with the same hash has been rendered before, its body XML is appended from
+the cache instead of being rebuilt, otherwise the builder runs and its
+output is stored. Changing one price re-renders the one table that shows
+it, and the rest of the document comes from the cache.
+
+    render_section(doc, build_summary)
+    render_section(doc, build_hardware_table, items=items)
+
+The cache directory is kept under MAX_CACHE_BYTES: every new fragment
+prunes the least recently used ones (a hit refreshes a fragment's mtime).
+`python section_cache.py --max-mb N` prunes it by hand.
+
+Builders must not touch anything outside the body: style changes are
+document-wide and belong in an always-run preamble, headers and footers are
+separate parts. Modules imported inside a function are not seen as
+dependencies; builders import what they use at module level.
+"""
+import argparse
+import copy
+import hashlib
+import inspect
+import json
+import os
+import sys
+
+import docx
+from docx.oxml import parse_xml
+from lxml import etree
+
+from cache_paths import cache_dir
+from instrumentation import stage
+
+FORMAT_VERSION = 2
+MAX_CACHE_BYTES = 64 << 20
+
+_fragments = {}
+_sources = {}
+
+
+def _local_modules(module):
+    """{name: source file} of `module` and the modules of this tree it uses, transitively."""
+    root = os.path.dirname(os.path.abspath(module.__file__)) + os.sep
+    found, pending = {}, [module]
+    while pending:
+        module = pending.pop()
+        path = getattr(module, '__file__', None)
+        if module.__name__ in found or not path:
+            continue
+        path = os.path.abspath(path)
+        if not path.startswith(root) or 'site-packages' in path:
+            continue
+        found[module.__name__] = path
+        for value in list(vars(module).values()):
+            if inspect.ismodule(value):
+                pending.append(value)
+            elif isinstance(getattr(value, '__module__', None), str) and value.__module__ in sys.modules:
+                pending.append(sys.modules[value.__module__])
+    return found
+
+
+def _code_hash(build):
+    """Hash of the code `build` can run: its module, local dependencies and library versions."""
+    module = inspect.getmodule(build)
+    if module not in _sources:
+        digest = hashlib.sha256()
+        digest.update(('python-docx %s lxml %s\n' % (docx.__version__, etree.__version__)).encode('utf-8'))
+        for name, path in sorted(_local_modules(module).items()):
+            digest.update(name.encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        _sources[module] = digest.hexdigest()
+    return _sources[module]
+
+
+def section_key(build, inputs):
+    """Content hash of a section: builder identity, the code it runs and its inputs."""
+    payload = json.dumps(
+        [FORMAT_VERSION, build.__module__, build.__qualname__, _code_hash(build), inputs],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _insert(body, elements):
+    sect_pr = body.sectPr
+    for element in elements:
+        if sect_pr is not None:
+            sect_pr.addprevious(element)
+        else:
+            body.append(element)
+
+
+def render_section(doc, build, **inputs):
+    """Append the section `build(doc, **inputs)` renders, from cache when possible. Returns True on a hit."""
+    with stage('render', build.__name__) as record:
+        record['cached'] = hit = _render_section(doc, build, inputs)
+    return hit
+
+
+def _render_section(doc, build, inputs):
+    body = doc.element.body
+    key = section_key(build, inputs)
+    fragment = _fragments.get(key)
+    path = os.path.join(cache_dir('sections'), key + '.xml')
+    if fragment is None and os.path.exists(path):
+        with open(path, 'rb') as f:
+            fragment = _fragments[key] = f.read()
+    if fragment is not None:
+        _touch(path)
+        _insert(body, list(parse_xml(fragment)))
+        return True
+
+    # Builders append before the trailing sectPr, so the new content is the
+    # run of children between the old end of the body and the sectPr
+    tail = 1 if body.sectPr is not None else 0
+    start = len(body) - tail
+    build(doc, **inputs)
+    wrapper = etree.Element(body.tag, nsmap=body.nsmap)
+    for child in body[start:len(body) - tail]:
+        wrapper.append(copy.deepcopy(child))
+    fragment = _fragments[key] = etree.tostring(wrapper, encoding='UTF-8')
+
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(fragment)
+    os.replace(tmp_path, path)
+    prune()
+    return False
+
+
+def _touch(path):
+    """Mark a fragment as used, so prune() keeps it."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def prune(max_bytes=None):
+    """Remove the least recently used fragments until the cache fits `max_bytes`. Returns how many."""
+    if max_bytes is None:
+        max_bytes = MAX_CACHE_BYTES
+    entries = []
+    with os.scandir(cache_dir('sections')) as it:
+        for entry in it:
+            if entry.name.endswith('.xml') and entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune the cache of rendered DOCX sections")
+    parser.add_argument('--max-mb', type=float, default=MAX_CACHE_BYTES / (1 << 20),
+                        help="Keep at most this many megabytes of the most recently used sections")
+    args = parser.parse_args()
+    print(f"Removed {prune(int(args.max_mb * (1 << 20)))} cached section(s)")
+
+
+if __name__ == '__main__':
+    main()
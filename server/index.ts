@@ -16,6 +16,23 @@ async function startServer() {
       ? path.resolve(__dirname, "public")
       : path.resolve(__dirname, "..", "dist", "public");
 
+  // Proposal documents are rendered by the local Python service (render_service.py)
+  const renderServiceUrl = process.env.RENDER_SERVICE_URL || "http://127.0.0.1:8765";
+  app.post("/api/render", express.raw({ type: "*/*", limit: "1mb" }), async (req, res) => {
+    try {
+      const response = await fetch(`${renderServiceUrl}/render`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: req.body,
+      });
+      res.status(response.status);
+      res.set("Content-Type", response.headers.get("content-type") ?? "application/octet-stream");
+      res.send(Buffer.from(await response.arrayBuffer()));
+    } catch {
+      res.status(502).json({ error: "Rendering service unavailable" });
+    }
+  });
+
   app.use(express.static(staticPath));
 
   // Handle client-side routing - serve index.html for all routes
@@ -0,0 +1,230 @@
+"""
+Indexed access to the tables of a DOCX document.
+
+python-docx recomputes the merged-cell grid every time `row.cells` is
+accessed, and the edit scripts used to walk every table, row and cell for
+every item they were looking for. TableIndex resolves the grid of each
+table once (horizontal and vertical merges included), caches the cell texts
+and builds a lookup from item names (the first line of a cell, e.g.
+"YADRO G4208P G3") to rows. Row-to-column access is a list lookup.
+
+    index = TableIndex(doc)
+    for row in index.lookup("YADRO G4208P G3"):
+        row.set(row.table.column("Кол-во"), "1 шт.")
+    for row in index.find("СХД", "Raidix"):
+        row.delete()
+"""
+from docx_replace import W_NS, ReplacementEngine
+from docx_stream import W_TC, W_TCPR, W_TR, cell_text, set_cell_text
+
+W_TBL = '{%s}tbl' % W_NS
+W_TRPR = '{%s}trPr' % W_NS
+W_GRIDBEFORE = '{%s}gridBefore' % W_NS
+W_GRIDSPAN = '{%s}gridSpan' % W_NS
+W_VMERGE = '{%s}vMerge' % W_NS
+W_VAL = '{%s}val' % W_NS
+
+
+def normalize(text):
+    """Collapse whitespace (including non-breaking spaces) for lookups."""
+    return ' '.join(text.split())
+
+
+class IndexedRow:
+    __slots__ = ('table', 'position', 'tr', 'cells', 'unique', '_texts', 'deleted')
+
+    def __init__(self, table, position, tr, cells):
+        self.table = table
+        self.position = position
+        self.tr = tr
+        # cells[column] is the <w:tc> covering that grid column (or None)
+        self.cells = cells
+        self.unique = []
+        seen = set()
+        for tc in cells:
+            if tc is not None and id(tc) not in seen:
+                seen.add(id(tc))
+                self.unique.append(tc)
+        self._texts = None
+        self.deleted = False
+
+    @property
+    def texts(self):
+        if self._texts is None:
+            cache = {id(tc): cell_text(tc) for tc in self.unique}
+            self._texts = [cache[id(tc)] if tc is not None else '' for tc in self.cells]
+        return self._texts
+
+    @property
+    def text(self):
+        return '\n'.join(text for _, text in self.items())
+
+    def items(self):
+        """(column, text) for each distinct cell of the row, left to right."""
+        texts = self.texts
+        for tc in self.unique:
+            column = self.cells.index(tc)
+            yield column, texts[column]
+
+    def cell(self, column):
+        return self.cells[column]
+
+    def get(self, column):
+        return self.texts[column]
+
+    def set(self, column, value):
+        """Rewrite one grid cell, keeping the first run's formatting."""
+        tc = self.cells[column]
+        set_cell_text(tc, value)
+        self._refresh(tc, value)
+
+    def replace(self, replacements):
+        """Run text replacements on this row only. Returns the per-rule hits."""
+        engine = ReplacementEngine(replacements)
+        hits = engine.apply_to_element(self.tr)
+        if any(hits.values()):
+            index = self.table.index
+            index._unregister(self)
+            self._texts = None
+            index._register(self)
+        return hits
+
+    def delete(self):
+        if self.deleted:
+            return
+        self.table.index._unregister(self)
+        self.tr.getparent().remove(self.tr)
+        self.deleted = True
+        self.table.rows.remove(self)
+
+    def _refresh(self, tc, value):
+        index = self.table.index
+        index._unregister(self)
+        texts = self.texts
+        for column, cell in enumerate(self.cells):
+            if cell is tc:
+                texts[column] = value
+        index._register(self)
+
+
+class IndexedTable:
+    def __init__(self, index, position, tbl):
+        self.index = index
+        self.position = position
+        self.tbl = tbl
+        self.rows = []
+        above = []
+        for row_position, tr in enumerate(tbl.iterchildren(W_TR)):
+            cells = self._grid_row(tr, above)
+            self.rows.append(IndexedRow(self, row_position, tr, cells))
+            above = cells
+        self._header = None
+
+    @staticmethod
+    def _grid_row(tr, above):
+        cells = []
+        before = tr.find('%s/%s' % (W_TRPR, W_GRIDBEFORE))
+        if before is not None:
+            cells.extend([None] * int(before.get(W_VAL)))
+        for tc in tr.iterchildren(W_TC):
+            tc_pr = tc.find(W_TCPR)
+            span = 1
+            merged = False
+            if tc_pr is not None:
+                grid_span = tc_pr.find(W_GRIDSPAN)
+                if grid_span is not None:
+                    span = int(grid_span.get(W_VAL))
+                v_merge = tc_pr.find(W_VMERGE)
+                merged = v_merge is not None and v_merge.get(W_VAL, 'continue') == 'continue'
+            column = len(cells)
+            if merged and column < len(above) and above[column] is not None:
+                # Vertically merged: the cell is owned by the one above
+                tc = above[column]
+            cells.extend([tc] * span)
+        return cells
+
+    @property
+    def header(self):
+        """{normalized header text: column} from the first row."""
+        if self._header is None:
+            self._header = {}
+            if self.rows:
+                for column, text in enumerate(self.rows[0].texts):
+                    self._header.setdefault(normalize(text), column)
+        return self._header
+
+    def column(self, name):
+        """Grid column whose header starts with `name` (e.g. "Кол-во")."""
+        name = normalize(name)
+        if name in self.header:
+            return self.header[name]
+        for text, column in self.header.items():
+            if text.startswith(name):
+                return column
+        raise KeyError(f"No column {name!r} in table {self.position}")
+
+
+class TableIndex:
+    def __init__(self, doc):
+        body = doc.element.body if hasattr(doc, 'element') else doc
+        self.tables = [IndexedTable(self, position, tbl) for position, tbl in enumerate(body.iter(W_TBL))]
+        self._keys = {}
+        self._found = {}
+        self._dirty = True
+
+    def rows(self):
+        for table in self.tables:
+            yield from table.rows
+
+    def invalidate(self):
+        """Forget cached texts after the document was edited outside the index."""
+        for row in self.rows():
+            row._texts = None
+        self._dirty = True
+
+    @staticmethod
+    def _row_keys(row):
+        keys = set()
+        for text in row.texts:
+            lines = text.strip().splitlines()
+            if lines:
+                keys.add(normalize(lines[0]))
+                keys.add(normalize(text))
+        return keys
+
+    def _register(self, row):
+        if self._dirty:
+            return
+        for key in self._row_keys(row):
+            self._keys.setdefault(key, []).append(row)
+        self._found = {}
+
+    def _unregister(self, row):
+        if self._dirty:
+            return
+        for key in self._row_keys(row):
+            entries = self._keys.get(key)
+            if entries and row in entries:
+                entries.remove(row)
+        self._found = {}
+
+    def _rebuild(self):
+        self._keys = {}
+        self._found = {}
+        self._dirty = False
+        for row in self.rows():
+            self._register(row)
+
+    def lookup(self, key):
+        """Rows that have a cell whose first line (or whole text) is `key`."""
+        if self._dirty:
+            self._rebuild()
+        return list(self._keys.get(normalize(key), ()))
+
+    def find(self, *texts):
+        """Rows whose text contains all of `texts`; repeated queries are answered from cache."""
+        if self._dirty:
+            self._rebuild()
+        if texts not in self._found:
+            self._found[texts] = [row for row in self.rows() if all(t in row.text for t in texts)]
+        return list(self._found[texts])
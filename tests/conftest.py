@@ -0,0 +1,46 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PUBLIC = os.path.join(ROOT, 'client', 'public')
+sys.path.insert(0, ROOT)
+
+SERIES = 'Проектноепредложение3'
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """Keep the section, font and index caches of each test out of ~/.cache."""
+    path = tmp_path_factory.mktemp('cache')
+    monkeypatch.setenv('PROPOSAL_CACHE_DIR', str(path))
+    return path
+
+
+def add_table(doc, rows):
+    """Append a table holding `rows` (lists of cell texts) to a python-docx Document."""
+    table = doc.add_table(rows=len(rows), cols=len(rows[0]))
+    for row, texts in zip(table.rows, rows):
+        for cell, text in zip(row.cells, texts):
+            cell.text = text
+    return table
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """A directory with a few revisions of one series, as in client/public."""
+    directory = tmp_path / 'public'
+    directory.mkdir()
+    for number in (2, 3, 10, 11):
+        name = f'{SERIES}_v{number}.docx'
+        shutil.copyfile(os.path.join(PUBLIC, name), directory / name)
+    return directory
+
+
+def digests(directory):
+    """{file name: SHA-256} of the files in a directory."""
+    from version_store import file_digest
+    return {name: file_digest(os.path.join(directory, name))[0] for name in os.listdir(directory)
+            if os.path.isfile(os.path.join(directory, name))}
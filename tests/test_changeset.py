@@ -0,0 +1,77 @@
+import pytest
+from docx import Document
+
+from changeset import apply_changeset, load_changeset, run_changeset
+from conftest import ROOT, add_table
+from verify import check
+
+HEADER = ['Наименование', 'Кол-во', 'Цена за ед.', 'Сумма']
+
+
+def proposal():
+    doc = Document()
+    doc.add_paragraph('Коммутатор MES5324 в стойке')
+    add_table(doc, [
+        HEADER,
+        ['Сервер YADRO G4208P G3', '2 шт.', '32 151 159', '64 302 318'],
+        ['Коммутатор Eltex MES5324', '1', '499 000', '499 000'],
+        ['1С:Предприятие', '1', '100 000', '100 000'],
+        ['Итого', '', '', '64 901 318'],
+    ])
+    return doc
+
+
+def texts(doc):
+    return [[cell.text for cell in row.cells] for row in doc.tables[0].rows]
+
+
+def test_operations_apply_in_order():
+    doc = apply_changeset(proposal(), [
+        {'remove_row': {'contains': '1С:Предприятие'}},
+        {'replace_text': {'replacements': {'MES5324': 'MES2300-24'}}},
+        {'replace_text': {'row': 'MES2300-24', 'replacements': {'499 000': '139 000'}}},
+        {'set_quantity': {'row': 'YADRO G4208P G3', 'from': 2, 'to': 1}},
+        {'set_cell': {'row': 'YADRO G4208P G3', 'current': '64 302 318', 'value': '32 151 159'}},
+    ])
+    assert doc.paragraphs[0].text == 'Коммутатор MES2300-24 в стойке'
+    assert texts(doc) == [
+        HEADER,
+        ['Сервер YADRO G4208P G3', '1 шт.', '32 151 159', '32 151 159'],
+        ['Коммутатор Eltex MES2300-24', '1', '139 000', '139 000'],
+        ['Итого', '', '', '64 901 318'],
+    ]
+
+
+def test_reprice_updates_line_and_total():
+    doc = apply_changeset(proposal(), [
+        {'remove_row': {'contains': ['1С', 'Предприятие']}},
+        {'reprice': {'row': 'Eltex MES5324', 'to': 3}},
+    ])
+    assert texts(doc)[2] == ['Коммутатор Eltex MES5324', '3', '499 000', '1 497 000']
+    assert texts(doc)[3][3] == '65 799 318'
+
+
+def test_append_section():
+    doc = apply_changeset(proposal(), [{'append_section': {
+        'title': 'МОДУЛЬ ИНТЕГРАЦИИ', 'intro': 'Введение',
+        'subsections': [{'title': '1. Протоколы', 'bullets': [['REST API', 'OData']]}],
+    }}])
+    assert [p.text for p in doc.paragraphs[-4:]] == [
+        'МОДУЛЬ ИНТЕГРАЦИИ', 'Введение', '1. Протоколы', '• REST API: OData']
+
+
+@pytest.mark.parametrize('operations', [
+    [{'rename_row': {'row': 'x'}}],
+    [{'remove_row': {'contains': 'x'}, 'set_cell': {'row': 'x', 'value': 'y'}}],
+])
+def test_rejects_bad_operations(operations):
+    with pytest.raises(ValueError):
+        apply_changeset(proposal(), operations)
+
+
+def test_v3_to_v11(tmp_path):
+    changeset = load_changeset(f'{ROOT}/changesets/v3_to_v11.yaml')
+    output = str(tmp_path / 'v11.docx')
+    run_changeset(changeset, source=f"{ROOT}/{changeset['source']}", output=output)
+    assert check(output, contains=['МОДУЛЬ ИНТЕГРАЦИИ С 1С:ПРЕДПРИЯТИЕ', 'MES2300-24', 'YADRO G4208P G3'],
+                 absent=['MES2324', 'Гравитон С2122ИУ'], totals=True) == []
@@ -0,0 +1,51 @@
+import pytest
+from docx import Document
+from lxml import etree
+
+from docx_replace import W_NS, W_T, ReplacementEngine, element_text
+
+
+def paragraph(*runs):
+    """A <w:p> with one run per text; each run is bold so formatting can be checked."""
+    xml = ''.join('<w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">%s</w:t></w:r>' % text for text in runs)
+    return etree.fromstring('<w:p xmlns:w="%s">%s</w:p>' % (W_NS, xml))
+
+
+def test_match_across_runs():
+    p = paragraph('Коммутатор MES', '53', '24 (24 порта)')
+    assert ReplacementEngine({'MES5324': 'MES2300-24'}).apply_to_paragraph(p) == 1
+    assert element_text(p) == 'Коммутатор MES2300-24 (24 порта)'
+    # The replacement goes into the run where the match starts, the rest is trimmed
+    assert [t.text for t in p.iter(W_T)] == ['Коммутатор MES2300-24', '', ' (24 порта)']
+    assert len(p.findall('{%s}r/{%s}rPr' % (W_NS, W_NS))) == 3
+
+
+def test_leftmost_longest():
+    engine = ReplacementEngine([('ab', '1'), ('abc', '2'), ('bc', '3'), ('cd', '4')])
+    assert engine.replace('abcd') == ('2d', [(0, 3, 1)])
+    assert engine.replace('xbcd') == ('x3d', [(1, 3, 2)])
+    # The leftmost match wins even when a longer one starts later
+    assert ReplacementEngine({'xa': '1', 'abc': '2'}).replace('xabc')[0] == '1bc'
+
+
+def test_replacements_do_not_cascade():
+    engine = ReplacementEngine({'A': 'B', 'B': 'C'})
+    assert engine.replace('AB')[0] == 'BC'
+
+
+def test_hit_report_per_rule():
+    doc = Document()
+    doc.add_paragraph('MES5324 и MES5324')
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = 'YADRO G4208P'
+    table.cell(0, 1).text = 'MES5324'
+    engine = ReplacementEngine({'MES5324': 'MES2300-24', 'YADRO': 'Гравитон', 'Raidix': ''})
+    assert engine.apply(doc) == {'MES5324': 3, 'YADRO': 1, 'Raidix': 0}
+    assert doc.paragraphs[0].text == 'MES2300-24 и MES2300-24'
+    assert table.cell(0, 0).text == 'Гравитон G4208P'
+
+
+@pytest.mark.parametrize('replacements', [[('', 'x')], [('a', 'x'), ('a', 'y')]])
+def test_rejects_empty_and_duplicate_patterns(replacements):
+    with pytest.raises(ValueError):
+        ReplacementEngine(replacements)
@@ -0,0 +1,94 @@
+import io
+import struct
+import zipfile
+import zlib
+
+import pytest
+from docx import Document
+from docx.shared import Inches
+
+import docx_save
+from conftest import PUBLIC, SERIES
+from docx_save import open_document, save_document
+
+
+def png(width=64, height=64):
+    """An RGB gradient PNG."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    rows = b''.join(b'\0' + b''.join(bytes((y * 4 % 256, x * 4 % 256, 128)) for x in range(width))
+                    for y in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>2I5B', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+@pytest.fixture
+def source(tmp_path):
+    doc = Document()
+    doc.add_paragraph('Схема стойки')
+    doc.add_picture(io.BytesIO(png()), width=Inches(1))
+    path = str(tmp_path / 'source.docx')
+    doc.save(path)
+    return path
+
+
+def raw_members(path):
+    """{name: (compressed bytes, CRC)} straight from the zip."""
+    members = {}
+    with open(path, 'rb') as f, zipfile.ZipFile(path) as package:
+        data = f.read()
+        for info in package.infolist():
+            members[info.filename] = (bytes(docx_save._raw_data(data, info)), info.CRC)
+    return members
+
+
+def test_unchanged_document_is_copied(source, tmp_path):
+    output = str(tmp_path / 'copy.docx')
+    report = save_document(open_document(source), output)
+    assert report['deflated'] == 0 and report['copied'] == len(zipfile.ZipFile(source).infolist())
+    assert raw_members(output) == raw_members(source)
+    assert zipfile.ZipFile(output).testzip() is None
+
+
+def test_only_edited_parts_are_deflated(source, tmp_path):
+    doc = open_document(source)
+    doc.paragraphs[0].text = 'Схема стойки, вариант 2'
+    output = str(tmp_path / 'edited.docx')
+    report = save_document(doc, output, level=9)
+    assert report['deflated'] == 1
+    before, after = raw_members(source), raw_members(output)
+    changed = {name for name in before if before[name] != after[name]}
+    assert changed == {'word/document.xml'}
+    assert Document(output).paragraphs[0].text == 'Схема стойки, вариант 2'
+
+
+def test_replaced_binary_part_is_deflated(source, tmp_path):
+    doc = open_document(source)
+    image, = [part for part in doc.part.package.parts if part.partname.endswith('.png')]
+    image._blob = png(32, 32)
+    output = io.BytesIO()
+    report = save_document(doc, output)
+    assert report['deflated'] == 1
+    assert zipfile.ZipFile(output).read(image.partname.membername) == png(32, 32)
+
+
+def test_document_without_source_is_deflated(tmp_path):
+    doc = Document(f'{PUBLIC}/{SERIES}_v11.docx')
+    output = str(tmp_path / 'plain.docx')
+    report = save_document(doc, output, threads=4)
+    assert report['copied'] == 0
+    assert Document(output).paragraphs[0].text == doc.paragraphs[0].text
+
+
+def test_failed_save_leaves_no_partial_file(source, tmp_path, monkeypatch):
+    doc = open_document(source)
+    doc.paragraphs[0].text = 'изменено'
+
+    def fail(*args):
+        raise OSError('disk full')
+    monkeypatch.setattr(docx_save._ZipWriter, 'close', fail)
+    output = tmp_path / 'out'
+    output.mkdir()
+    with pytest.raises(OSError):
+        save_document(doc, str(output / 'failed.docx'))
+    assert list(output.iterdir()) == []
@@ -0,0 +1,76 @@
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Inches
+from lxml import etree
+
+import docx_table_builder
+from docx_table_builder import Cell, TableBuilder, TableSpec, build_table
+
+HEADER = ['№', 'Наименование', 'Кол-во', 'Цена (₽)']
+SPEC = TableSpec(widths=(Inches(0.5), Inches(3.0), Inches(0.8), Inches(1.5)))
+
+
+def rows(count):
+    for i in range(1, count + 1):
+        yield [str(i), f'Позиция {i}', '1', f'{i} 000']
+
+
+def canonical(element):
+    return etree.tostring(element, method='c14n')
+
+
+def test_rows_match_python_docx():
+    values = [['1', 'Сервер\nYADRO\tG4208P', '2', ' 100 '], ['2', '', '1', '< & >']]
+    doc = Document()
+    table = doc.add_table(rows=1, cols=4)
+    for row in values:
+        cells = table.add_row().cells
+        for cell, text in zip(cells, row):
+            cell.text = text
+    for column, width in zip(table.columns, SPEC.widths):
+        for cell in column.cells:
+            cell.width = width
+
+    built = build_table(Document(), HEADER, values, SPEC).table
+    assert [canonical(row._tr) for row in built.rows[1:]] == [canonical(row._tr) for row in table.rows[1:]]
+    assert [cell.text for cell in built.rows[0].cells] == HEADER
+    assert built.style.name == 'Table Grid'
+
+
+def test_rows_are_parsed_a_chunk_at_a_time(monkeypatch):
+    monkeypatch.setattr(docx_table_builder, 'CHUNK_ROWS', 3)
+    builder = TableBuilder(Document(), HEADER, SPEC)
+    parsed = lambda: len(builder._tbl.findall(qn('w:tr')))
+    source = rows(7)
+    for expected in (1, 1, 4, 4, 4, 7, 7):
+        builder.add_row(next(source))
+        assert parsed() == expected
+    assert builder.count == 7
+    # Reading the table flushes the rest
+    assert len(builder.table.rows) == 8 and parsed() == 8
+
+
+def test_lazy_rows_keep_their_order(monkeypatch):
+    monkeypatch.setattr(docx_table_builder, 'CHUNK_ROWS', 100)
+    doc = Document()
+    doc.add_paragraph('Спецификация')
+    builder = build_table(doc, HEADER, rows(1001), SPEC)
+    table = builder.table
+    assert builder.count == 1001
+    assert [row.cells[0].text for row in table.rows] == ['№'] + [str(i) for i in range(1, 1002)]
+    # Tables go before the section properties, which end the body
+    assert doc.element.body[-1].tag == qn('w:sectPr')
+    assert doc.element.body[-2] is table._tbl
+
+
+def test_spanning_cells():
+    builder = build_table(Document(), HEADER, rows(2), SPEC)
+    builder.add_row([Cell('ИТОГО:', span=3, bold=True, align='right'), Cell('3 000', bold=True)])
+    total = builder.table.rows[-1]
+    tcs = total._tr.findall(qn('w:tc'))
+    assert len(tcs) == 2
+    assert tcs[0].grid_span == 3
+    assert total.cells[0].width == sum(SPEC.widths[:3])
+    assert total.cells[0].paragraphs[0].alignment == 2  # WD_ALIGN_PARAGRAPH.RIGHT
+    assert total.cells[0].paragraphs[0].runs[0].bold
+    assert [cell.text for cell in total.cells] == ['ИТОГО:', 'ИТОГО:', 'ИТОГО:', '3 000']
@@ -0,0 +1,86 @@
+import json
+import os
+import zipfile
+
+import pytest
+
+from conftest import SERIES, digests
+from object_store import RAW, ZLIB, ObjectError, ObjectStore
+from version_store import MANIFEST, VersionError, VersionStore, file_digest
+
+
+def test_pack_and_checkout_are_byte_identical(archive, tmp_path):
+    originals = digests(archive)
+    store = VersionStore(str(archive))
+    assert store.pack(keep=0) > 0
+    assert not any(name.endswith('.docx') for name in os.listdir(archive))
+    logical, stored = store.disk_usage()
+    assert stored < logical
+
+    store = VersionStore(str(archive))
+    for version in store.versions(SERIES):
+        assert version.packed
+        target = str(tmp_path / os.path.basename(version.path))
+        assert store.checkout(version, target) == target
+        assert file_digest(target)[0] == originals[os.path.basename(version.path)] == version.sha256
+        # Checking out in place restores the revision file itself
+        assert file_digest(store.checkout(version))[0] == version.sha256
+
+
+def test_assemble_checks_the_hash(archive, tmp_path):
+    store = ObjectStore(str(tmp_path / 'objects'))
+    path = str(archive / f'{SERIES}_v11.docx')
+    members = store.put_package(path)
+    target = str(tmp_path / 'rebuilt.docx')
+    assert store.assemble(members, target, file_digest(path)[0]) == target
+    with open(path, 'rb') as a, open(target, 'rb') as b:
+        assert a.read() == b.read()
+
+    os.remove(target)
+    with pytest.raises(ObjectError):
+        store.assemble(members, target, '0' * 64)
+    assert sorted(os.listdir(tmp_path)) == ['objects', 'public']
+
+
+def test_only_uncompressed_members_are_compressed(tmp_path):
+    path = str(tmp_path / 'mixed.zip')
+    with zipfile.ZipFile(path, 'w') as package:
+        package.writestr('stored.xml', '<a/>' * 1000, zipfile.ZIP_STORED)
+        package.writestr('deflated.xml', '<b/>' * 1000, zipfile.ZIP_DEFLATED)
+    store = ObjectStore(str(tmp_path / 'objects'))
+    members = store.put_package(path)
+    kinds = {}
+    for name, digest, _ in members:
+        with open(store.path(digest), 'rb') as f:
+            kinds[name] = f.read(1)
+    assert kinds == {'stored.xml': ZLIB, 'deflated.xml': RAW, None: ZLIB}
+    target = str(tmp_path / 'copy.zip')
+    store.assemble(members, target, file_digest(path)[0])
+    assert zipfile.ZipFile(target).read('deflated.xml') == b'<b/>' * 1000
+
+
+def test_corrupt_object_is_detected(tmp_path):
+    store = ObjectStore(str(tmp_path))
+    digest = store.put(b'styles', compress=False)
+    assert store.get(digest) == b'styles'
+    with open(store.path(digest), 'wb') as f:
+        f.write(RAW + b'STYLES')
+    with pytest.raises(ObjectError):
+        store.get(digest)
+
+
+def test_unsplittable_files_are_kept_whole(tmp_path):
+    path = tmp_path / 'broken.docx'
+    path.write_bytes(b'not a zip')
+    assert ObjectStore(str(tmp_path / 'objects')).put_package(str(path)) is None
+
+
+def test_older_manifest_is_rejected(archive):
+    VersionStore(str(archive)).scan()
+    with open(archive / MANIFEST, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['format'] = 1
+    with open(archive / MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    with pytest.raises(VersionError, match='has format 1'):
+        VersionStore(str(archive), read_only=True).latest(SERIES)
@@ -0,0 +1,42 @@
+import io
+import os
+import re
+from decimal import Decimal
+
+import pytest
+
+from generate_proposal_v15 import PDF, add_fonts, create_proposal
+
+
+def without_dates(data):
+    # fpdf stamps the creation time to the second
+    return re.sub(rb'D:\d{14}', b'D:', data)
+
+
+def test_stream_matches_output(tmp_path):
+    appendix = [('Кабель UTP', 40, 120), ('Монтаж', 2, Decimal('15000.50'))]
+    options = dict(variants=('basic', 'optimal', 'budget'), quantities={'alt-linux': 3}, appendix=None)
+    buffered = create_proposal(io.BytesIO(), **options).getvalue()
+    streamed = tmp_path / 'streamed.pdf'
+    create_proposal(str(streamed), stream=True, **options)
+    assert without_dates(streamed.read_bytes()) == without_dates(buffered)
+    assert os.listdir(tmp_path) == ['streamed.pdf']
+
+    options['appendix'] = appendix
+    buffered = create_proposal(io.BytesIO(), **options).getvalue()
+    streamed = create_proposal(io.BytesIO(), stream=True, **dict(options, appendix=iter(appendix))).getvalue()
+    assert without_dates(streamed) == without_dates(buffered)
+
+
+def test_failed_render_removes_partial_file(tmp_path):
+    with pytest.raises(ValueError):
+        create_proposal(str(tmp_path / 'out.pdf'), variants=('basic', 'unknown'), stream=True)
+    assert os.listdir(tmp_path) == []
+
+
+def test_stream_must_start_before_first_page(tmp_path):
+    pdf = PDF()
+    add_fonts(pdf)
+    pdf.add_page()
+    with pytest.raises(Exception, match='before the first page'):
+        pdf.stream_to(str(tmp_path / 'late.pdf'))
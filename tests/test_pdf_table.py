@@ -0,0 +1,61 @@
+from generate_proposal_v15 import PDF, add_fonts
+from pdf_table import Table, wrap
+from verify import pdf_pages
+
+HEADER = ['Наименование', 'Кол-во', 'Цена за ед.', 'Сумма']
+WIDTHS = [90, 20, 40, 40]
+
+
+def render(path, rows):
+    pdf = PDF()
+    add_fonts(pdf)
+    pdf.add_page()
+    table = Table(pdf, HEADER, WIDTHS).add_rows(rows)
+    pdf.output(str(path), 'F')
+    return table, [[[text for _, text in cells] for cells in lines] for lines in pdf_pages(str(path))]
+
+
+def table_lines(lines):
+    """The lines of a page from its table header on."""
+    start = next(i for i, cells in enumerate(lines) if cells == HEADER)
+    return lines[start:]
+
+
+def test_rows_break_pages_and_repeat_the_header(tmp_path):
+    rows = [[f'Позиция {i}', str(i), '1 000 ₽', f'{i} 000 ₽'] for i in range(1, 81)]
+    table, pages = render(tmp_path / 'table.pdf', rows)
+    assert table.count == 80
+    assert len(pages) > 2
+    drawn = []
+    for lines in pages:
+        header, *body = table_lines(lines)
+        assert header == HEADER
+        drawn += [cells for cells in body if cells[0].startswith('Позиция')]
+    # Every row once, in order, on exactly one page
+    assert drawn == rows
+
+
+def test_long_cells_wrap_within_their_row(tmp_path):
+    name = 'Сервер YADRO G4208P G3 с двумя процессорами и резервированным блоком питания для стойки'
+    _, pages = render(tmp_path / 'wrapped.pdf', [[name, '1', '1 000 ₽', '1 000 ₽']])
+    header, first, *rest = table_lines(pages[0])
+    # The cells of a row share the first baseline; the rest of the name follows below
+    assert first[1:] == ['1', '1 000 ₽', '1 000 ₽']
+    assert len(first[0]) < len(name)
+    assert ' '.join([first[0]] + [cells[0] for cells in rest if len(cells) == 1]).startswith(name)
+
+
+def test_empty_table_draws_its_header(tmp_path):
+    table, pages = render(tmp_path / 'empty.pdf', [])
+    assert table.count == 0
+    assert table_lines(pages[0])[0] == HEADER
+
+
+def test_wrap_breaks_words_wider_than_the_column():
+    pdf = PDF()
+    add_fonts(pdf)
+    pdf.set_font('DejaVu', '', 10)
+    lines = wrap(pdf.current_font, 'a ' + 'W' * 40, 5000)
+    assert lines[0][0] == 'a'
+    assert ''.join(line for line, _ in lines[1:]) == 'W' * 40
+    assert all(width <= 5000 for _, width in lines)
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+import pytest
+from docx import Document
+
+from conftest import add_table
+from pricing import (PriceTable, format_like, format_rub, parse_amount, portfolio_totals, refresh_table_total,
+                     reprice_row, to_kopecks)
+from table_index import TableIndex
+
+
+def test_amounts():
+    assert parse_amount('~26 750 000 ₽') == ('~', 2675000000, ' ₽')
+    assert parse_amount('1\xa0250\xa0000,5') == ('', 125000050, '')
+    assert to_kopecks('32 151 159 ₽') == 3215115900
+    assert to_kopecks(Decimal('0.1') * 3) == 30
+    assert format_rub(125000050) == '1 250 000,50 ₽'
+    assert format_like('~1\xa0000 руб.', 200000) == '~2\xa0000 руб.'
+    with pytest.raises(ValueError):
+        parse_amount('по запросу')
+
+
+def test_totals_are_recomputed():
+    prices = PriceTable([
+        ('Сервер', 2, 1000, 'hardware'),
+        ('Коммутатор', 1, '499 000,50', 'hardware'),
+        ('Внедрение', 3, 33.33, 'services'),
+    ])
+    totals = prices.totals()
+    assert totals['lines'].tolist() == [200000, 49900050, 9999]
+    assert totals['subtotals'] == {'hardware': 50100050, 'services': 9999}
+    assert totals['net'] == 50110049
+    # VAT is rounded half up to the kopeck
+    assert totals['vat'] == 10022010
+    assert totals['gross'] == totals['net'] + totals['vat']
+
+    prices.set_qty(0, '1')
+    prices.set_unit_price(2, 100)
+    assert prices.rows()[0] == ['Сервер', '1', '1 000 ₽', '1 000 ₽']
+    assert prices.totals()['net'] == 100000 + 49900050 + 30000
+
+
+def test_fractional_quantity_is_rejected():
+    prices = PriceTable()
+    assert prices.add('Кабель', '2,000', 10) == 0
+    with pytest.raises(ValueError):
+        prices.add('Кабель', Decimal('1.5'), 10)
+    with pytest.raises(ValueError):
+        prices.set_qty(0, '1,5')
+    assert prices.qty.tolist() == [2]
+
+
+def test_portfolio_totals():
+    a = PriceTable([('Сервер', 2, 1000)])
+    b = PriceTable([('Лицензия', 1, 99.99), ('Монтаж', 1, 0.01)])
+    assert portfolio_totals([a, b]) == [
+        {'net': 200000, 'vat': 40000, 'gross': 240000},
+        {'net': 10000, 'vat': 2000, 'gross': 12000},
+    ]
+    assert portfolio_totals([]) == []
+
+
+def priced_table(*rows):
+    doc = Document()
+    add_table(doc, [['Наименование', 'Кол-во', 'Цена за ед.', 'Сумма'], *rows])
+    return TableIndex(doc).tables[0]
+
+
+def test_reprice_row_from_unit_price_column():
+    table = priced_table(['Сервер', '2 шт.', '1 000,50', '2 001 ₽'], ['Итого', '', '', '2 001 ₽'])
+    row = table.rows[1]
+    assert reprice_row(row, 1, 3, 3) == 100050
+    assert row.texts == ['Сервер', '3 шт.', '1 000,50', '3 001,50 ₽']
+    assert refresh_table_total(table, 3) == 300150
+    assert table.rows[2].get(3) == '3 001,50 ₽'
+
+
+def test_reprice_row_without_unit_price():
+    doc = Document()
+    add_table(doc, [['Наименование', 'Кол-во', 'Сумма'], ['Сервер', '0', '0'], ['Лицензия', '4', '400']])
+    table = TableIndex(doc).tables[0]
+    with pytest.raises(ValueError, match='row 1'):
+        reprice_row(table.rows[1], 1, 2, 1)
+    reprice_row(table.rows[1], 1, 2, 1, unit_price=50)
+    # Without a unit price the old line total over the old quantity is used
+    reprice_row(table.rows[2], 1, 2, 1)
+    assert [row.get(2) for row in table.rows[1:]] == ['50', '100']
+
+
+def test_refresh_subtotals_and_grand_total():
+    table = priced_table(
+        ['Сервер', '1', '100', '100'],
+        ['Итого оборудование', '', '', '0'],
+        ['Монтаж', '1', '50', '50'],
+        ['Итого работы', '', '', '0'],
+        ['Итого', '', '', '0'],
+    )
+    assert refresh_table_total(table, 3) == 15000
+    assert [row.get(3) for row in table.rows if row.get(0).startswith('Итого')] == ['100', '50', '150']
+    with pytest.raises(ValueError):
+        refresh_table_total(priced_table(['Сервер', '1', '100', '100']), 3)
@@ -0,0 +1,76 @@
+from docx import Document
+
+from conftest import add_table
+from proposal_diff import build_model, diff_models, is_empty, is_repriced, summary
+
+HEADER = ['Наименование', 'Кол-во', 'Цена за ед.', 'Сумма']
+ITEMS = [
+    ['Сервер YADRO G4208P G3', '2', '32 151 159', '64 302 318'],
+    ['Коммутатор Eltex MES5324', '1', '499 000', '499 000'],
+]
+
+
+def proposal(path, paragraph, items, extra_section=False):
+    doc = Document()
+    doc.add_heading('2. Техническая реализация', 1)
+    doc.add_heading('Аппаратное обеспечение', 2)
+    doc.add_paragraph(paragraph)
+    add_table(doc, [HEADER] + items)
+    if extra_section:
+        doc.add_heading('3. Сроки', 1)
+        doc.add_paragraph('Поставка за 6 недель')
+    doc.save(path)
+    return build_model(str(path))
+
+
+def test_model_recognizes_sections_and_columns(tmp_path):
+    model = proposal(tmp_path / 'a.docx', 'Серверы в стойке заказчика', ITEMS)
+    section = '2. Техническая реализация › Аппаратное обеспечение'
+    assert [section, ['Серверы в стойке заказчика']] in model['sections']
+    assert model['items'][0] == {
+        'key': [section, 'Сервер YADRO G4208P G3', 1],
+        'name': 'Сервер YADRO G4208P G3',
+        'values': {'qty': '2', 'price': '32 151 159', 'total': '64 302 318'},
+    }
+
+
+def test_diff_reports_sections_paragraphs_and_items(tmp_path):
+    old = proposal(tmp_path / 'old.docx', 'Серверы в стойке заказчика', ITEMS)
+    new = proposal(tmp_path / 'new.docx', 'Серверы в ЦОД заказчика', [
+        ['Сервер YADRO G4208P G3', '1', '32 151 159', '32 151 159'],
+        ['Коммутатор Eltex MES2300-24', '1', '139 000', '139 000'],
+    ], extra_section=True)
+    diff = diff_models(old, new, 'v1', 'v2')
+    section = '2. Техническая реализация › Аппаратное обеспечение'
+    assert (diff.old, diff.new) == ('v1', 'v2')
+    assert diff.sections_added == ['3. Сроки']
+    assert diff.sections_removed == []
+    assert diff.paragraphs == {section: (['Серверы в стойке заказчика'], ['Серверы в ЦОД заказчика'])}
+    assert [item['name'] for item in diff.items_added] == ['Коммутатор Eltex MES2300-24']
+    assert [item['name'] for item in diff.items_removed] == ['Коммутатор Eltex MES5324']
+    [(before, after, fields)] = diff.items_changed
+    assert before['name'] == after['name'] == 'Сервер YADRO G4208P G3'
+    assert fields == {'qty': ('2', '1'), 'total': ('64 302 318', '32 151 159')}
+    assert is_repriced(fields)
+    assert not is_repriced({'qty': ('2', '1')})
+    assert summary(diff) == {
+        'sections_added': 1, 'sections_removed': 0, 'sections_edited': 1,
+        'items_added': 1, 'items_removed': 1, 'items_changed': 1, 'items_repriced': 1,
+    }
+
+
+def test_identical_revisions_have_an_empty_diff(tmp_path):
+    old = proposal(tmp_path / 'old.docx', 'Серверы в стойке заказчика', ITEMS)
+    new = proposal(tmp_path / 'new.docx', 'Серверы в стойке заказчика', ITEMS)
+    assert is_empty(diff_models(old, new))
+
+
+def test_repeated_names_are_matched_by_occurrence(tmp_path):
+    line = ['Кабель UTP, м', '10', '33', '330']
+    old = proposal(tmp_path / 'old.docx', 'Кабели', [line, line])
+    new = proposal(tmp_path / 'new.docx', 'Кабели', [line, ['Кабель UTP, м', '20', '33', '660']])
+    diff = diff_models(old, new)
+    assert not diff.items_added and not diff.items_removed
+    [(before, _, fields)] = diff.items_changed
+    assert before['key'][2] == 2
+    assert fields == {'qty': ('10', '20'), 'total': ('330', '660')}
@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import render_service
+
+
+@pytest.fixture
+def server():
+    server = render_service.make_server(port=0)
+    server.pool = render_service.start_pool(1)
+    server.pool_lock = threading.Lock()
+    server.jobs = 1
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.pool.shutdown()
+
+
+def post(server, spec):
+    url = 'http://127.0.0.1:%d/render' % server.server_address[1]
+    request = urllib.request.Request(url, json.dumps(spec).encode('utf-8'), method='POST')
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_render_and_errors(server):
+    status, data = post(server, {'customer': 'ООО Ромашка', 'variants': ['basic']})
+    assert status == 200 and data.startswith(b'%PDF-')
+    assert post(server, {'generator': 'v99'})[0] == 400
+    assert post(server, {'variants': ['unknown']})[0] == 422
+
+
+def test_broken_pool_is_restarted(server):
+    broken = server.pool
+    # A worker that dies takes the whole pool down with it
+    broken.submit(os._exit, 1)
+    status, body = post(server, {'variants': ['basic']})
+    assert status == 503 and 'restarted' in body['error']
+    assert server.pool is not broken
+    assert post(server, {'variants': ['basic']})[0] == 200
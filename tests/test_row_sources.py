@@ -0,0 +1,118 @@
+import sqlite3
+from decimal import Decimal
+
+import pytest
+from docx import Document
+
+from conftest import add_table
+from generate_proposal_v13 import generate_proposal
+from generate_proposal_v15 import create_proposal
+from pricing import RunningTotals, format_qty, format_rub, to_qty
+from row_sources import csv_items, open_items
+from verify import check, extract
+
+ITEMS = [
+    ('Сервер YADRO G4208P', 2, Decimal('1250000.50')),
+    ('Коммутатор MES2300-24', 3, 98000),
+    ('Кабель UTP, м', Decimal('1.5'), Decimal('33.33')),
+]
+
+
+def test_quantities():
+    assert [to_qty(value) for value in (2, '2', '2,000', 2.0, '1 000')] == [2, 2, 2, 2, 1000]
+    assert to_qty('1,5') == Decimal('1.5')
+    assert [format_qty(qty) for qty in (2, Decimal('1.5'), to_qty('0,250'))] == ['2', '1,5', '0,25']
+    with pytest.raises(ValueError, match='No quantity'):
+        to_qty('шт.')
+
+
+def test_running_totals_round_fractional_lines():
+    totals = RunningTotals()
+    rows = totals.rows(item + ('hardware',) for item in ITEMS)
+    assert totals.count == 0
+    assert next(rows) == ['Сервер YADRO G4208P', '2', '1 250 000,50 ₽', '2 500 001 ₽']
+    assert list(rows) == [
+        ['Коммутатор MES2300-24', '3', '98 000 ₽', '294 000 ₽'],
+        # 1.5 x 33.33 = 49.995, rounded half up
+        ['Кабель UTP, м', '1,5', '33,33 ₽', '50 ₽'],
+    ]
+    assert totals.count == 3
+    assert totals.totals() == {'subtotals': {'hardware': 279405100}, 'net': 279405100,
+                               'vat': 55881020, 'gross': 335286120}
+
+
+def test_csv_items_read_1c_exports(tmp_path):
+    path = tmp_path / 'price_1c.csv'
+    path.write_bytes('\n'.join([
+        'Номенклатура;Количество;Цена;Вид номенклатуры',
+        'Сервер YADRO G4208P;2,000;1 250 000,50;Оборудование',
+        ';;;',
+        'Кабель UTP, м;1,500;33,33',
+        'Итого:;;1 250 033,83;',
+        'Всего наименований 2',
+    ]).encode('cp1251'))
+    assert list(csv_items(str(path))) == [
+        ('Сервер YADRO G4208P', 2, Decimal('1250000.5'), 'Оборудование'),
+        ('Кабель UTP, м', Decimal('1.5'), Decimal('33.33'), ''),
+    ]
+
+
+def test_csv_errors_name_the_line(tmp_path):
+    path = tmp_path / 'price.csv'
+    path.write_text('name,qty,price\nСервер,2,100\nКоммутатор,много,200\n', encoding='utf-8')
+    items = csv_items(str(path))
+    assert next(items)[0] == 'Сервер'
+    with pytest.raises(ValueError, match=f'^{path}:3: No quantity'):
+        next(items)
+    path.write_text('name;price\nСервер;100\n', encoding='utf-8')
+    with pytest.raises(ValueError, match='No qty column'):
+        list(csv_items(str(path)))
+
+
+def test_sqlite_items_need_a_query(tmp_path):
+    path = str(tmp_path / 'spec.db')
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE lines (name TEXT, qty INTEGER, price REAL)')
+        connection.executemany('INSERT INTO lines VALUES (?, ?, ?)', [(name, 2, 10.5) for name in 'abc'])
+    connection.close()
+    assert list(open_items(path, 'SELECT name, qty, price FROM lines ORDER BY name')) == [
+        ('a', 2, 10.5), ('b', 2, 10.5), ('c', 2, 10.5)]
+    with pytest.raises(ValueError, match='needs a query'):
+        open_items(path)
+
+
+def test_v13_total_counts_quantities(tmp_path):
+    path = str(tmp_path / 'v13.docx')
+    generate_proposal(path, items=iter(ITEMS))
+    rows = [[text for _, text in cells] for _, cells in extract(path).rows]
+    assert ['№', 'Наименование', 'Кол-во', 'Цена (₽)'] in rows
+    assert ['1', 'Сервер YADRO G4208P', '2', '1 250 000,50'] in rows
+    assert ['ИТОГО:', '2 794 051'] in rows
+    assert check(path, totals=True) == []
+
+
+def test_v15_appendix_totals(tmp_path):
+    path = str(tmp_path / 'v15.pdf')
+    create_proposal(path, quantities={'alt-linux': 3, 'eltex-mes2300-24': 2},
+                    appendix=iter(ITEMS), stream=True)
+    rows = [[text for _, text in cells] for _, cells in extract(path).rows]
+    assert sum(row[0] == 'ИТОГО:' for row in rows) == 3
+    assert ['ИТОГО:', format_rub(279405100)] in rows
+    assert check(path, totals=True) == []
+
+
+def test_totals_of_unit_price_tables(tmp_path):
+    rows = [
+        ['Наименование', 'Кол-во', 'Цена (₽)'],
+        ['Сервер', '2 шт.', '1 000 000'],
+        ['Кабель UTP, м', '1,5', '33,33'],
+        ['Итого', '', '2 000 050'],
+    ]
+    doc = Document()
+    add_table(doc, rows)
+    # The same prices counted once each are not the total
+    add_table(doc, rows[:3] + [['Итого', '', '1 000 033,33']])
+    path = str(tmp_path / 'unit.docx')
+    doc.save(path)
+    assert check(path, totals=True) == [
+        "total 'Итого': 1 000 033,33 but the rows above sum to 2 000 050"]
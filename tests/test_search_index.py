@@ -0,0 +1,71 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import SERIES
+from search_index import SearchIndex
+from version_store import VersionStore
+
+
+@pytest.fixture
+def index(tmp_path):
+    with SearchIndex(str(tmp_path / 'index.sqlite')) as index:
+        yield index
+
+
+def series_hits(index, query, **options):
+    """Sorted (series, version) of the revisions with hits."""
+    return sorted({(hit['series'], hit['version']) for hit in index.search(query, **options)})
+
+
+def test_incremental_update(archive, index):
+    report = index.update([str(archive)], jobs=1)
+    assert (report['files'], report['hashed'], report['extracted'], report['errors']) == (4, 4, 4, 0)
+    assert series_hits(index, 'MES2300', first=True) == [(SERIES, 10)]
+    assert series_hits(index, 'MES2300', latest=True) == [(SERIES, 11)]
+
+    # Nothing changed: nothing is hashed or extracted again
+    report = index.update([str(archive)], jobs=1)
+    assert (report['hashed'], report['extracted'], report['removed']) == (0, 0, 0)
+
+    # A copy is hashed but its content is known already
+    shutil.copyfile(archive / f'{SERIES}_v11.docx', archive / f'{SERIES}_v12.docx')
+    report = index.update([str(archive)], jobs=1)
+    assert (report['hashed'], report['extracted']) == (1, 0)
+    assert series_hits(index, 'MES2300', latest=True) == [(SERIES, 12)]
+
+    os.remove(archive / f'{SERIES}_v12.docx')
+    assert index.update([str(archive)], jobs=1)['removed'] == 1
+    assert index.stats()['files'] == 4
+
+
+def test_rows_and_items(archive, index):
+    index.update([str(archive / f'{SERIES}_v11.docx')], jobs=1)
+    item, = index.search('"YADRO G4208P"', kinds=['item'])
+    assert item['location'].startswith('table ') and '[YADRO G4208P]' in item['snippet']
+    assert index.search('"YADRO G4208P"', kinds=['paragraph']) == []
+    assert {hit['kind'] for hit in index.search('"МОДУЛЬ ИНТЕГРАЦИИ"')} == {'paragraph'}
+
+
+def test_packed_revisions_are_indexed(archive, index):
+    store = VersionStore(str(archive))
+    store.pack(keep=1)
+    assert sorted(os.listdir(archive)) == ['.objects', '.versions.json', '.versions.json.lock',
+                                           f'{SERIES}_v11.docx']
+    report = index.update([str(archive)], jobs=1)
+    assert (report['files'], report['extracted'], report['errors']) == (4, 4, 0)
+    assert series_hits(index, 'MES2300', first=True) == [(SERIES, 10)]
+
+
+def test_failed_files_are_retried(archive, index, capsys):
+    broken = archive / f'{SERIES}_v12.docx'
+    broken.write_bytes(b'PK not a zip')
+    report = index.update([str(archive)], jobs=1)
+    assert report['errors'] == 1 and 'Could not index' in capsys.readouterr().err
+    assert index.stats()['files'] == 4
+
+    shutil.copyfile(archive / f'{SERIES}_v11.docx', broken)
+    report = index.update([str(archive)], jobs=1)
+    assert (report['errors'], report['hashed']) == (0, 1)
+    assert series_hits(index, 'MES2300', latest=True) == [(SERIES, 12)]
@@ -0,0 +1,92 @@
+import importlib
+import os
+import sys
+
+import pytest
+from docx import Document
+
+import section_cache
+from section_cache import render_section, section_key
+
+BUILDER = '''
+from docx.shared import Pt
+
+import sections_helper
+
+
+def build_note(doc, text):
+    doc.add_paragraph(sections_helper.decorate(text)).runs[0].font.size = Pt(10)
+'''
+
+
+@pytest.fixture
+def builder(tmp_path, monkeypatch):
+    """A builder module and a helper module of its own tree, importable from tmp_path."""
+    (tmp_path / 'sections_helper.py').write_text("def decorate(text):\n    return '* ' + text\n")
+    (tmp_path / 'sections_builder.py').write_text(BUILDER)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    # A fresh process: nothing rendered or hashed yet
+    monkeypatch.setattr(section_cache, '_fragments', {})
+    monkeypatch.setattr(section_cache, '_sources', {})
+    yield importlib.import_module('sections_builder')
+    for name in ('sections_builder', 'sections_helper'):
+        sys.modules.pop(name, None)
+
+
+def render(build, **inputs):
+    doc = Document()
+    hit = render_section(doc, build, **inputs)
+    return hit, [p.text for p in doc.paragraphs]
+
+
+def test_hit_on_same_code_and_inputs(builder):
+    assert render(builder.build_note, text='a') == (False, ['* a'])
+    assert render(builder.build_note, text='a') == (True, ['* a'])
+    # Served from disk when the in-memory copy is gone
+    section_cache._fragments.clear()
+    assert render(builder.build_note, text='a') == (True, ['* a'])
+    assert render(builder.build_note, text='b') == (False, ['* b'])
+
+
+def test_helper_change_invalidates(builder, tmp_path, monkeypatch):
+    key = section_key(builder.build_note, {'text': 'a'})
+    assert render(builder.build_note, text='a') == (False, ['* a'])
+
+    (tmp_path / 'sections_helper.py').write_text("def decorate(text):\n    return '-- ' + text\n")
+    importlib.reload(sys.modules['sections_helper'])
+    monkeypatch.setattr(section_cache, '_fragments', {})
+    monkeypatch.setattr(section_cache, '_sources', {})
+    assert section_key(builder.build_note, {'text': 'a'}) != key
+    assert render(builder.build_note, text='a') == (False, ['-- a'])
+
+
+def test_library_version_invalidates(builder, monkeypatch):
+    key = section_key(builder.build_note, {'text': 'a'})
+    monkeypatch.setattr(section_cache, '_sources', {})
+    monkeypatch.setattr(section_cache.docx, '__version__', '0.0.0')
+    assert section_key(builder.build_note, {'text': 'a'}) != key
+
+
+def test_prune_drops_least_recently_used(builder, cache_dir, monkeypatch):
+    for text in 'abc':
+        render(builder.build_note, text=text)
+    files = {path.name: path for path in (cache_dir / 'sections').iterdir()}
+    assert len(files) == 3
+    for age, name in enumerate(sorted(files, key=lambda name: files[name].stat().st_mtime_ns)):
+        os.utime(files[name], (1000 + age, 1000 + age))
+    # A hit marks "a" as used, so "b" is now the oldest
+    section_cache._fragments.clear()
+    key_a = section_key(builder.build_note, {'text': 'a'})
+    assert render(builder.build_note, text='a')[0]
+
+    size = files[key_a + '.xml'].stat().st_size
+    assert section_cache.prune(max_bytes=2 * size) == 1
+    assert key_a + '.xml' in os.listdir(cache_dir / 'sections')
+    assert section_key(builder.build_note, {'text': 'b'}) + '.xml' not in os.listdir(cache_dir / 'sections')
+
+
+def test_new_fragments_keep_the_cache_bounded(builder, cache_dir, monkeypatch):
+    monkeypatch.setattr(section_cache, 'MAX_CACHE_BYTES', 1)
+    render(builder.build_note, text='a')
+    render(builder.build_note, text='b')
+    assert os.listdir(cache_dir / 'sections') == []
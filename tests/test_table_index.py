@@ -0,0 +1,72 @@
+import pytest
+from docx import Document
+
+from conftest import add_table
+from table_index import TableIndex
+
+
+def document():
+    doc = Document()
+    table = add_table(doc, [
+        ['Наименование', 'Кол-во, шт.', 'Сумма', 'Поставка'],
+        ['Сервер YADRO G4208P G3', '2', '64 302 318', '8 недель'],
+        ['СХД Raidix', '1', '1 000 000', ''],
+        ['Итого', '', '65 302 318', ''],
+    ])
+    table.cell(1, 0).add_paragraph('два процессора')
+    # "Итого" spans the first two columns, the delivery term covers both items
+    table.cell(3, 0).merge(table.cell(3, 1))
+    table.cell(1, 3).merge(table.cell(2, 3))
+    return doc
+
+
+def test_grid_with_merged_cells():
+    index = TableIndex(document())
+    table, = index.tables
+    total = table.rows[3]
+    assert total.cells[0] is total.cells[1]
+    assert [column for column, _ in total.items()] == [0, 2, 3]
+    # The vertically merged cell belongs to the row where the merge starts
+    server, storage = table.rows[1:3]
+    assert storage.cells[3] is server.cells[3]
+    assert storage.get(3).strip() == '8 недель'
+    assert table.column('Кол-во') == 1
+    with pytest.raises(KeyError):
+        table.column('Цена')
+
+
+def test_lookup_by_first_line_and_find():
+    index = TableIndex(document())
+    row, = index.lookup('Сервер  YADRO G4208P G3')
+    assert row.position == 1
+    assert index.lookup('два процессора') == []
+    assert index.find('СХД', 'Raidix') == [index.tables[0].rows[2]]
+    assert index.find('СХД', 'Aerodisk') == []
+
+
+def test_edits_keep_the_index_current():
+    doc = document()
+    index = TableIndex(doc)
+    row, = index.lookup('Сервер YADRO G4208P G3')
+    row.set(1, '1')
+    assert doc.tables[0].cell(1, 1).text == '1'
+    assert index.find('YADRO', '\n1\n') == [row]
+
+    assert row.replace({'YADRO G4208P G3': 'Гравитон С2122ИУ'}) == {'YADRO G4208P G3': 1}
+    assert index.lookup('Сервер YADRO G4208P G3') == []
+    assert index.lookup('Сервер Гравитон С2122ИУ') == [row]
+
+    storage, = index.find('Raidix')
+    storage.delete()
+    assert index.find('Raidix') == []
+    assert len(doc.tables[0].rows) == 3
+
+
+def test_invalidate_after_outside_edits():
+    doc = document()
+    index = TableIndex(doc)
+    assert index.find('Aerodisk') == []
+    doc.tables[0].cell(2, 0).text = 'СХД Aerodisk'
+    assert index.find('Aerodisk') == []
+    index.invalidate()
+    assert [row.position for row in index.find('Aerodisk')] == [2]
@@ -0,0 +1,54 @@
+import pytest
+
+import text_layout
+from generate_proposal_v15 import INTRO, PDF, TERMS, add_fonts
+
+TEXTS = [INTRO, *TERMS, 'Строка\nс переносом\n', 'Слово' * 40, '']
+
+
+def page(draw):
+    pdf = PDF()
+    add_fonts(pdf)
+    pdf.add_page()
+    pdf.set_font('DejaVu', '', 11)
+    draw(pdf)
+    return pdf.pages[1]
+
+
+@pytest.mark.parametrize('align', ['J', 'L', 'C', 'R'])
+@pytest.mark.parametrize('border', [0, 1, 'LR', 'TB'])
+def test_multi_cell_draws_what_fpdf_draws(align, border):
+    def draw(multi_cell):
+        def run(pdf):
+            for text in TEXTS:
+                multi_cell(pdf, 0, 7, text, border, align)
+                multi_cell(pdf, 80, 5, text, border, align)
+        return run
+
+    expected = page(draw(lambda pdf, *args: pdf.multi_cell(*args)))
+    assert page(draw(text_layout.multi_cell)) == expected
+
+
+def test_height_counts_the_lines():
+    pdf = PDF()
+    add_fonts(pdf)
+    pdf.add_page()
+    pdf.set_font('DejaVu', '', 11)
+    top = pdf.y
+    pdf.multi_cell(80, 5, INTRO)
+    assert text_layout.height(pdf, 80, 5, INTRO) == pytest.approx(pdf.y - top)
+
+
+def test_layouts_persist_across_processes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'layouts.pkl')
+    monkeypatch.setattr(text_layout, '_layouts', {})
+    monkeypatch.setattr(text_layout, '_dirty', False)
+    page(lambda pdf: text_layout.multi_cell(pdf, 0, 7, INTRO))
+    saved = dict(text_layout._layouts)
+    assert text_layout.save(path)
+    assert not text_layout.save(path)
+
+    monkeypatch.setattr(text_layout, '_layouts', {})
+    assert text_layout.load(path) == len(saved)
+    assert text_layout._layouts == saved
+    assert text_layout.load(str(tmp_path / 'missing.pkl')) == 0
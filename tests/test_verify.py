@@ -0,0 +1,64 @@
+from docx import Document
+
+from conftest import PUBLIC, SERIES, add_table
+from generate_proposal_v15 import create_proposal
+from verify import check, extract, main
+
+
+def save_tables(path, *tables):
+    doc = Document()
+    doc.add_heading('Спецификация', level=1)
+    for rows in tables:
+        add_table(doc, rows)
+        doc.add_paragraph('')
+    doc.save(path)
+    return str(path)
+
+
+def test_docx_text_and_rows():
+    path = f'{PUBLIC}/{SERIES}_v11.docx'
+    document = extract(path)
+    assert any('MES2300-24' in p for p in document.paragraphs)
+    assert check(path, contains=['YADRO G4208P G3'], absent=['MES5324'], rows=[('YADRO G4208P G3', '1')]) == []
+    assert check(path, contains=['Raidix'], rows=[('YADRO', 'Aerodisk')]) == [
+        "missing 'Raidix'", "no row with 'YADRO' + 'Aerodisk'"]
+
+
+def test_pdf_text_and_rows(tmp_path):
+    path = str(tmp_path / 'v15.pdf')
+    create_proposal(path, variants=('basic',), customer='ООО Ромашка')
+    assert check(path, contains=['Заказчик: ООО Ромашка', 'Вариант 1'], rows=[('ИТОГО:',)]) == []
+
+
+def test_unreadable_files(tmp_path):
+    for content, error in ((b'PK', 'BadZipFile'), (b'', 'ValueError')):
+        path = tmp_path / 'broken.docx'
+        path.write_bytes(content)
+        problem, = check(str(path))
+        assert problem.startswith(f'unreadable: {error}')
+
+
+def test_wrong_total_is_reported(tmp_path):
+    path = save_tables(tmp_path / 'wrong.docx', [
+        ('Сервер', '2 001 000,00'),
+        ('Монтаж', '501,50'),
+        ('Итого', '2 001 501,00'),
+    ])
+    assert check(path, totals=True) == [
+        "total 'Итого': 2 001 501,00 but the rows above sum to 2 001 501,50"]
+    assert main([path, '--totals', '-j', '1']) == 1
+
+
+def test_totals_are_summed_per_table(tmp_path):
+    # The first table has no total row; its amounts must not count towards the second
+    path = save_tables(tmp_path / 'tables.docx', [
+        ('Лицензия', '100 000'),
+    ], [
+        ('Сервер', '300 000'),
+        ('Монтаж', '50 000'),
+        ('Итого', '350 000'),
+    ])
+    tables = [table for table, _ in extract(path).rows]
+    assert tables == sorted(tables) and len(set(tables)) == 2
+    assert check(path, totals=True) == []
+    assert main([path, '--totals', '-j', '1']) == 0
@@ -0,0 +1,58 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import SERIES, digests
+from version_store import MANIFEST, VersionError, VersionStore
+
+
+def test_manifest_records_file_hashes(archive):
+    originals = digests(archive)
+    store = VersionStore(str(archive))
+    versions = store.versions(SERIES)
+    assert [version.number for version in versions] == [2, 3, 10, 11]
+    assert {os.path.basename(v.path): v.sha256 for v in versions} == originals
+    assert store.latest(SERIES).number == 11
+    with open(archive / MANIFEST, encoding='utf-8') as f:
+        assert json.load(f)['series'][f'{SERIES}.docx']['latest'] == 11
+
+
+def test_read_only_store_writes_nothing(archive):
+    before = sorted(os.listdir(archive))
+    store = VersionStore(str(archive), read_only=True)
+    assert store.latest(SERIES).number == 11
+    assert [version.number for version in store.versions(SERIES)] == [2, 3, 10, 11]
+    with pytest.raises(VersionError):
+        store.scan()
+    assert sorted(os.listdir(archive)) == before
+
+
+def test_new_version_allocates_the_next_number(archive):
+    store = VersionStore(str(archive))
+    latest = store.latest(SERIES)
+    with store.new_version(SERIES, parent=latest) as version:
+        assert version.number == 12
+        shutil.copyfile(latest.path, version.path)
+    recorded = VersionStore(str(archive), read_only=True).latest(SERIES)
+    assert (recorded.number, recorded.parent, recorded.sha256) == (12, 11, latest.sha256)
+
+    # A block that fails gives its number back and leaves no file behind
+    with pytest.raises(RuntimeError):
+        with store.new_version(SERIES) as version:
+            raise RuntimeError
+    assert not os.path.exists(version.path)
+    with store.new_version(SERIES) as version:
+        assert version.number == 13
+        shutil.copyfile(latest.path, version.path)
+
+
+def test_record_rejects_foreign_files(archive, tmp_path):
+    store = VersionStore(str(archive))
+    with pytest.raises(VersionError):
+        store.record(str(archive / 'proposal.docx'))
+    with pytest.raises(VersionError):
+        store.record(str(tmp_path / f'{SERIES}_v1.docx'))
+    with pytest.raises(VersionError):
+        store.get(SERIES, 99)
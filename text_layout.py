@@ -0,0 +1,184 @@
+"""
+Line-break cache for fpdf multi_cell().
+
+FPDF.multi_cell() measures a paragraph character by character (one
+get_string_width() call per character with a unicode font) every time it is
+drawn, although a batch of proposals draws the same description, terms and
+warranty paragraphs over and over. Here the line breaks of a paragraph - the
+text of each line and its justification word spacing - are computed once per
+(text, font, size, width, alignment) with the same algorithm as fpdf, kept
+for the whole process and optionally persisted in the cache directory, so
+every later document only writes the lines out.
+
+    text_layout.multi_cell(pdf, 0, 7, body)          # drop-in for pdf.multi_cell(0, 7, body)
+    text_layout.load()                               # start from the layouts saved earlier
+    text_layout.save()                               # and keep the new ones for the next process
+
+Fonts are identified by the hash of their TTF file, so a persisted layout is
+never reused with different metrics.
+"""
+import os
+import pickle
+from collections import namedtuple
+
+from cache_paths import cache_dir
+
+# 2: lines that reset the word spacing are kept apart from justified ones
+FORMAT_VERSION = 2
+MAX_LAYOUTS = 4096
+
+# lines: [(text, word spacing in user units)]; the spacing is None on the lines
+# before which fpdf resets it (explicit and forced breaks, the last line)
+Layout = namedtuple('Layout', 'lines')
+
+_layouts = {}
+_dirty = False
+
+
+def _font_id(font):
+    if font.get('ttffile'):
+        from font_cache import file_hash
+        return file_hash(font['ttffile'])
+    return font['name']
+
+
+def _char_width(font):
+    cw = font['cw']
+    if isinstance(cw, dict):
+        return lambda char: cw.get(char, 0)
+    size = len(cw)
+    missing = font['desc'].get('MissingWidth') or 500
+    return lambda char: cw[ord(char)] if ord(char) < size else missing
+
+
+def break_lines(text, font, font_size, width, c_margin, align='J'):
+    """The Layout FPDF.multi_cell() would produce for `text` in a `width` mm cell."""
+    char_width = _char_width(font)
+    wmax = (width - 2 * c_margin) * 1000.0 / font_size
+    s = text.replace('\r', '')
+    nb = len(s)
+    if nb > 0 and s[nb - 1] == '\n':
+        nb -= 1
+    lines = []
+    sep = -1
+    i = j = 0
+    length = ls = 0
+    ns = 0
+    while i < nb:
+        c = s[i]
+        if c == '\n':
+            # Explicit line break
+            lines.append((s[j:i], None))
+            i += 1
+            sep = -1
+            j = i
+            length = ns = 0
+            continue
+        if c == ' ':
+            sep = i
+            ls = length
+            ns += 1
+        length += char_width(c)
+        if length > wmax:
+            # Automatic line break
+            if sep == -1:
+                if i == j:
+                    i += 1
+                lines.append((s[j:i], None))
+            else:
+                ws = (wmax - ls) / 1000.0 * font_size / (ns - 1) if align == 'J' and ns > 1 else 0
+                lines.append((s[j:sep], ws))
+                i = sep + 1
+            sep = -1
+            j = i
+            length = ns = 0
+        else:
+            i += 1
+    lines.append((s[j:i], None))
+    return Layout(lines)
+
+
+def layout(pdf, w, txt, align='J'):
+    """The cached Layout of `txt` in the current font of `pdf` (w=0 spans to the right margin)."""
+    global _dirty
+    if w == 0:
+        w = pdf.w - pdf.r_margin - pdf.x
+    txt = pdf.normalize_text(txt)
+    font = pdf.current_font
+    key = (_font_id(font), pdf.font_size_pt, round(w, 4), round(pdf.c_margin, 4), align == 'J', txt)
+    cached = _layouts.get(key)
+    if cached is None:
+        if len(_layouts) >= MAX_LAYOUTS:
+            _layouts.clear()
+        cached = _layouts[key] = break_lines(txt, font, pdf.font_size, w, pdf.c_margin, align)
+        _dirty = True
+    return cached
+
+
+def height(pdf, w, h, txt, align='J'):
+    """Height multi_cell(w, h, txt) would take on the page."""
+    return len(layout(pdf, w, txt, align).lines) * h
+
+
+def multi_cell(pdf, w, h, txt='', border=0, align='J', fill=0):
+    """FPDF.multi_cell() drawing from the layout cache."""
+    if w == 0:
+        w = pdf.w - pdf.r_margin - pdf.x
+    lines = layout(pdf, w, txt, align).lines
+    # Same borders as fpdf: top on the first line, bottom on the last, sides on all
+    first = sides = bottom = ''
+    if border:
+        if border == 1:
+            border = 'LTRB'
+        sides = ''.join(side for side in 'LR' if side in border)
+        first = sides + 'T' if 'T' in border else sides
+        bottom = 'B' if 'B' in border else ''
+    last = len(lines) - 1
+    for number, (line, ws) in enumerate(lines):
+        # The same Tw operators as fpdf, so the page content is identical
+        if ws is None:
+            if pdf.ws > 0:
+                pdf.ws = 0
+                pdf._out('0 Tw')
+        elif align == 'J':
+            pdf.ws = ws
+            pdf._out('%.3f Tw' % (ws * pdf.k))
+        sides_here = first if number == 0 else sides
+        if number == last:
+            sides_here += bottom
+        pdf.cell(w, h, line, sides_here or 0, 2, align, fill)
+    pdf.x = pdf.l_margin
+
+
+def _path():
+    return os.path.join(cache_dir('text-layout'), 'layouts.pkl')
+
+
+def load(path=None):
+    """Add the layouts persisted by save() to the process cache; returns how many were read."""
+    try:
+        with open(path or _path(), 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return 0
+    if not isinstance(data, dict) or data.get('version') != FORMAT_VERSION:
+        return 0
+    for key, lines in data['layouts'].items():
+        _layouts.setdefault(key, Layout(lines))
+    return len(data['layouts'])
+
+
+def save(path=None):
+    """Persist the process cache (merged with what is on disk) if it has new layouts."""
+    global _dirty
+    if not _dirty:
+        return False
+    path = path or _path()
+    load(path)
+    layouts = {key: layout.lines for key, layout in list(_layouts.items())[-MAX_LAYOUTS:]}
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'version': FORMAT_VERSION, 'layouts': layouts}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    _dirty = False
+    return True
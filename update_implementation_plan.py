@@ -1,9 +1,9 @@
-import os
-from docx import Document
-from docx.shared import Pt
+from docx_save import open_document, save_document
+from docx_replace import ReplacementEngine
+from version_store import VersionStore
 
 def update_implementation_plan(doc_path, output_path):
-    doc = Document(doc_path)
+    doc = open_document(doc_path)
     
     # Define replacements for implementation plan
     replacements = {
@@ -14,36 +14,23 @@ def update_implementation_plan(doc_path, output_path):
         "Проектирование HA-кластера": "Проектирование архитектуры (YADRO G4208P)"
     }
 
-    for paragraph in doc.paragraphs:
-        for key, value in replacements.items():
-            if key in paragraph.text:
-                paragraph.text = paragraph.text.replace(key, value)
-                # Re-apply style if needed (basic check)
-                if "Heading" in paragraph.style.name:
-                    pass 
+    # One pass over body paragraphs and table cells for all rules
+    engine = ReplacementEngine(replacements)
+    hits = engine.apply(doc)
+    engine.print_report(hits)
 
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    for key, value in replacements.items():
-                        if key in paragraph.text:
-                            paragraph.text = paragraph.text.replace(key, value)
-
-    doc.save(output_path)
+    save_document(doc, output_path)
     print(f"Updated proposal saved to {output_path}")
 
 if __name__ == "__main__":
-    # Find the latest proposal file
-    files = [f for f in os.listdir(".") if f.startswith("Commercial_Proposal_v") and f.endswith(".docx")]
-    if not files:
+    # The latest proposal and the next version number come from the manifest
+    store = VersionStore(".")
+    latest = store.latest("Commercial_Proposal")
+    if latest is None:
         print("No proposal file found.")
         exit(1)
-    
-    latest_file = sorted(files, key=lambda x: int(x.split('_v')[1].split('.')[0]))[-1]
-    version_num = int(latest_file.split('_v')[1].split('.')[0])
-    new_version_num = version_num + 1
-    output_file = f"Commercial_Proposal_v{new_version_num}.docx"
-    
-    print(f"Updating {latest_file} -> {output_file}")
-    update_implementation_plan(latest_file, output_file)
+
+    source = store.checkout(latest)
+    with store.new_version("Commercial_Proposal", parent=latest) as version:
+        print(f"Updating {source} -> {version.path}")
+        update_implementation_plan(source, version.path)
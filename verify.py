@@ -0,0 +1,413 @@
+"""
+Streaming verification of generated and patched proposals (DOCX and PDF).
+
+Files are memory-mapped and read without building a document model:
+word/document.xml is parsed incrementally and each paragraph and table
+row is dropped once its text has been taken, and the page content streams
+of a PDF are decoded and their text operators interpreted (fpdf writes
+Unicode text as UTF-16BE strings). Both give the same view - the text and the table rows of
+the document - on which the checks run:
+
+    python verify.py client/public/*.docx --absent MES5324 --absent Гравитон
+    python verify.py commercial_proposal_v15.pdf --contains "YADRO G4208P" --totals
+    python verify.py v11.docx --row "YADRO G4208P G3" "1 шт." --totals
+    python verify.py v2.docx --show "ДОПОЛНИТЕЛЬНЫЕ СЦЕНАРИИ ИСПОЛЬЗОВАНИЯ" --lines 5
+
+--totals checks that every "Итого"/"ИТОГО" row of a table equals the sum of
+the amounts above it in the same column; in a column of unit prices (headed
+"Цена ..." in a table with a "Кол-во" column) each row counts as quantity x
+price. Files are checked in parallel
+(-j); memory per worker is bounded by the largest paragraph or table row.
+"""
+import argparse
+import mmap
+import os
+import re
+import sys
+import zipfile
+import zlib
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+
+from docx_replace import W_NS, W_P, element_text
+from docx_stream import DOCUMENT_PART, W_GRIDSPAN, W_TC, W_VAL
+
+W_TR = '{%s}tr' % W_NS
+W_TBL = '{%s}tbl' % W_NS
+W_BODY = '{%s}body' % W_NS
+W_PPR = '{%s}pPr' % W_NS
+W_PSTYLE = '{%s}pStyle' % W_NS
+# Heading1, MdHeading2, Заголовок 3 (localized Word), Title
+HEADING_STYLE_RE = re.compile(r'(?:heading|заголовок)\s*(\d)|^title$', re.I)
+TOTAL_RE = re.compile(r'^\s*(итого|всего)', re.I)
+AMOUNT_RE = re.compile(r'^[~≈]?\s*(\d{1,3}(?:[ \xa0,]\d{3})+|\d+)(?:[.,](\d{1,2}))?\s*(?:₽|руб\.?|RUB)?$')
+QTY_RE = re.compile(r'^\s*(\d+)(?:[.,](\d+))?\s*(?:шт\.?|ед\.?|м)?$')
+# Header cells of a line item table; sums are checked before prices ("Итоговая цена")
+QTY_HEADER_RE = re.compile(r'кол|qty|quantity', re.I)
+SUM_HEADER_RE = re.compile(r'сумм|стоимост|итог|total', re.I)
+PRICE_HEADER_RE = re.compile(r'цен|price', re.I)
+# Old hardware that must not survive into current revisions
+LEGACY_MODELS = ('Гравитон С2122ИУ', 'Graviton C2122IU', 'MES5324', 'MES2324')
+
+# `rows` are (table, [(column, text), ...]); columns are the last grid column
+# a cell covers in a DOCX and positions counted from the right edge in a PDF.
+# `headings` are (index into paragraphs, level) of body headings and `tables`
+# the [start, end) range of paragraphs inside each table (DOCX only).
+Extract = namedtuple('Extract', 'paragraphs rows headings tables', defaults=((), ()))
+
+
+def normalize(text):
+    return ' '.join(text.split())
+
+
+def amount(text):
+    """Kopecks in a cell that holds only an amount ("~4 839 000 ₽", "139 000"), else None."""
+    match = AMOUNT_RE.match(text.strip())
+    if not match:
+        return None
+    rubles, fraction = match.groups()
+    return int(re.sub(r'\D', '', rubles)) * 100 + int((fraction or '0').ljust(2, '0'))
+
+
+def format_amount(kopecks):
+    """Kopecks as "2 001 501,50" (kopecks are shown only when non-zero)."""
+    rubles, rest = divmod(kopecks, 100)
+    text = f'{rubles:,}'.replace(',', ' ')
+    return f'{text},{rest:02d}' if rest else text
+
+
+# -- DOCX ----------------------------------------------------------------
+
+class _MappedFile:
+    """A read-only mmap with the file API zipfile expects."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def __getattr__(self, name):
+        return getattr(self._data, name)
+
+    def seekable(self):
+        return True
+
+    def seek(self, pos, whence=0):
+        # mmap raises ValueError past either end; zipfile expects OSError from a short file
+        try:
+            return self._data.seek(pos, whence)
+        except ValueError as e:
+            raise OSError(str(e)) from None
+
+
+def _heading_level(p):
+    """Outline level of a heading paragraph (0 for Title), else None."""
+    for p_pr in p.iterchildren(W_PPR):
+        for style in p_pr.iterchildren(W_PSTYLE):
+            match = HEADING_STYLE_RE.search(style.get(W_VAL, ''))
+            if match:
+                return int(match[1] or 0)
+    return None
+
+
+def extract_docx(path):
+    paragraphs, rows, headings, spans, tables = [], [], [], [], {}
+    # Rows and cells still being parsed (tables can nest): (table, cells, [columns]) and [span, texts]
+    open_rows, open_cells = [], []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+            zipfile.ZipFile(_MappedFile(data)) as package, package.open(DOCUMENT_PART) as part:
+        events = etree.iterparse(part, events=('start', 'end'), tag=(W_P, W_TC, W_GRIDSPAN, W_TR, W_TBL),
+                                 huge_tree=True)
+        for event, element in events:
+            tag = element.tag
+            if event == 'start':
+                if tag == W_TBL:
+                    tables[element] = len(spans)
+                    spans.append([len(paragraphs), None])
+                elif tag == W_TR:
+                    open_rows.append((tables[element.getparent()], [], [0]))
+                elif tag == W_TC:
+                    open_cells.append([1, []])
+                continue
+            parent = element.getparent()
+            if tag == W_P:
+                # Paragraphs nested in text boxes are part of their outer paragraph
+                if parent is None or parent.tag != W_P:
+                    text = element_text(element)
+                    paragraphs.append(text)
+                    if parent is not None and parent.tag == W_TC:
+                        open_cells[-1][1].append(text)
+                    elif parent is not None and parent.tag == W_BODY:
+                        level = _heading_level(element)
+                        if level is not None:
+                            headings.append((len(paragraphs) - 1, level))
+            elif tag == W_GRIDSPAN:
+                open_cells[-1][0] = int(element.get(W_VAL))
+            elif tag == W_TC:
+                span, texts = open_cells.pop()
+                _, cells, columns = open_rows[-1]
+                columns[0] += span
+                cells.append((columns[0] - 1, '\n'.join(texts)))
+            elif tag == W_TR:
+                table, cells, _ = open_rows.pop()
+                rows.append((table, cells))
+            else:
+                spans[tables.pop(element)][1] = len(paragraphs)
+            if parent is not None and parent.tag in (W_BODY, W_TBL):
+                # Done with this body block or table row: drop it and everything before it
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+    return Extract(paragraphs, rows, headings, spans)
+
+
+# -- PDF -----------------------------------------------------------------
+
+OBJECT_RE = re.compile(rb'(\d+) 0 obj\s*<<(.*?)>>\s*(stream\r?\n)?', re.S)
+TOKEN_RE = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f\s]*>|/[^\s/\[\]()<>]+|[-+]?(?:\d+\.?\d*|\.\d+)'
+                      rb'|[A-Za-z\'"*]+|\[|\]', re.S)
+ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _unescape(literal):
+    return re.sub(rb'\\([0-7]{1,3}|.)',
+                  lambda m: bytes([int(m[1], 8)]) if m[1][:1].isdigit() else ESCAPES.get(m[1], m[1]),
+                  literal[1:-1], flags=re.S)
+
+
+def _pdf_objects(data):
+    """{number: (dictionary, stream bytes or None)}."""
+    objects = {}
+    for match in OBJECT_RE.finditer(data):
+        dictionary, stream = match[2], None
+        if match[3]:
+            length = int(re.search(rb'/Length (\d+)', dictionary)[1])
+            stream = data[match.end():match.end() + length]
+            if b'/FlateDecode' in dictionary:
+                stream = zlib.decompress(stream)
+        objects[int(match[1])] = (dictionary, stream)
+    return objects
+
+
+def _text_runs(content, fonts, forms, x0=0.0, y0=0.0):
+    """(x, y, text) of every text-showing operator, following translations and form XObjects."""
+    operands, stack = [], []
+    font_unicode = tx = ty = None
+    for token in TOKEN_RE.findall(content):
+        first = token[:1]
+        if first in b'(<[]/' or first.isdigit() or first in b'-+.':
+            operands.append(token)
+            continue
+        if token == b'q':
+            stack.append((x0, y0))
+        elif token == b'Q' and stack:
+            x0, y0 = stack.pop()
+        elif token == b'cm' and len(operands) >= 6:
+            # fpdf only ever translates blocks
+            x0, y0 = x0 + float(operands[-2]), y0 + float(operands[-1])
+        elif token == b'BT':
+            tx = ty = 0.0
+        elif token == b'Td' and len(operands) >= 2:
+            tx, ty = tx + float(operands[-2]), ty + float(operands[-1])
+        elif token == b'Tm' and len(operands) >= 6:
+            tx, ty = float(operands[-2]), float(operands[-1])
+        elif token == b'Tf' and len(operands) >= 2:
+            font_unicode = fonts.get(operands[-2][1:], False)
+        elif token in (b'Tj', b"'", b'"', b'TJ'):
+            strings = [o for o in operands if o[:1] in b'(<']
+            raw = b''.join(_unescape(s) if s[:1] == b'(' else bytes.fromhex(s[1:-1].decode()) for s in strings)
+            text = raw.decode('utf-16-be', 'replace') if font_unicode else raw.decode('latin-1')
+            yield x0 + (tx or 0.0), y0 + (ty or 0.0), text
+        elif token == b'Do' and operands and operands[-1][1:] in forms:
+            yield from _text_runs(forms[operands[-1][1:]], fonts, forms, x0, y0)
+        operands = []
+
+
+def pdf_pages(path):
+    """Yield the lines of each page, top to bottom, as lists of (x, text) runs from left to right."""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        objects = _pdf_objects(data)
+        names = re.findall(rb'/([A-Za-z]+\d+) (\d+) 0 R', data)
+    fonts = {name: b'/Type0' in objects[int(number)][0]
+             for name, number in names if int(number) in objects and b'/Type /Font' in objects[int(number)][0]}
+    forms = {name: objects[int(number)][1]
+             for name, number in names if int(number) in objects and b'/Subtype /Form' in objects[int(number)][0]}
+
+    for number, (dictionary, _) in sorted(objects.items()):
+        if not re.search(rb'/Type /Page\b(?!s)', dictionary):
+            continue
+        content = re.search(rb'/Contents (\d+) 0 R', dictionary)
+        if content is None:
+            continue
+        lines = {}
+        for x, y, text in _text_runs(objects[int(content[1])][1], fonts, forms):
+            lines.setdefault(round(y, 1), []).append((x, text))
+        # PDF y grows upwards: top line first
+        yield [sorted(cells) for _, cells in sorted(lines.items(), reverse=True)]
+
+
+def extract_pdf(path):
+    paragraphs, rows = [], []
+    for lines in pdf_pages(path):
+        for cells in lines:
+            paragraphs.append(' '.join(text for _, text in cells))
+            if len(cells) > 1:
+                rows.append((None, [(position - len(cells) + 1, text) for position, (_, text) in enumerate(cells)]))
+    return Extract(paragraphs, rows)
+
+
+def extract(path):
+    if path.lower().endswith('.pdf'):
+        return extract_pdf(path)
+    return extract_docx(path)
+
+
+# -- checks --------------------------------------------------------------
+
+def quantity(text):
+    """The quantity in a cell like "2", "2 шт." or "1,5", else None."""
+    match = QTY_RE.match(text)
+    if not match:
+        return None
+    whole, fraction = match.groups()
+    return Decimal(f"{whole}.{fraction or 0}")
+
+
+def _unit_price_columns(cells):
+    """
+    (qty column, {unit price columns}) of a header row, None for a header
+    without both; False if the row is not a header (it holds an amount or
+    names no amount column).
+    """
+    qty, prices, header = None, set(), False
+    for column, text in cells:
+        if amount(text) is not None:
+            return False
+        if SUM_HEADER_RE.search(text):
+            header = True
+        elif PRICE_HEADER_RE.search(text):
+            prices.add(column)
+            header = True
+        elif qty is None and QTY_HEADER_RE.search(text):
+            qty = column
+    if not header:
+        return False
+    return (qty, prices) if qty is not None and prices else None
+
+
+def total_problems(rows):
+    """Total rows whose amounts differ from the sum of the rows above them (per table, per column)."""
+    problems = []
+    sums, current, units = {}, object(), None
+    for table, cells in rows:
+        if table != current:
+            sums, current, units = {}, table, None
+        label = cells[0][1] if cells else ''
+        if TOTAL_RE.match(label):
+            for column, text in cells[1:]:
+                value = amount(text)
+                if value is not None and column in sums and sums[column] != value:
+                    problems.append(f"{normalize(label)!r}: {normalize(text)} but the rows above sum to "
+                                    f"{format_amount(sums[column])}")
+            sums = {}
+            continue
+        header = _unit_price_columns(cells)
+        if header is not False:
+            # PDF tables are not told apart, but each of them starts with a header
+            units = header
+            continue
+        qty = quantity(dict(cells).get(units[0], '')) if units else None
+        for column, text in cells:
+            value = amount(text)
+            if value is None:
+                continue
+            if qty is not None and column in units[1]:
+                value = int((qty * value).to_integral_value(ROUND_HALF_UP))
+            sums[column] = sums.get(column, 0) + value
+    return problems
+
+
+def check(path, contains=(), absent=(), rows=(), totals=False):
+    """Problems found in one file (empty if it passes)."""
+    try:
+        # An empty file cannot be mapped at all (ValueError)
+        document = extract(path)
+    except (OSError, ValueError, zipfile.BadZipFile, KeyError, etree.XMLSyntaxError, zlib.error) as e:
+        return [f"unreadable: {type(e).__name__}: {e}"]
+    text = normalize('\n'.join(document.paragraphs))
+    problems = [f"missing {t!r}" for t in contains if normalize(t) not in text]
+    problems += [f"still contains {t!r}" for t in absent if normalize(t) in text]
+    row_texts = [normalize(' '.join(text for _, text in cells)) for _, cells in document.rows]
+    for texts in rows:
+        if not any(all(normalize(t) in row for t in texts) for row in row_texts):
+            problems.append(f"no row with {' + '.join(map(repr, texts))}")
+    if totals:
+        problems += [f"total {problem}" for problem in total_problems(document.rows)]
+    return problems
+
+
+def _check(args):
+    path, checks = args
+    return path, check(path, **checks)
+
+
+def verify_files(paths, jobs=None, **checks):
+    """[(path, problems)] in input order, checked on `jobs` processes."""
+    tasks = [(path, checks) for path in paths]
+    if (jobs or os.cpu_count()) <= 1 or len(tasks) <= 1:
+        return list(map(_check, tasks))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_check, tasks, chunksize=max(1, len(tasks) // (8 * (jobs or os.cpu_count())))))
+
+
+def show(path, text, lines=5):
+    """Print the paragraph containing `text` and the `lines` - 1 after it. Returns False if not found."""
+    paragraphs = [p for p in extract(path).paragraphs if p.strip()]
+    for position, paragraph in enumerate(paragraphs):
+        if normalize(text) in normalize(paragraph):
+            for following in paragraphs[position:position + lines]:
+                print(f"Content: {following[:50]}...")
+            return True
+    return False
+
+
+def report(paths, jobs=None, legacy=False, **checks):
+    """Print OK/FAIL per file; returns the number of failed files."""
+    if legacy:
+        checks['absent'] = list(checks.get('absent', ())) + list(LEGACY_MODELS)
+    failed = 0
+    for path, problems in verify_files(paths, jobs, **checks):
+        if problems:
+            failed += 1
+            print(f"FAIL {path}: {'; '.join(problems)}")
+        else:
+            print(f"OK   {path}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check DOCX and PDF proposals without loading them")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--contains', action='append', default=[], metavar='TEXT')
+    parser.add_argument('--absent', action='append', default=[], metavar='TEXT')
+    parser.add_argument('--row', action='append', nargs='+', default=[], metavar='TEXT',
+                        help="A table row containing all of these texts must exist")
+    parser.add_argument('--totals', action='store_true', help="Check Итого rows against the sum of the rows above")
+    parser.add_argument('--legacy', action='store_true', help="Fail on leftover old models: " + ', '.join(LEGACY_MODELS))
+    parser.add_argument('--show', metavar='TEXT', help="Print the paragraphs starting at TEXT")
+    parser.add_argument('--lines', type=int, default=5)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    failed = report(args.files, args.jobs, args.legacy, contains=args.contains, absent=args.absent,
+                    rows=args.row, totals=args.totals)
+    for path in args.files if args.show else ():
+        if not show(path, args.show, args.lines):
+            failed += 1
+            print(f"FAIL {path}: missing {args.show!r}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
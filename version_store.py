@@ -0,0 +1,439 @@
+"""
+Manifest-backed store of proposal revisions.
+
+Revisions are files named <series>_v<N>.<ext> (Commercial_Proposal_v12.docx,
+Проектноепредложение3_v11.docx) in one directory. Rather than listing the
+directory and parsing every file name to find the newest one, the store keeps
+a manifest (.versions.json in that directory) with each revision's parent,
+SHA-256, size and timestamp and the latest number of every series, so
+"latest" and "vN" are dictionary lookups however large the archive grows.
+
+    store = VersionStore('client/public')
+    latest = store.latest('Проектноепредложение3')
+    with store.new_version('Проектноепредложение3', parent=latest) as version:
+        doc = Document(latest.path)
+        ...
+        doc.save(version.path)
+
+New revisions get the next free number under a lock on the manifest, so
+concurrent writers never allocate the same one. A directory without a
+manifest is scanned once to create it; scan() picks up files copied in by
+other means.
+
+Lookups that must leave the directory untouched (it may be served as is,
+like client/public) open the store read-only: no lock file, no manifest
+written and no objects stored - a directory without a manifest is scanned
+in memory instead.
+
+    latest = VersionStore('client/public', read_only=True).latest('Проектноепредложение3')
+
+DOCX (and other OOXML) revisions are also split into their zip members, and
+each member is stored once under .objects/ by the SHA-256 of its content:
+styles, theme, fonts, settings and media are shared by every revision, so
+only the parts that changed cost space. pack() then drops the full files of
+older revisions and checkout() reassembles any of them on demand.
+
+Usage: python version_store.py [--dir client/public] [list | latest SERIES | show SERIES N | scan
+                                                      | pack [--keep N] | checkout SERIES N [-o PATH] | du]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single writer is assumed
+    fcntl = None
+
+MANIFEST = '.versions.json'
+OBJECTS = '.objects'
+# 2: package members are stored as their raw zip data (see object_store)
+FORMAT_VERSION = 2
+PACKAGE_EXTENSIONS = ('docx', 'xlsx', 'pptx')
+VERSION_RE = re.compile(r'^(?P<series>.+)_v(?P<version>\d+)\.(?P<ext>[A-Za-z0-9]+)$')
+
+Version = namedtuple('Version', 'series ext number path parent sha256 size created packed', defaults=(False,))
+
+
+class VersionError(LookupError):
+    pass
+
+
+def file_digest(path):
+    """(SHA-256, size) of a file, read in chunks."""
+    import hashlib
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def series_key(series, ext):
+    return f"{series}.{ext.lower()}"
+
+
+class VersionStore:
+    def __init__(self, directory='.', read_only=False):
+        self.directory = directory
+        self.read_only = read_only
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        self._manifest = None
+        self._stamp = None
+
+    # -- manifest ------------------------------------------------------
+
+    def _load(self):
+        """The manifest, re-read only when another process has rewritten it; None if there is none."""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if self._manifest is None or stamp != self._stamp:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('format') != FORMAT_VERSION:
+                raise VersionError(
+                    f"{self.manifest_path} has format {manifest.get('format')}, this version reads "
+                    f"{FORMAT_VERSION}; check out its packed revisions with the version that wrote it, "
+                    f"then remove it and {OBJECTS} and run scan")
+            self._manifest, self._stamp = manifest, stamp
+        return self._manifest
+
+    def _create(self):
+        # A directory without a manifest is scanned once to create it
+        manifest = {'format': FORMAT_VERSION, 'series': {}}
+        self._scan(manifest)
+        self._write(manifest)
+        return manifest
+
+    @property
+    def manifest(self):
+        manifest = self._load()
+        if manifest is None and self.read_only:
+            # Scanned in memory (names and sizes only) until a writer creates the manifest
+            if self._manifest is None:
+                self._manifest = {'format': FORMAT_VERSION, 'series': {}}
+                self._scan(self._manifest)
+            return self._manifest
+        if manifest is None:
+            with self._locked():
+                manifest = self._load() or self._create()
+        return manifest
+
+    def _write(self, manifest):
+        tmp_path = '%s.%d.tmp' % (self.manifest_path, os.getpid())
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest = manifest
+        st = os.stat(self.manifest_path)
+        self._stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock for read-modify-write of the manifest."""
+        if self.read_only:
+            raise VersionError(f"The version store in {self.directory} is open read-only")
+        if fcntl is None:
+            yield
+            return
+        with open(self.manifest_path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _update(self):
+        with self._locked():
+            manifest = self._load() or self._create()
+            try:
+                yield manifest
+            except BaseException:
+                self._manifest = None
+                raise
+            self._write(manifest)
+
+    # -- lookups -------------------------------------------------------
+
+    def _version(self, key, number, entry):
+        series, _, ext = key.rpartition('.')
+        return Version(series, ext, number, os.path.join(self.directory, entry['file']),
+                       entry.get('parent'), entry['sha256'], entry['size'], entry['created'],
+                       entry.get('packed', False))
+
+    def series(self):
+        """{(series, ext): latest number}."""
+        return {tuple(key.rsplit('.', 1)): data['latest'] for key, data in self.manifest['series'].items()
+                if data['versions']}
+
+    def get(self, series, number, ext='docx'):
+        key = series_key(series, ext)
+        try:
+            entry = self.manifest['series'][key]['versions'][str(number)]
+        except KeyError:
+            raise VersionError(f"No version {number} of {key} in {self.directory}") from None
+        return self._version(key, int(number), entry)
+
+    def latest(self, series, ext='docx'):
+        """The newest revision of a series, or None if it has none."""
+        data = self.manifest['series'].get(series_key(series, ext))
+        if not data or not data['versions']:
+            return None
+        return self.get(series, data['latest'], ext)
+
+    def versions(self, series, ext='docx'):
+        data = self.manifest['series'].get(series_key(series, ext), {'versions': {}})
+        return [self.get(series, number, ext) for number in sorted(map(int, data['versions']))]
+
+    def path(self, series, number, ext='docx'):
+        return os.path.join(self.directory, f"{series}_v{number}.{ext}")
+
+    # -- recording -----------------------------------------------------
+
+    def _entry(self, filename, parent):
+        path = os.path.join(self.directory, filename)
+        if self.read_only:
+            # An in-memory scan only needs to find the files; nothing is hashed or stored
+            st = os.stat(path)
+            return {'file': filename, 'parent': parent, 'sha256': None, 'size': st.st_size,
+                    'created': round(st.st_mtime, 3)}
+        digest, size = file_digest(path)
+        entry = {'file': filename, 'parent': parent, 'sha256': digest, 'size': size,
+                 'created': round(os.path.getmtime(path), 3)}
+        if filename.rpartition('.')[2].lower() in PACKAGE_EXTENSIONS:
+            members = self.objects.put_package(path)
+            if members is not None:
+                entry['members'] = members
+        return entry
+
+    @staticmethod
+    def _add(manifest, key, number, entry):
+        data = manifest['series'].setdefault(key, {'latest': number, 'versions': {}})
+        data['versions'][str(number)] = entry
+        data['latest'] = max(data['latest'], number)
+
+    def record(self, path, parent=None):
+        """Add (or refresh) the file `path` in the manifest; returns its Version."""
+        filename = os.path.basename(path)
+        if os.path.abspath(os.path.dirname(path) or '.') != os.path.abspath(self.directory):
+            raise VersionError(f"{path} is not in {self.directory}")
+        match = VERSION_RE.match(filename)
+        if not match:
+            raise VersionError(f"Not a versioned file name (<series>_v<N>.<ext>): {filename}")
+        key = series_key(match['series'], match['ext'])
+        number = int(match['version'])
+        with self._update() as manifest:
+            self._add(manifest, key, number, self._entry(filename, parent))
+        return self.get(match['series'], number, match['ext'])
+
+    def allocate(self, series, ext='docx'):
+        """
+        Reserve the next version number of a series; returns (number, path).
+        The reservation is an empty placeholder file, overwritten when the
+        revision is saved.
+        """
+        with self._update() as manifest:
+            data = manifest['series'].setdefault(series_key(series, ext), {'latest': 0, 'versions': {}})
+            number = max(data['latest'], data.get('allocated', 0)) + 1
+            while True:
+                path = self.path(series, number, ext)
+                try:
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                    break
+                except FileExistsError:
+                    number += 1
+            data['allocated'] = number
+        return number, path
+
+    @contextmanager
+    def new_version(self, series, ext='docx', parent=None):
+        """
+        Allocate the next revision and record it once the block has written
+        it. `parent` is a Version, a number or None. Yields a Version whose
+        sha256/size are filled in only after the block.
+        """
+        if isinstance(parent, Version):
+            parent = parent.number
+        number, path = self.allocate(series, ext)
+        try:
+            yield Version(series, ext, number, path, parent, None, None, None)
+        except BaseException:
+            self._release(series, ext, number, path)
+            raise
+        if not os.path.getsize(path):
+            self._release(series, ext, number, path)
+            raise VersionError(f"Nothing was written to {path}")
+        self.record(path, parent)
+
+    def _release(self, series, ext, number, path):
+        """Give back an allocated number whose revision was never written."""
+        with self._update() as manifest:
+            data = manifest['series'][series_key(series, ext)]
+            if str(number) not in data['versions']:
+                # The number was ours alone, so is whatever was half-written under it
+                if os.path.exists(path):
+                    os.remove(path)
+                if data.get('allocated') == number:
+                    data['allocated'] = number - 1
+                if not data['versions']:
+                    del manifest['series'][series_key(series, ext)]
+
+    # -- content-addressed members ---------------------------------------
+
+    @property
+    def objects(self):
+        # Imported on first use: plain lookups never touch the object store
+        from object_store import ObjectStore
+        return ObjectStore(os.path.join(self.directory, OBJECTS))
+
+    def _entry_of(self, version):
+        return self.manifest['series'][series_key(version.series, version.ext)]['versions'][str(version.number)]
+
+    def checkout(self, version, target=None):
+        """
+        Path of a revision's file, reassembling it from stored members if it
+        was packed (or into `target` when given). Returns the path.
+        """
+        if target is None and self.read_only and version.packed:
+            raise VersionError(f"{version.path} is packed; give a target to check it out from a read-only store")
+        target = target or version.path
+        if os.path.exists(version.path) and not version.packed:
+            if target != version.path:
+                import shutil
+                shutil.copyfile(version.path, target)
+            return target
+        entry = self._entry_of(version)
+        if 'members' not in entry:
+            raise VersionError(f"{version.path} is missing and has no stored members")
+        return self.objects.assemble(entry['members'], target, entry['sha256'])
+
+    def pack(self, keep=1):
+        """
+        Remove the files of all but the `keep` newest revisions of each series
+        whose members are stored. Returns the number of bytes freed.
+        """
+        freed = 0
+        objects = self.objects
+        with self._update() as manifest:
+            for data in manifest['series'].values():
+                numbers = sorted(map(int, data['versions']))
+                for number in numbers[:max(len(numbers) - keep, 0)]:
+                    entry = data['versions'][str(number)]
+                    path = os.path.join(self.directory, entry['file'])
+                    if 'members' not in entry or not os.path.exists(path):
+                        continue
+                    # Checked-out copies of packed revisions are dropped again
+                    if not entry.get('packed') and not all(member[1] in objects for member in entry['members']):
+                        continue
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    entry['packed'] = True
+        return freed
+
+    def disk_usage(self):
+        """(bytes of all revisions if stored as full files, bytes actually on disk)."""
+        logical = stored = 0
+        for data in self.manifest['series'].values():
+            for entry in data['versions'].values():
+                logical += entry['size']
+                path = os.path.join(self.directory, entry['file'])
+                if not entry.get('packed') and os.path.exists(path):
+                    stored += os.path.getsize(path)
+        return logical, stored + self.objects.size()
+
+    # -- migration -----------------------------------------------------
+
+    def _scan(self, manifest):
+        found = {}
+        for name in os.listdir(self.directory):
+            match = VERSION_RE.match(name)
+            path = os.path.join(self.directory, name)
+            # Empty files are allocations that have not been written yet
+            if match and os.path.isfile(path) and os.path.getsize(path):
+                key = series_key(match['series'], match['ext'])
+                found.setdefault(key, []).append((int(match['version']), name))
+        added = 0
+        for key, files in found.items():
+            known = manifest['series'].get(key, {}).get('versions', {})
+            previous = None
+            for number, name in sorted(files):
+                entry = known.get(str(number))
+                if entry is None or entry['file'] != name:
+                    # Files that predate the manifest descend from the previous number
+                    self._add(manifest, key, number, self._entry(name, previous))
+                    added += 1
+                previous = number
+        return added
+
+    def scan(self):
+        """Record versioned files that are on disk but not in the manifest. Returns how many."""
+        with self._update() as manifest:
+            return self._scan(manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the proposal version manifest")
+    parser.add_argument('--dir', default='.')
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('list')
+    latest = commands.add_parser('latest')
+    latest.add_argument('series')
+    latest.add_argument('--ext', default='docx')
+    show = commands.add_parser('show')
+    show.add_argument('series')
+    show.add_argument('number', type=int)
+    show.add_argument('--ext', default='docx')
+    commands.add_parser('scan')
+    pack = commands.add_parser('pack')
+    pack.add_argument('--keep', type=int, default=1, help="Newest revisions per series to keep as files")
+    checkout = commands.add_parser('checkout')
+    checkout.add_argument('series')
+    checkout.add_argument('number', type=int)
+    checkout.add_argument('--ext', default='docx')
+    checkout.add_argument('-o', '--output')
+    commands.add_parser('du')
+    args = parser.parse_args()
+
+    # Queries leave the directory as it is
+    store = VersionStore(args.dir, read_only=args.command in (None, 'list', 'latest', 'show', 'du'))
+    if args.command == 'scan':
+        print(f"Recorded {store.scan()} new files in {store.manifest_path}")
+    elif args.command == 'pack':
+        print(f"Freed {store.pack(args.keep) / 1024:.0f} KiB")
+    elif args.command == 'checkout':
+        print(store.checkout(store.get(args.series, args.number, args.ext), args.output))
+    elif args.command == 'du':
+        logical, stored = store.disk_usage()
+        print(f"{logical / 1024:.0f} KiB of revisions in {stored / 1024:.0f} KiB on disk "
+              f"({logical / stored if stored else 0:.1f}x)")
+    elif args.command == 'latest':
+        version = store.latest(args.series, args.ext)
+        if version is None:
+            print(f"No versions of {args.series}.{args.ext}", file=sys.stderr)
+            return 1
+        print(version.path)
+    elif args.command == 'show':
+        version = store.get(args.series, args.number, args.ext)
+        for field, value in version._asdict().items():
+            if field == 'created' and value:
+                value = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(value))
+            print(f"{field:8} {value}")
+    else:
+        for (series, ext), number in sorted(store.series().items()):
+            print(f"{series}.{ext}: v{number}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())